@@ -2,10 +2,14 @@
 
 Provide access to the initialized Cosmos client / containers.
 This module expects that `app.db.session.init_cosmos()` was called at app startup.
+
+Services come from the app-scoped ServiceContainer that the lifespan stores
+on `app.state.services`, so their SDK clients are shared across requests.
 """
 from typing import Callable
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
 from app.db.session import get_db_client, get_container
+from app.core.services import ServiceContainer
 
 def get_cosmos_client():
     client = get_db_client()
@@ -20,4 +24,40 @@ def make_container_dep(container_name: str) -> Callable:
         except Exception as exc:
             raise HTTPException(status_code=500, detail=str(exc))
     return _get_container
-# Shared dependencies
\ No newline at end of file
+
+def get_services(request: Request) -> ServiceContainer:
+    services = getattr(request.app.state, "services", None)
+    if services is None:
+        raise HTTPException(status_code=500, detail="Services not initialized")
+    return services
+
+def get_ai_service(request: Request):
+    return get_services(request).ai_service
+
+def get_search_service(request: Request):
+    return get_services(request).search_service
+
+def get_context_packer(request: Request):
+    return get_services(request).context_packer
+
+def get_conversation_cache(request: Request):
+    return get_services(request).conversation_cache
+
+def get_message_writer(request: Request):
+    return get_services(request).message_writer
+
+def get_history_service(request: Request):
+    return get_services(request).history_service
+
+def get_answer_cache(request: Request):
+    return get_services(request).answer_cache
+
+def get_document_repository(request: Request):
+    return get_services(request).document_repo
+
+def get_ingestion_service(request: Request):
+    return get_services(request).ingestion_service
+
+def get_rag_pipeline(request: Request):
+    return get_services(request).rag_pipeline
+# Shared dependencies
@@ -1,6 +1,8 @@
 # Conversational endpoints
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from azure.cosmos.aio import DatabaseProxy
+from azure.cosmos.exceptions import CosmosHttpResponseError
 from app.schemas.chat import (
     ChatMessageRequest,
     ChatMessageResponse,
@@ -9,143 +11,429 @@ from app.schemas.chat import (
     CitationSchema,
     Role
 )
-from app.services.azure_ai_service import AzureOpenAIService
+from app.services.azure_ai_service import AzureOpenAIService, LLMUnavailableError
 from app.services.search_service import SearchService
 from app.repositories.conversation_repository import ConversationRepository
 from app.db.mongodb import get_database
-from datetime import datetime
+from app.config.settings import settings
+from app.utils.metrics import civi_metrics
+from app.api.dependencies import (
+    get_ai_service,
+    get_answer_cache,
+    get_context_packer,
+    get_conversation_cache,
+    get_history_service,
+    get_message_writer,
+    get_search_service
+)
+from app.services.answer_cache_service import AnswerCacheService
+from app.services.context_packer_service import ContextPackerService
+from app.services.conversation_cache_service import ConversationCacheService
+from app.services.conversation_history_service import ConversationHistoryService
+from app.services.message_writer_service import MessageWriterService, merge_messages
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import base64
+import hashlib
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-conversation_repo = ConversationRepository()
+
+def _record_duration(timings: Dict[str, float], step: str, start: float):
+    timings[step] = (time.perf_counter() - start) * 1000
+
+
+async def _timed(timings: Dict[str, float], step: str, awaitable):
+    """Await a step and record its duration in milliseconds"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        _record_duration(timings, step, start)
+
+
+def _is_first_turn(conversation, message_writer: MessageWriterService) -> bool:
+    # Persisted messages lag behind with write-behind: queued ones count too
+    return conversation.message_count == 0 and not message_writer.pending_messages(conversation.id)
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{step};dur={ms:.1f}" for step, ms in timings.items())
+
 
 @router.post("/message", response_model=ChatMessageResponse)
 async def send_chat_message(
     request: ChatMessageRequest,
-    db: DatabaseProxy = Depends(get_database)
+    response: Response,
+    db: DatabaseProxy = Depends(get_database),
+    ai_service: AzureOpenAIService = Depends(get_ai_service),
+    search_service: SearchService = Depends(get_search_service),
+    history_service: ConversationHistoryService = Depends(get_history_service),
+    answer_cache: AnswerCacheService = Depends(get_answer_cache),
+    context_packer: ContextPackerService = Depends(get_context_packer),
+    message_writer: MessageWriterService = Depends(get_message_writer),
+    conversation_cache: Optional[ConversationCacheService] = Depends(get_conversation_cache)
 ):
     """
     Send a chat message and get AI response with citations
+
+    Independent steps run concurrently:
+
+        search ─────────────────────────┐
+        conversation ─┬─ save user msg ─┼─ LLM ─ save assistant msg
+                      └─ load history ──┘
+
+    The first question of a conversation is also looked up in the semantic
+    answer cache (in parallel with search); on a hit the cached answer and
+    citations are reused and the LLM is not called.
+
+    Step durations are logged, recorded in the chat_step_duration histogram
+    and returned in a Server-Timing header.
     """
+    timings: Dict[str, float] = {}
+    request_start = time.perf_counter()
+    deadline = time.monotonic() + settings.CHAT_REQUEST_DEADLINE_SECONDS
+    search_task = None
+    cache_task = None
     try:
-        # Initialize services
-        ai_service = AzureOpenAIService()
-        search_service = SearchService()
+        conversation_repo = ConversationRepository(db, cache=conversation_cache)
+        
+        # Retrieval only needs the question: start it before touching Cosmos
+        search_start = time.perf_counter()
+        search_task = asyncio.create_task(search_service.search_documents(request.content))
+        search_task.add_done_callback(lambda _: _record_duration(timings, "search", search_start))
         
         # Get or create conversation
         # Handle empty strings, "null" literals, and None
         conversation_id = request.conversation_id
         if conversation_id and conversation_id.strip() and conversation_id.lower() != "null":
-            conversation = await conversation_repo.get_conversation(conversation_id)
+            conversation = await _timed(timings, "conversation", conversation_repo.get_conversation(conversation_id))
             if not conversation:
                 raise HTTPException(status_code=404, detail="Conversation not found")
         else:
-            conversation = await conversation_repo.create_conversation()
+            # A new conversation is a first turn: check the answer cache meanwhile
+            cache_task = asyncio.create_task(
+                _timed(timings, "answer_cache", answer_cache.lookup(request.content))
+            )
+            conversation = await _timed(timings, "conversation", conversation_repo.create_conversation())
+        if cache_task is None and _is_first_turn(conversation, message_writer):
+            cache_task = asyncio.create_task(
+                _timed(timings, "answer_cache", answer_cache.lookup(request.content))
+            )
         
-        # Save user message
-        conversation_repo.add_message(
-
-        logger.info(f"Saving user message for conversation {conversation.id}")
-        user_message = await conversation_repo.add_message(
-            conversation_id=conversation.id,
-            role=Role.USER.value,
-            content=request.content
+        # Recent history is loaded alongside the user message write
+        user_message, recent_messages = await asyncio.gather(
+            _timed(timings, "save_user_message", message_writer.add_message(
+                conversation_repo,
+                conversation_id=conversation.id,
+                role=Role.USER.value,
+                content=request.content
+            )),
+            _timed(timings, "history", history_service.recent_messages(conversation_repo, conversation))
+        )
+        # The history read races the write: drop the new message if it landed first
+        message_history = history_service.build_history(
+            conversation_repo,
+            conversation,
+            [msg for msg in recent_messages if msg.id != user_message.id]
         )
-        logger.info(f"User message saved: {user_message.id}")
-        
-        # Search for relevant documents
-        logger.info("Searching for relevant documents...")
-        documents = await search_service.search_documents(request.content)
-        citations = search_service.create_citations(documents)
-        logger.info(f"Found {len(citations)} citations")
-        
-        # Get conversation history for context
-        logger.info("Getting conversation history...")
-        previous_messages = await conversation_repo.get_conversation_messages(conversation.id)
-        message_history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in previous_messages
-        ]
         message_history.append({"role": "user", "content": request.content})
-        logger.info(f"Message history has {len(message_history)} messages")
         
-        # Get AI response with context
-        logger.info("Getting AI response...")
-        ai_response = await ai_service.get_chat_completion(
-            messages=message_history,
-            context_documents=documents
-        )
-        logger.info(f"AI response received: {ai_response[:100]}...")
+        query_vector, cached = await cache_task if cache_task else (None, None)
+        if cached:
+            search_task.cancel()
+            citations = cached.citations
+            ai_response = cached.answer
+            response.headers["X-Answer-Cache"] = "hit"
+        else:
+            documents = context_packer.pack(await search_task)
+            citations = search_service.create_citations(documents)
+            logger.info(f"Found {len(citations)} citations, history has {len(message_history)} messages")
+            
+            # Get AI response with context
+            ai_response = await _timed(timings, "llm", ai_service.get_chat_completion(
+                messages=message_history,
+                context_documents=documents,
+                deadline=deadline
+            ))
+            if cache_task and ai_service.enabled:
+                answer_cache.store(query_vector, request.content, ai_response, citations)
         
         # Save assistant message with citations
-        conversation = conversation_repo.add_message(
-        logger.info("Saving assistant message...")
-        assistant_message = await conversation_repo.add_message(
+        assistant_message = await _timed(timings, "save_assistant_message", message_writer.add_message(
+            conversation_repo,
             conversation_id=conversation.id,
             role=Role.ASSISTANT.value,
             content=ai_response,
             citations=citations
-        )
-        logger.info(f"Assistant message saved: {assistant_message.id}")
+        ))
         
-        user_message = next((msg for msg in conversation.messages if msg.role == Role.USER.value), None)
-        assistant_message = next((msg for msg in conversation.messages if msg.role == Role.ASSISTANT.value), None)
-
-        # Convert to response schemas
-        user_msg_schema = MessageSchema(
-            id=user_message.id,
-            role=Role(user_message.role),
-            content=user_message.content,
-            timestamp=user_message.timestamp,
-            citations=None,
-            isThinking=False
-        )
-        
-        assistant_msg_schema = MessageSchema(
-            id=assistant_message.id,
-            role=Role(assistant_message.role),
-            content=assistant_message.content,
-            timestamp=assistant_message.timestamp,
-            citations=[CitationSchema(**c) for c in citations] if citations else None,
-            isThinking=False
-        )
+        _record_duration(timings, "total", request_start)
+        civi_metrics.record_chat_request()
+        civi_metrics.record_chat_timings(timings)
+        response.headers["Server-Timing"] = _server_timing(timings)
+        logger.info(f"Chat message for conversation {conversation.id} timings (ms): {_server_timing(timings)}")
         
         return ChatMessageResponse(
-            user_message=user_msg_schema,
-            assistant_message=assistant_msg_schema,
+            user_message=_message_schema(user_message),
+            assistant_message=_message_schema(assistant_message, citations),
             conversation_id=conversation.id
         )
         
     except HTTPException:
         raise
+    except LLMUnavailableError as e:
+        logger.error(f"No AI response for chat message: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is temporarily unavailable, please try again",
+            headers={"Retry-After": str(settings.LLM_PROVIDER_COOLDOWN_SECONDS)}
+        )
     except Exception as e:
         logger.error(f"Error processing chat message: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        for task in (search_task, cache_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+def _sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _message_schema(message, citations: List[Dict] = None) -> MessageSchema:
+    return MessageSchema(
+        id=message.id,
+        role=Role(message.role),
+        content=message.content,
+        timestamp=message.timestamp,
+        citations=[CitationSchema(**c) for c in citations] if citations else None,
+        isThinking=False
+    )
+
+
+@router.post("/message/stream")
+async def stream_chat_message(
+    request: ChatMessageRequest,
+    db: DatabaseProxy = Depends(get_database),
+    ai_service: AzureOpenAIService = Depends(get_ai_service),
+    search_service: SearchService = Depends(get_search_service),
+    history_service: ConversationHistoryService = Depends(get_history_service),
+    answer_cache: AnswerCacheService = Depends(get_answer_cache),
+    context_packer: ContextPackerService = Depends(get_context_packer),
+    message_writer: MessageWriterService = Depends(get_message_writer),
+    conversation_cache: Optional[ConversationCacheService] = Depends(get_conversation_cache)
+):
+    """
+    Send a chat message and stream the AI response as Server-Sent Events:
+
+    - `conversation`: conversation_id and the saved user message
+    - `citations`: sources used for the answer (sent before any token)
+    - `token`: `{"delta": "..."}` for each piece of text from the model
+    - `done`: the saved assistant message, once the answer is complete
+    - `error`: `{"detail": "..."}` if the answer could not be completed
+
+    The assistant message is only persisted when the stream completes. A
+    first question answered from the semantic answer cache is sent as a
+    single `token` event.
+    """
+    conversation_repo = ConversationRepository(db, cache=conversation_cache)
+    deadline = time.monotonic() + settings.CHAT_REQUEST_DEADLINE_SECONDS
+    
+    # Resolve the conversation before streaming so a bad id is still a 404
+    conversation_id = request.conversation_id
+    if conversation_id and conversation_id.strip() and conversation_id.lower() != "null":
+        conversation = await conversation_repo.get_conversation(conversation_id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+    else:
+        conversation = await conversation_repo.create_conversation()
+    
+    async def events() -> AsyncIterator[str]:
+        search_task = asyncio.create_task(search_service.search_documents(request.content))
+        cache_task = None
+        if _is_first_turn(conversation, message_writer):
+            cache_task = asyncio.create_task(answer_cache.lookup(request.content))
+        try:
+            # History is read alongside the user message write so it is not sent twice
+            user_message, recent_messages = await asyncio.gather(
+                message_writer.add_message(
+                    conversation_repo,
+                    conversation_id=conversation.id,
+                    role=Role.USER.value,
+                    content=request.content
+                ),
+                history_service.recent_messages(conversation_repo, conversation)
+            )
+            message_history = history_service.build_history(
+                conversation_repo,
+                conversation,
+                [msg for msg in recent_messages if msg.id != user_message.id]
+            )
+            message_history.append({"role": "user", "content": request.content})
+            yield _sse_event("conversation", {
+                "conversation_id": conversation.id,
+                "user_message": _message_schema(user_message).model_dump(mode="json")
+            })
+            
+            query_vector, cached = await cache_task if cache_task else (None, None)
+            if cached:
+                search_task.cancel()
+                citations = cached.citations
+            else:
+                documents = context_packer.pack(await search_task)
+                citations = search_service.create_citations(documents)
+            yield _sse_event("citations", {
+                "citations": [CitationSchema(**c).model_dump(mode="json") for c in citations]
+            })
+            
+            parts = []
+            if cached:
+                parts.append(cached.answer)
+                yield _sse_event("token", {"delta": cached.answer})
+            else:
+                async for delta in ai_service.stream_chat_completion(
+                    messages=message_history,
+                    context_documents=documents,
+                    deadline=deadline
+                ):
+                    parts.append(delta)
+                    yield _sse_event("token", {"delta": delta})
+                if cache_task and ai_service.enabled:
+                    answer_cache.store(query_vector, request.content, "".join(parts), citations)
+            
+            assistant_message = await message_writer.add_message(
+                conversation_repo,
+                conversation_id=conversation.id,
+                role=Role.ASSISTANT.value,
+                content="".join(parts),
+                citations=citations
+            )
+            logger.info(f"Streamed assistant message saved: {assistant_message.id}")
+            yield _sse_event("done", {
+                "assistant_message": _message_schema(assistant_message, citations).model_dump(mode="json")
+            })
+        except LLMUnavailableError as e:
+            logger.error(f"No AI response for streamed chat message: {str(e)}")
+            yield _sse_event("error", {"detail": "The assistant is temporarily unavailable, please try again"})
+        except Exception as e:
+            logger.error(f"Error streaming chat message: {str(e)}")
+            yield _sse_event("error", {"detail": f"Internal server error: {str(e)}"})
+        finally:
+            for task in (search_task, cache_task):
+                if task is not None and not task.done():
+                    task.cancel()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/cache/stats")
+async def get_answer_cache_stats(answer_cache: AnswerCacheService = Depends(get_answer_cache)):
+    """
+    Semantic answer cache counters: hits, misses, hit_rate, entries,
+    stores, evictions (TTL and capacity) and invalidations (index changes)
+    """
+    return answer_cache.stats()
+
+
+@router.get("/llm/stats")
+async def get_llm_stats(ai_service: AzureOpenAIService = Depends(get_ai_service)):
+    """
+    LLM call counters per provider (requests, successes, failures by kind,
+    p50/p95 latency, cooldown) plus failovers and hedged requests
+    """
+    return ai_service.stats()
+
+
+def _encode_cursor(continuation_token: str) -> str:
+    return base64.urlsafe_b64encode(continuation_token.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        token = base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except (ValueError, UnicodeDecodeError):
+        token = ""
+    if not token:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return token
+
+
+def _history_etag(conversation_id: str, version: str, limit: int, before: Optional[str], pending: List) -> str:
+    # version is the conversation's Cosmos _etag: every append patches the
+    # conversation (message_count), and messages are never edited
+    version = "|".join([
+        conversation_id,
+        version,
+        str(limit),
+        before or "",
+        *(m.id for m in pending)
+    ])
+    return f'W/"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+
+def _parse_if_none_match(header: Optional[str]) -> List[str]:
+    if not header:
+        return []
+    return [tag.strip() if tag.strip().startswith("W/") else f"W/{tag.strip()}" for tag in header.split(",")]
 
 
 @router.get("/history/{conversation_id}", response_model=ConversationHistoryResponse)
 async def get_conversation_history(
     conversation_id: str,
-    db: DatabaseProxy = Depends(get_database)
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.CHAT_HISTORY_PAGE_SIZE, ge=1, le=settings.CHAT_HISTORY_MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: DatabaseProxy = Depends(get_database),
+    message_writer: MessageWriterService = Depends(get_message_writer)
 ):
     """
-    Get conversation history with all messages
+    Get conversation history, one page of messages at a time, newest first
+
+    Pages are read with Cosmos continuation tokens: pass the response's
+    next_cursor as `before` to get older messages. The first page also
+    includes messages still queued by the write-behind writer.
+
+    Responses carry a weak ETag derived from the conversation's Cosmos
+    _etag, read uncached so writes of other processes are seen; a request
+    with a matching If-None-Match gets a 304 after that single point read,
+    without querying messages.
     """
     try:
-        conversation = conversation_repo.get_conversation_with_messages(conversation_id)
-        logger.info(f"Getting history for conversation: {conversation_id}")
+        continuation_token = _decode_cursor(before) if before else None
         conversation_repo = ConversationRepository(db)
-        result = await conversation_repo.get_conversation_with_messages(conversation_id)
-        
-        logger.info(f"Result: {result is not None}")
-        if not result:
+        conversation, version = await conversation_repo.read_conversation_version(conversation_id)
+        if not conversation:
             logger.warning(f"Conversation {conversation_id} not found")
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        conversation = result["conversation"]
-        messages = result["messages"]
+        pending = message_writer.pending_messages(conversation_id) if not before else []
+        etag = _history_etag(conversation_id, version or "", limit, before, pending)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in _parse_if_none_match(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        
+        try:
+            messages, next_token = await conversation_repo.get_messages_page(
+                conversation_id, limit, continuation_token
+            )
+        except CosmosHttpResponseError as e:
+            if e.status_code == 400 and continuation_token:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            raise
+        if pending:
+            messages = merge_messages(messages, pending)[::-1]
         
         # Convert messages to schemas
         message_schemas = []
@@ -167,7 +455,8 @@ async def get_conversation_history(
             conversation_id=conversation.id,
             messages=message_schemas,
             created_at=conversation.created_at,
-            updated_at=conversation.updated_at
+            updated_at=conversation.updated_at,
+            next_cursor=_encode_cursor(next_token) if next_token else None
         )
         
     except HTTPException:
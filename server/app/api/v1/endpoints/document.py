@@ -1,18 +1,63 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import AsyncIterator, List, Literal, Optional, Tuple
 import json
+import re
+from urllib.parse import quote
+from azure.core.exceptions import ResourceNotFoundError
 from app.schemas.document import DocumentIngestRequest, DocumentIngestResponse
 from app.services.document_ingestion_service import DocumentIngestionService
+from app.services.blob_storage_service import get_blob_storage_service
+from app.repositories.document_repository import DocumentRepository
+from app.api.dependencies import get_document_repository, get_ingestion_service
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def _stream_format(stream: Optional[str], request: Request) -> Optional[str]:
+    """Streaming is opt-in: ?stream=ndjson|sse or a matching Accept header"""
+    if stream:
+        return stream
+    accept = request.headers.get("accept", "")
+    for name, media_type in STREAM_MEDIA_TYPES.items():
+        if media_type in accept:
+            return name
+    return None
+
+
+async def _format_events(events: AsyncIterator, stream_format: str) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            data = event.model_dump_json(exclude_none=True)
+            if stream_format == "sse":
+                yield f"event: {event.event}\ndata: {data}\n\n"
+            else:
+                yield data + "\n"
+    except Exception as e:
+        logger.error(f"Error during streaming document ingestion: {str(e)}")
+        error = json.dumps({"event": "error", "detail": f"Ingestion failed: {str(e)}"})
+        yield f"event: error\ndata: {error}\n\n" if stream_format == "sse" else error + "\n"
+    finally:
+        # Runs the generator's cleanup (cancel work, remove spooled files) right away
+        await events.aclose()
+
+
 @router.post("/ingest", response_model=DocumentIngestResponse)
 async def ingest_documents(
+    request: Request,
     files: List[UploadFile] = File(None),
-    urls_json: Optional[str] = Form(None)
+    urls_json: Optional[str] = Form(None),
+    stream: Optional[Literal["ndjson", "sse"]] = Query(None),
+    ingestion_service: DocumentIngestionService = Depends(get_ingestion_service)
 ):
     """
     Ingest documents and URLs for RAG system.
@@ -20,6 +65,9 @@ async def ingest_documents(
     
     - **files**: PDF, DOCX, TXT files
     - **urls_json**: JSON string with list of URLs to validate and scrape
+    - **stream**: `ndjson` or `sse` (or an `application/x-ndjson` /
+      `text/event-stream` Accept header) to receive one event per file/URL
+      as it finishes, followed by a summary event with counts
     """
     try:
         # Parse URLs from JSON string if provided
@@ -27,12 +75,27 @@ async def ingest_documents(
         if urls_json:
             try:
                 urls_data = json.loads(urls_json)
-                urls = urls_data.get("urls", [])
+                # Reject malformed items (e.g. missing "url") before any work or stream starts
+                DocumentIngestRequest.model_validate(urls_data)
+                urls = urls_data.get("urls") or []
             except json.JSONDecodeError:
                 raise HTTPException(status_code=400, detail="Invalid JSON format for urls")
+            except ValidationError as e:
+                raise HTTPException(
+                    status_code=400,
+                    detail=e.errors(include_url=False, include_context=False, include_input=False)
+                )
         
-        # Initialize ingestion service
-        ingestion_service = DocumentIngestionService()
+        stream_format = _stream_format(stream, request)
+        if stream_format:
+            # Uploads are closed once this handler returns, so spool them first
+            uploads = await ingestion_service.spool_uploads(files or [])
+            events = ingestion_service.stream_ingestion(uploads, urls)
+            return StreamingResponse(
+                _format_events(events, stream_format),
+                media_type=STREAM_MEDIA_TYPES[stream_format],
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
         
         # Process files and URLs
         result = await ingestion_service.process_ingestion(
@@ -47,3 +110,85 @@ async def ingest_documents(
     except Exception as e:
         logger.error(f"Error during document ingestion: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=start-end" header into (offset, length).
+    Returns None for malformed or multi-range headers (served as 200).
+    Raises 416 when the range lies outside the blob.
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        length = min(int(end), size)
+        if length == 0:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{size}"}
+            )
+        return size - length, length
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end - start + 1
+
+
+@router.get("/{document_id}/content")
+async def download_document_content(
+    document_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    document_repo: DocumentRepository = Depends(get_document_repository)
+):
+    """
+    Stream the stored file of a document from Blob Storage without buffering
+    it. Supports a single `Range: bytes=start-end` for partial downloads.
+    """
+    document = await document_repo.get_document(document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    blob_storage = get_blob_storage_service()
+    size = document.file_size
+    byte_range = _parse_range(range_header, size) if range_header else None
+    offset, length = byte_range if byte_range else (None, None)
+
+    # Start the download before responding so a missing blob is a 404, not a broken stream
+    chunks = blob_storage.iter_download(document.filename, offset=offset, length=length)
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    except ResourceNotFoundError:
+        raise HTTPException(status_code=404, detail="Document content not found")
+
+    async def body():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(document.original_filename)}",
+        "Content-Length": str(length if byte_range else size),
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {offset}-{offset + length - 1}/{size}"
+    return StreamingResponse(
+        body(),
+        status_code=206 if byte_range else 200,
+        media_type=document.content_type,
+        headers=headers
+    )
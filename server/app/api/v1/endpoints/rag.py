@@ -1,10 +1,13 @@
 # app/api/v1/endpoints/rag.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict, List
 from pydantic import BaseModel
+import asyncio
 import logging
 import json
 from pathlib import Path
+from app.api.dependencies import get_services
+from app.core.services import ServiceContainer
 
 
 logger = logging.getLogger(__name__)
@@ -23,7 +26,7 @@ class PipelineResponse(BaseModel):
 
 
 @router.post("/process", response_model=PipelineResponse)
-async def process_full_rag_pipeline():
+async def process_full_rag_pipeline(services: ServiceContainer = Depends(get_services)):
     """
     
     
@@ -52,10 +55,8 @@ async def process_full_rag_pipeline():
         # ================================================================
         logger.info("Step 1: Setting up Azure AI Search index...")
         
-        from app.services.search_index_service import SearchIndexService
-        
         try:
-            search_index_service = SearchIndexService()
+            search_index_service = services.search_index_service
             search_index_service.create_index()
             steps.append("Azure AI Search index ready")
             logger.info("Search index ready")
@@ -112,11 +113,10 @@ async def process_full_rag_pipeline():
         # ================================================================
         logger.info("Step 4: Ingesting and validating files...")
         
-        from app.services.document_ingestion_service import DocumentIngestionService
         from fastapi import UploadFile
         import io
         
-        ingestion_service = DocumentIngestionService()
+        ingestion_service = services.ingestion_service
         
         # Convert local files to UploadFile objects
         upload_files = []
@@ -146,18 +146,33 @@ async def process_full_rag_pipeline():
                 errors.append(error_msg)
                 logger.error(f"{error_msg}")
         
-        # Process ingestion (validation + storage)
-        ingestion_result = await ingestion_service.process_ingestion(
-            files=upload_files,
-            urls=urls
+        # Process ingestion (validation + storage). URLs go through the crawler,
+        # which expands sitemaps and fetches politely per host.
+        from app.services.crawler_service import CrawlerService
+        
+        crawler = CrawlerService(ingestion_service)
+        ingestion_result, crawl_result = await asyncio.gather(
+            ingestion_service.process_ingestion(files=upload_files, urls=[]),
+            crawler.crawl_all(urls)
         )
+        ingestion_result.update(crawl_result)
         
         files_accepted = len(ingestion_result["files_accepted"])
         urls_accepted = len(ingestion_result["urls_accepted"])
         total_accepted = files_accepted + urls_accepted
+        total_duplicates = len(ingestion_result["files_duplicate"]) + len(ingestion_result["urls_duplicate"])
+        
+        if crawl_result["urls_skipped"]:
+            steps.append(f"Skipped {len(crawl_result['urls_skipped'])} URLs disallowed by robots.txt")
         
         steps.append(f"Validated and stored {total_accepted} documents")
-        logger.info(f"Ingestion complete: {files_accepted} files, {urls_accepted} URLs accepted")
+        if total_duplicates:
+            steps.append(f"Skipped {total_duplicates} documents already ingested (same content hash)")
+        logger.info(
+            f"Ingestion complete: {files_accepted} files, {urls_accepted} of "
+            f"{crawl_result['urls_processed']} crawled URLs accepted, "
+            f"{total_duplicates} duplicates skipped"
+        )
         
         # Track rejected items
         if ingestion_result["files_rejected"]:
@@ -170,11 +185,12 @@ async def process_full_rag_pipeline():
         
         if total_accepted == 0:
             return PipelineResponse(
-                message="Pipeline completed but no documents were accepted",
+                message="Pipeline completed but no new documents were accepted",
                 status="completed_with_errors",
                 summary={
                     "files_processed": len(local_files),
-                    "urls_processed": len(urls),
+                    "urls_processed": crawl_result["urls_processed"],
+                    "documents_duplicate": total_duplicates,
                     "documents_indexed": 0,
                     "total_chunks": 0
                 },
@@ -188,10 +204,9 @@ async def process_full_rag_pipeline():
         # ================================================================
         logger.info("Step 5: Retrieving validated documents...")
         
-        from app.repositories.document_repository import DocumentRepository
         from app.schemas.document import DocumentStatus
         
-        document_repo = DocumentRepository()
+        document_repo = services.document_repo
         validated_docs = await document_repo.get_documents_by_status(
             DocumentStatus.VALIDATED,
             limit=100
@@ -206,9 +221,7 @@ async def process_full_rag_pipeline():
         # ================================================================
         logger.info("Step 6: Processing RAG pipeline (chunking, embeddings, indexing)...")
         
-        from app.services.rag_pipeline_service import RAGPipelineService
-        
-        rag_pipeline = RAGPipelineService()
+        rag_pipeline = services.rag_pipeline
         
         documents_indexed = 0
         total_chunks = 0
@@ -277,8 +290,9 @@ async def process_full_rag_pipeline():
             status=status,
             summary={
                 "files_processed": len(local_files),
-                "urls_processed": len(urls),
+                "urls_processed": crawl_result["urls_processed"],
                 "documents_accepted": total_accepted,
+                "documents_duplicate": total_duplicates,
                 "documents_indexed": documents_indexed,
                 "total_chunks": total_chunks
             },
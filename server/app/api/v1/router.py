@@ -2,9 +2,7 @@
 # app/api/v1/router.py
 
 from fastapi import APIRouter
-<<<<<<< HEAD
 from app.api.v1.endpoints import chat, notifications, document, health, rag, webhooks, users
->>>>>>> main
 
 api_router = APIRouter()
 
@@ -22,8 +20,6 @@ api_router.include_router(
     tags=["notifications"]
 )
 
-<<<<<<< HEAD
-
 api_router.include_router(
     document.router,
     prefix="/documents",
@@ -50,7 +46,6 @@ api_router.include_router(
 
 # webhooks endpoints
 api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
->>>>>>> main
 
 @api_router.get("/")
 async def root():
@@ -40,13 +40,94 @@ class Settings(BaseSettings):
     # ========================================================================
     AZURE_CONTENT_SAFETY_ENDPOINT: Optional[str] = None
     AZURE_CONTENT_SAFETY_KEY: Optional[str] = None
+    CONTENT_SAFETY_SEGMENT_CHARS: int = 10000  # API maximum text length per request
+    CONTENT_SAFETY_MAX_CONCURRENCY: int = 8  # Segments analysed in parallel per document
+    CONTENT_SAFETY_SEVERITY_THRESHOLD: int = 2  # Any category at or above this is unsafe
+    CONTENT_SAFETY_CACHE_SIZE: int = 10000  # In-process LRU entries (segment verdicts)
+    CONTENT_SAFETY_CACHE_PATH: str = "./.cache/content_safety.db"  # SQLite verdict store ("" disables)
     
     # ========================================================================
-    # Azure Blob Storage
+    # Blob Storage (Azure, or local filesystem)
     # ========================================================================
     AZURE_STORAGE_CONNECTION_STRING: Optional[str] = None
     AZURE_STORAGE_CONTAINER_NAME: str = "documents"
-    
+    AZURE_STORAGE_MAX_BLOCK_SIZE: int = 4 * 1024 * 1024  # Block size for chunked uploads
+    AZURE_STORAGE_MAX_SINGLE_PUT_SIZE: int = 8 * 1024 * 1024  # Larger uploads use block upload
+    AZURE_STORAGE_MAX_CONCURRENCY: int = 4  # Parallel block uploads / range downloads per blob
+    AZURE_STORAGE_MAX_CHUNK_GET_SIZE: int = 4 * 1024 * 1024  # Byte range size for streaming downloads
+    STORAGE_BACKEND: str = "azure"  # azure or local (content-addressed filesystem, offline runs)
+    LOCAL_STORAGE_PATH: str = "./.cache/blobs"
+    LOCAL_STORAGE_COMPRESSION: str = "none"  # none or zstd (needs the zstandard package)
+    LOCAL_STORAGE_ZSTD_LEVEL: int = 3
+    LOCAL_STORAGE_CHUNK_SIZE: int = 1024 * 1024  # Bytes per read/write when streaming
+
+    # ========================================================================
+    # Document Ingestion
+    # ========================================================================
+    INGESTION_MAX_CONCURRENCY: int = 8  # Files/URLs in flight (network-bound work)
+    INGESTION_EXTRACTION_CONCURRENCY: int = 2  # Concurrent text extractions (CPU-bound)
+    INGESTION_UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes read per chunk when spooling uploads
+    TEXT_EXTRACTION_MAX_WORKERS: int = 0  # Extraction process pool size (0 = CPU count)
+    TEXT_EXTRACTION_PAGES_PER_TASK: int = 50  # PDFs above this are split into page ranges
+    TEXT_EXTRACTION_TIMEOUT_SECONDS: float = 300.0  # Time limit of each extraction task once it starts
+    PDF_EXTRACTION_ENGINE: str = "auto"  # auto, pdfplumber, pdfium, pdfminer
+    PDF_FAST_ENGINE: str = "pdfium"  # Engine used by "auto" for plain-text PDFs
+    PDF_TABLE_SAMPLE_PAGES: int = 5  # Pages sampled to detect table-heavy PDFs
+    PDF_TABLE_RULE_THRESHOLD: int = 30  # Ruling lines that mark a page as a table page
+    PDF_TABLE_PAGE_RATIO: float = 0.25  # Share of table pages that routes a PDF to pdfplumber
+    HTML_EXTRACTION_ENGINE: str = "auto"  # auto, selectolax, lxml, bs4
+    HTML_MAIN_CONTENT_ONLY: bool = True  # Keep only the main content region, drop nav/footer/boilerplate
+    HTML_MAIN_CONTENT_MIN_CHARS: int = 200  # Shorter main regions fall back to the whole page body
+
+    # ========================================================================
+    # Outbound HTTP (shared connection pool)
+    # ========================================================================
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_CONNECTIONS_PER_HOST: int = 10
+    HTTP_KEEPALIVE_TIMEOUT_SECONDS: float = 30.0
+    HTTP_DNS_CACHE_TTL_SECONDS: int = 300
+    HTTP_DEFAULT_TIMEOUT_SECONDS: float = 30.0
+    HTTP_USER_AGENT: str = "CiviFlowBot/1.0"
+
+    # ========================================================================
+    # URL Validation
+    # ========================================================================
+    # Host suffixes accepted for ingestion. Country suffixes are listed one by one:
+    # "gov"/"gob" under an open ccTLD (gov.io, gob.ws) can be registered by anyone
+    URL_ALLOWED_DOMAIN_SUFFIXES: List[str] = [
+        "gov", "gob",
+        "gov.co", "gob.mx", "gob.es", "gob.ar", "gob.cl", "gob.pe", "gob.ec", "gob.bo",
+        "gob.ve", "gob.gt", "gob.hn", "gob.sv", "gob.ni", "gob.pa", "gob.do", "gov.py",
+        "gov.br", "gov.uk", "gov.au", "gov.in",
+    ]
+    URL_REACHABILITY_TTL_SECONDS: int = 600  # How long a reachable host is trusted without probing
+    URL_UNREACHABLE_TTL_SECONDS: int = 60  # How long an unreachable host is failed fast
+    URL_VALIDATION_TIMEOUT_SECONDS: float = 10.0  # Reachability probe timeout
+
+    # ========================================================================
+    # URL Recrawl (conditional GET)
+    # ========================================================================
+    RECRAWL_ENABLED: bool = False  # Run the recrawl scheduler in the API process
+    RECRAWL_INTERVAL_SECONDS: int = 24 * 3600  # How often each ingested URL is rechecked
+    RECRAWL_RETRY_SECONDS: int = 3600  # Delay before retrying a failed recrawl
+    RECRAWL_POLL_INTERVAL_SECONDS: int = 300  # How often the scheduler looks for due URLs
+    RECRAWL_BATCH_SIZE: int = 50  # Due URLs handled per poll
+    CRAWL_STATE_BACKEND: str = "cosmos"  # cosmos or sqlite
+    CRAWL_STATE_SQLITE_PATH: str = "./.cache/crawl_state.db"
+
+    # ========================================================================
+    # Crawler (bulk URL sources)
+    # ========================================================================
+    CRAWLER_MAX_CONCURRENCY: int = 16  # Page fetches in flight across all hosts
+    CRAWLER_MAX_CONCURRENCY_PER_HOST: int = 2  # Page fetches in flight per host
+    CRAWLER_MIN_DELAY_SECONDS: float = 0.5  # Minimum gap between requests to a host (robots.txt Crawl-delay wins if larger)
+    CRAWLER_RESPECT_ROBOTS: bool = True
+    CRAWLER_ROBOTS_CACHE_TTL_SECONDS: int = 3600
+    CRAWLER_MAX_SITEMAP_URLS: int = 5000  # Page URLs taken from one source's sitemaps
+    CRAWLER_SITEMAP_MAX_DEPTH: int = 3  # Nesting levels followed in sitemap indexes
+    CRAWLER_MAX_SITEMAPS: int = 100  # Sitemap documents fetched per source, indexes included
+    CRAWLER_SITEMAP_MAX_BYTES: int = 50 * 1024 * 1024  # Per sitemap, after decompression (protocol limit)
+
     # ========================================================================
     # Azure Cosmos DB
     # ========================================================================
@@ -58,6 +139,7 @@ class Settings(BaseSettings):
     COSMOS_DB_NOTIFICATIONS_CONTAINER: str = "notifications"
     COSMOS_DB_MESSAGES_CONTAINER: str = "messages"
     COSMOS_DB_USERS_CONTAINER: str = "users"
+    COSMOS_DB_CRAWL_STATE_CONTAINER: str = "crawl_state"
     
     # ========================================================================
     # Azure OpenAI
@@ -68,12 +150,70 @@ class Settings(BaseSettings):
     AZURE_OPENAI_EMBEDDING_DEPLOYMENT: str = "text-embedding-ada-002"
     AZURE_OPENAI_API_VERSION: str = "2024-02-01"
     
+    # OpenAI (used when Azure OpenAI is not configured)
+    OPENAI_API_KEY: Optional[str] = None
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    CHAT_MAX_TOKENS: int = 800  # Completion length limit for chat answers
+    CHAT_REQUEST_DEADLINE_SECONDS: float = 30  # Budget of a chat request, the LLM gets what is left
+    
+    # LLM calls (deadlines, failover, hedging)
+    LLM_TIMEOUT_SECONDS: float = 60  # Deadline of calls made without one (e.g. history summaries)
+    LLM_MAX_ATTEMPTS: int = 2  # Attempts per call, cycling through the configured providers
+    LLM_PROVIDER_COOLDOWN_SECONDS: int = 30  # A throttled provider is tried last for this long
+    LLM_HEDGE_ENABLED: bool = False  # Race a second attempt when the first is slower than p95
+    LLM_HEDGE_DELAY_SECONDS: float = 8  # Hedge delay until LLM_HEDGE_MIN_SAMPLES latencies are known
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_LATENCY_WINDOW: int = 200  # Recent latencies kept per provider for p50/p95
+    
+    # ========================================================================
+    # Chat History
+    # ========================================================================
+    CHAT_HISTORY_MAX_MESSAGES: int = 20  # Most recent messages read per turn (TOP of the history query)
+    CHAT_HISTORY_MAX_TOKENS: int = 2000  # Prompt tokens for history, rolling summary included
+    CHAT_HISTORY_SUMMARY_MAX_TOKENS: int = 300  # Length limit of the rolling summary
+    CHAT_HISTORY_SUMMARY_BATCH: int = 50  # Older messages folded into the summary per refresh
+    CHAT_HISTORY_PAGE_SIZE: int = 50  # Default page size of GET /chat/history
+    CHAT_HISTORY_MAX_PAGE_SIZE: int = 200
+
+    # ========================================================================
+    # Conversation Cache (read-through, conversations and recent messages)
+    # ========================================================================
+    CONVERSATION_CACHE_ENABLED: bool = True
+    CONVERSATION_CACHE_MAX_ENTRIES: int = 10000  # In-process LRU entries (two per active conversation)
+    CONVERSATION_CACHE_TTL_SECONDS: int = 300  # Entry lifetime, in process or in Redis
+    CONVERSATION_CACHE_REDIS_ENABLED: bool = False  # Shared second tier at REDIS_URL
+
+    # ========================================================================
+    # Chat Message Write-Behind
+    # ========================================================================
+    MESSAGE_WRITE_BEHIND_ENABLED: bool = False  # Acknowledge messages before they reach Cosmos
+    MESSAGE_WRITE_BEHIND_QUEUE_SIZE: int = 1000  # Requests wait for room beyond this
+    MESSAGE_WRITE_BEHIND_BATCH_SIZE: int = 50  # Messages per flush (Cosmos batches hold at most 100)
+    MESSAGE_WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 50  # Time to gather a batch
+    MESSAGE_WRITE_BEHIND_MAX_RETRIES: int = 5
+    MESSAGE_WRITE_BEHIND_DRAIN_TIMEOUT_SECONDS: float = 10  # Flush time allowed at shutdown
+    
+    # ========================================================================
+    # Semantic Answer Cache (first-turn questions)
+    # ========================================================================
+    ANSWER_CACHE_ENABLED: bool = True  # Needs the Azure OpenAI embedding deployment
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # Minimum cosine similarity to reuse an answer
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+    ANSWER_CACHE_MAX_ENTRIES: int = 5000  # Oldest entries are evicted beyond this
+
     # ========================================================================
     # Azure AI Search
     # ========================================================================
     AZURE_SEARCH_ENDPOINT: Optional[str] = None
     AZURE_SEARCH_KEY: Optional[str] = None
     AZURE_SEARCH_INDEX_NAME: str = "government-data"
+
+    # ========================================================================
+    # RAG Context
+    # ========================================================================
+    CONTEXT_SEARCH_TOP: int = 8  # Chunks retrieved per question
+    CONTEXT_MAX_TOKENS: int = 3000  # Prompt tokens for retrieved documents
+    CONTEXT_MIN_PASSAGE_TOKENS: int = 50  # Smaller leftovers of the budget are not filled
     
     # ========================================================================
     # Telegram
@@ -0,0 +1,65 @@
+# app/core/http_session.py
+"""Shared aiohttp connection pool.
+
+A single ClientSession is created for the lifetime of the application so that
+outbound HTTP calls (URL validation, scraping, Content Safety) reuse DNS
+lookups and keep-alive TCP/TLS connections instead of opening a new session
+per call. `init_http_session()` / `close_http_session()` are called from the
+FastAPI lifespan.
+"""
+from typing import Optional
+import aiohttp
+from app.config.settings import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Module-level session that will be initialized explicitly
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def _create_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=settings.HTTP_POOL_MAX_CONNECTIONS,
+        limit_per_host=settings.HTTP_POOL_MAX_CONNECTIONS_PER_HOST,
+        ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL_SECONDS,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT_SECONDS,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=settings.HTTP_DEFAULT_TIMEOUT_SECONDS),
+        headers={"User-Agent": settings.HTTP_USER_AGENT},
+    )
+
+
+async def init_http_session():
+    """Create the shared HTTP session. Call once at application startup."""
+    global _session
+    if _session is not None and not _session.closed:
+        return
+    _session = _create_session()
+    logger.info(
+        "HTTP session pool initialized (limit=%s, per_host=%s)",
+        settings.HTTP_POOL_MAX_CONNECTIONS,
+        settings.HTTP_POOL_MAX_CONNECTIONS_PER_HOST,
+    )
+
+
+async def close_http_session():
+    """Close the shared HTTP session and release pooled connections."""
+    global _session
+    if _session is not None:
+        try:
+            await _session.close()
+        except Exception:
+            logger.exception("Error while closing HTTP session")
+    _session = None
+    logger.info("HTTP session pool closed")
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared session, creating it lazily outside the app lifespan (scripts, workers)."""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
@@ -0,0 +1,114 @@
+# App-scoped service container
+import logging
+from functools import cached_property
+from azure.cosmos import CosmosClient
+from app.config.settings import settings
+from app.repositories.document_repository import DocumentRepository
+from app.services.azure_ai_service import AzureOpenAIService
+from app.services.search_service import SearchService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Services shared by every request, built once per application
+
+    Created in the FastAPI lifespan and stored on app.state.services;
+    endpoints get services through the dependencies in app.api.dependencies.
+    Each SDK client (Cosmos, OpenAI, AI Search) is constructed once, so its
+    connection pool and TLS sessions are reused across requests.
+
+    Services are built on first use rather than at startup, so a missing
+    setting for one integration (e.g. embeddings) does not stop the app.
+    """
+
+    @cached_property
+    def cosmos_client(self) -> CosmosClient:
+        """Sync Cosmos client of the documents container"""
+        return CosmosClient(settings.COSMOS_DB_ENDPOINT, settings.COSMOS_DB_KEY)
+
+    @cached_property
+    def document_repo(self) -> DocumentRepository:
+        return DocumentRepository(client=self.cosmos_client)
+
+    @cached_property
+    def ai_service(self) -> AzureOpenAIService:
+        return AzureOpenAIService()
+
+    @cached_property
+    def search_service(self) -> SearchService:
+        return SearchService()
+
+    @cached_property
+    def context_packer(self):
+        from app.services.context_packer_service import ContextPackerService
+        return ContextPackerService()
+
+    @cached_property
+    def conversation_cache(self):
+        """Read-through conversation cache, None when disabled"""
+        if not settings.CONVERSATION_CACHE_ENABLED:
+            return None
+        from app.services.conversation_cache_service import ConversationCacheService
+        return ConversationCacheService()
+
+    @cached_property
+    def message_writer(self):
+        from app.services.message_writer_service import MessageWriterService
+        return MessageWriterService(self.conversation_cache)
+
+    @cached_property
+    def history_service(self):
+        from app.services.conversation_history_service import ConversationHistoryService
+        return ConversationHistoryService(self.ai_service, self.message_writer)
+
+    @cached_property
+    def answer_cache(self):
+        from app.services.answer_cache_service import AnswerCacheService
+        embeddings = None
+        if settings.ANSWER_CACHE_ENABLED and settings.AZURE_OPENAI_ENDPOINT and settings.AZURE_OPENAI_API_KEY:
+            from app.services.embeddings_service import EmbeddingsService
+            embeddings = EmbeddingsService()
+        return AnswerCacheService(embeddings)
+
+    @cached_property
+    def search_index_service(self):
+        from app.services.search_index_service import SearchIndexService
+        return SearchIndexService()
+
+    @cached_property
+    def ingestion_service(self):
+        from app.services.document_ingestion_service import DocumentIngestionService
+        return DocumentIngestionService(
+            document_repo=self.document_repo,
+            # Only needed when a recrawl supersedes a document
+            search_index_factory=lambda: self.search_index_service
+        )
+
+    @cached_property
+    def rag_pipeline(self):
+        from app.services.rag_pipeline_service import RAGPipelineService
+        return RAGPipelineService(
+            document_repo=self.document_repo,
+            search_index=self.search_index_service
+        )
+
+    async def close(self):
+        """Close the clients that were built. Call once at application shutdown."""
+        built = self.__dict__
+        # The message writer first: draining it still needs Cosmos
+        for name in (
+            "message_writer", "conversation_cache", "history_service", "answer_cache",
+            "ingestion_service", "rag_pipeline", "ai_service", "search_service", "search_index_service"
+        ):
+            if built.get(name) is not None:
+                try:
+                    await built[name].close()
+                except Exception:
+                    logger.exception(f"Error while closing {name}")
+        if "cosmos_client" in built:
+            try:
+                built["cosmos_client"].close()
+            except Exception:
+                logger.exception("Error while closing Cosmos client")
+        built.clear()
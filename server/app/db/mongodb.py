@@ -67,6 +67,10 @@ async def _create_containers():
             "id": "users",
             "partition_key": PartitionKey(path="/id"),
         },
+        {
+            "id": settings.COSMOS_DB_CRAWL_STATE_CONTAINER,
+            "partition_key": PartitionKey(path="/id"),
+        },
     ]
     
     for container_def in containers:
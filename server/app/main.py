@@ -8,6 +8,10 @@ from app.api.v1.router import api_router
 from app.db.session import init_cosmos, close_cosmos
 from app.core.exceptions import setup_exception_handlers
 from app.db.mongodb import connect_to_cosmos, close_cosmos_connection
+from app.core.http_session import init_http_session, close_http_session
+from app.services.text_extraction_service import shutdown_extraction_executor
+from app.services.blob_storage_service import close_blob_storage_service
+from app.core.services import ServiceContainer
 import logging
 from fastapi.responses import RedirectResponse
 
@@ -24,6 +28,19 @@ async def lifespan(app: FastAPI):
     await connect_to_cosmos()
     logger.info("Cosmos DB connected successfully")
     
+    # Shared outbound HTTP connection pool
+    await init_http_session()
+    
+    # SDK clients and services shared by all requests
+    app.state.services = ServiceContainer()
+    
+    # Conditional-GET recrawl of ingested URLs
+    recrawl_scheduler = None
+    if settings.RECRAWL_ENABLED:
+        from app.services.recrawl_scheduler_service import RecrawlSchedulerService
+        recrawl_scheduler = RecrawlSchedulerService(app.state.services.ingestion_service)
+        recrawl_scheduler.start()
+    
     yield
     
     # Shutdown
@@ -32,6 +49,13 @@ async def lifespan(app: FastAPI):
     except Exception:
         logger.exception("Error closing Cosmos client on shutdown")
     logger.info("Shutting down Civi Chat API...")
+    if recrawl_scheduler is not None:
+        await recrawl_scheduler.stop()
+    # Drains the write-behind message queue before the Cosmos client is closed
+    await app.state.services.close()
+    await close_http_session()
+    await close_blob_storage_service()
+    shutdown_extraction_executor()
     await close_cosmos_connection()
     logger.info("Cosmos DB connection closed")
 
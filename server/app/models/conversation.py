@@ -4,12 +4,6 @@ from typing import Optional, List
 from datetime import datetime
 import uuid
 
-class Message(Base):
-    role: str
-    content: str
-    citations: Optional[List[dict]] = None
-    is_thinking: str = "false"
-
 class Message(BaseModel):
     """Message model for Cosmos DB"""
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -44,6 +38,9 @@ class Conversation(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     message_count: int = 0
+    summary: Optional[str] = None  # Rolling summary of turns no longer sent verbatim
+    summarized_until: Optional[datetime] = None  # Timestamp of the last message folded into summary
+    last_counted_message_id: Optional[str] = None  # Last message added to message_count (idempotent retries)
     
     class Config:
         json_encoders = {
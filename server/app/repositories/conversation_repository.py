@@ -1,21 +1,33 @@
 # Azure Cosmos DB repository for conversation and message CRUD operations
 from azure.cosmos.aio import DatabaseProxy
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError, CosmosResourceNotFoundError
 from app.models.conversation import Conversation, Message
-from typing import List, Optional, Dict
+from app.config.settings import settings
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
-class ConversationRepository(BaseRepository[Conversation]):
-    def __init__(self, container=None):
-        super().__init__("conversations", Conversation, container=container)
+def _conversation_key(conversation_id: str) -> str:
+    return f"conversation:{conversation_id}"
+
+
+def _recent_messages_key(conversation_id: str) -> str:
+    return f"messages:{conversation_id}"
+
 
 class ConversationRepository:
-    """Repository for managing conversations with Azure Cosmos DB"""
+    """Repository for managing conversations with Azure Cosmos DB
     
-    def __init__(self, db: DatabaseProxy):
+    With a ConversationCacheService, conversation reads and the recent
+    messages window (CHAT_HISTORY_MAX_MESSAGES) are read through the cache,
+    and writes update or invalidate the cached entries.
+    """
+    
+    def __init__(self, db: DatabaseProxy, cache=None):
         self.db = db
+        self.cache = cache
         self.conversations_container = db.get_container_client("conversations")
         self.messages_container = db.get_container_client("messages")
     
@@ -26,10 +38,39 @@ class ConversationRepository:
         
         await self.conversations_container.create_item(body=conversation_dict)
         
+        if self.cache is not None:
+            await self.cache.set(_conversation_key(conversation.id), conversation_dict)
+            await self.cache.set(_recent_messages_key(conversation.id), [])
+        
         return conversation
     
     async def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
         """Get conversation by ID"""
+        if self.cache is None:
+            return await self._read_conversation(conversation_id)
+        
+        async def load():
+            conversation = await self._read_conversation(conversation_id)
+            return conversation.model_dump(mode='json') if conversation else None
+        
+        data = await self.cache.get_or_load(_conversation_key(conversation_id), load)
+        return Conversation(**data) if data else None
+    
+    async def read_conversation_version(self, conversation_id: str) -> Tuple[Optional[Conversation], Optional[str]]:
+        """
+        Uncached point read of a conversation and its Cosmos _etag, which
+        changes on every write to it (for HTTP validators)
+        """
+        item = await self._read_conversation_item(conversation_id)
+        if item is None:
+            return None, None
+        return Conversation(**item), item.get("_etag")
+    
+    async def _read_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        item = await self._read_conversation_item(conversation_id)
+        return Conversation(**item) if item is not None else None
+    
+    async def _read_conversation_item(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         try:
             logger.info(f"Looking for conversation: {conversation_id}")
             item = await self.conversations_container.read_item(
@@ -37,7 +78,7 @@ class ConversationRepository:
                 partition_key=conversation_id
             )
             logger.info(f"Conversation found: {item.get('id')}")
-            return Conversation(**item)
+            return item
         except Exception as e:
             logger.error(f"Error getting conversation {conversation_id}: {str(e)}")
             return None
@@ -48,36 +89,124 @@ class ConversationRepository:
         role: str,
         content: str,
         citations: Optional[List[dict]] = None
-    ) -> Optional[Conversation]:
-        conversation = self.get_conversation(conversation_id)
-        if not conversation:
-            return None
-        
+    ) -> Optional[Message]:
+        """Add a message to a conversation (None if the conversation does not exist)"""
         message = Message(
+            conversation_id=conversation_id,
             role=role,
             content=content,
             citations=citations,
             timestamp=datetime.utcnow()
         )
-        message_dict = message.model_dump(mode='json')
-        
-        await self.messages_container.create_item(body=message_dict)
+        if not await self.save_messages(conversation_id, [message]):
+            return None
+        return message
+    
+    async def save_messages(self, conversation_id: str, messages: List[Message]) -> bool:
+        """
+        Persist messages of one conversation in two writes and no reads.
+
+        Conversations and messages live in different containers (and
+        partitions), so the two writes cannot share a transactional batch.
+        The conversation is patched first (atomic increment of message_count,
+        which also tells whether it exists), then the messages are upserted,
+        in one transactional batch when there are several; if that fails,
+        the increment is undone before the error is raised.
+
+        Retrying the same messages is safe: upserts are idempotent, and the
+        increment records the last message it counted and is skipped when
+        that message was already counted (even if its undo failed or its
+        response was lost).
+
+        Returns False if the conversation does not exist.
+        """
+        try:
+            await self._count_messages(conversation_id, messages)
+        except CosmosResourceNotFoundError:
+            logger.error(f"Cannot add messages, conversation {conversation_id} not found")
+            if self.cache is not None:
+                await self.cache.invalidate(
+                    _conversation_key(conversation_id),
+                    _recent_messages_key(conversation_id)
+                )
+            return False
         
-        # Update conversation updated_at and message_count
         try:
-            conv = await self.get_conversation(conversation_id)
-            if conv:
-                conv.updated_at = datetime.utcnow()
-                conv.message_count += 1
-                await self.conversations_container.replace_item(
-                    item=conversation_id,
-                    body=conv.model_dump(mode='json'),
+            if len(messages) == 1:
+                await self.messages_container.upsert_item(body=messages[0].model_dump(mode='json'))
+            else:
+                await self.messages_container.execute_item_batch(
+                    batch_operations=[("upsert", (m.model_dump(mode='json'),)) for m in messages],
                     partition_key=conversation_id
                 )
-        except Exception as e:
-            logger.warning(f"Could not update conversation {conversation_id}: {str(e)}")
+        except Exception:
+            try:
+                await self._uncount_messages(conversation_id, len(messages))
+            except Exception as e:
+                logger.error(f"Could not undo message_count of conversation {conversation_id}: {str(e)}")
+            raise
         
-        return message
+        if self.cache is not None:
+            await self._cache_appended(conversation_id, messages)
+        
+        return True
+    
+    async def _cache_appended(self, conversation_id: str, messages: List[Message]):
+        """Apply the writes of save_messages to the cached conversation and recent messages"""
+        dumped = [m.model_dump(mode='json') for m in messages]
+        
+        def update_conversation(data: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                **data,
+                "message_count": data.get("message_count", 0) + len(messages),
+                "updated_at": dumped[-1]["timestamp"]
+            }
+        
+        def update_recent(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            known = {m["id"] for m in data}
+            recent = data + [m for m in dumped if m["id"] not in known]
+            recent.sort(key=lambda m: m["timestamp"])
+            return recent[-settings.CHAT_HISTORY_MAX_MESSAGES:]
+        
+        await self.cache.update(_conversation_key(conversation_id), update_conversation)
+        await self.cache.update(_recent_messages_key(conversation_id), update_recent)
+    
+    async def _count_messages(self, conversation_id: str, messages: List[Message]):
+        """
+        Add messages to message_count (server-side, safe under concurrent
+        appends) unless the last of them is already counted
+        """
+        last_id = messages[-1].id
+        try:
+            await self.conversations_container.patch_item(
+                item=conversation_id,
+                partition_key=conversation_id,
+                patch_operations=[
+                    {"op": "incr", "path": "/message_count", "value": len(messages)},
+                    {"op": "set", "path": "/updated_at", "value": messages[-1].timestamp.isoformat()},
+                    {"op": "set", "path": "/last_counted_message_id", "value": last_id}
+                ],
+                # Message ids are generated UUIDs, safe to inline
+                filter_predicate=(
+                    "FROM c WHERE NOT IS_DEFINED(c.last_counted_message_id) "
+                    f"OR c.last_counted_message_id != '{last_id}'"
+                ),
+                no_response=True
+            )
+        except CosmosAccessConditionFailedError:
+            logger.info(f"Messages up to {last_id} of conversation {conversation_id} already counted")
+    
+    async def _uncount_messages(self, conversation_id: str, count: int):
+        """Undo _count_messages, so a retry of the same messages counts them again"""
+        await self.conversations_container.patch_item(
+            item=conversation_id,
+            partition_key=conversation_id,
+            patch_operations=[
+                {"op": "incr", "path": "/message_count", "value": -count},
+                {"op": "set", "path": "/last_counted_message_id", "value": None}
+            ],
+            no_response=True
+        )
     
     async def get_conversation_messages(self, conversation_id: str) -> List[Message]:
         """Get all messages for a conversation ordered by timestamp"""
@@ -94,6 +223,128 @@ class ConversationRepository:
         
         return messages
     
+    async def get_messages_page(
+        self,
+        conversation_id: str,
+        limit: int,
+        continuation_token: Optional[str] = None
+    ) -> Tuple[List[Message], Optional[str]]:
+        """
+        One page of messages, newest first, and the continuation token of
+        the next (older) page, None on the last page
+        """
+        query = (
+            "SELECT * FROM c WHERE c.conversation_id = @conversation_id "
+            "ORDER BY c.timestamp DESC"
+        )
+        parameters = [{"name": "@conversation_id", "value": conversation_id}]
+        
+        pages = self.messages_container.query_items(
+            query=query,
+            parameters=parameters,
+            partition_key=conversation_id,
+            max_item_count=limit
+        ).by_page(continuation_token)
+        
+        messages = []
+        async for page in pages:
+            async for item in page:
+                messages.append(Message(**item))
+            break
+        
+        return messages, pages.continuation_token
+    
+    async def get_recent_messages(self, conversation_id: str, limit: int) -> List[Message]:
+        """Get the `limit` most recent messages, oldest first"""
+        if self.cache is None or limit > settings.CHAT_HISTORY_MAX_MESSAGES:
+            return await self._query_recent_messages(conversation_id, limit)
+        
+        async def load():
+            messages = await self._query_recent_messages(conversation_id, settings.CHAT_HISTORY_MAX_MESSAGES)
+            return [m.model_dump(mode='json') for m in messages]
+        
+        data = await self.cache.get_or_load(_recent_messages_key(conversation_id), load)
+        return [Message(**m) for m in data[-limit:]] if limit else []
+    
+    async def _query_recent_messages(self, conversation_id: str, limit: int) -> List[Message]:
+        query = (
+            "SELECT TOP @limit * FROM c WHERE c.conversation_id = @conversation_id "
+            "ORDER BY c.timestamp DESC"
+        )
+        parameters = [
+            {"name": "@limit", "value": limit},
+            {"name": "@conversation_id", "value": conversation_id}
+        ]
+        
+        messages = []
+        async for item in self.messages_container.query_items(
+            query=query,
+            parameters=parameters,
+            partition_key=conversation_id
+        ):
+            messages.append(Message(**item))
+        
+        messages.reverse()
+        return messages
+    
+    async def get_messages_between(
+        self,
+        conversation_id: str,
+        after: Optional[datetime],
+        before: datetime,
+        limit: int
+    ) -> List[Message]:
+        """Get up to `limit` messages with after < timestamp < before, oldest first"""
+        query = (
+            "SELECT TOP @limit * FROM c WHERE c.conversation_id = @conversation_id "
+            "AND c.timestamp < @before"
+        )
+        parameters = [
+            {"name": "@limit", "value": limit},
+            {"name": "@conversation_id", "value": conversation_id},
+            {"name": "@before", "value": before.isoformat()}
+        ]
+        if after is not None:
+            query += " AND c.timestamp > @after"
+            parameters.append({"name": "@after", "value": after.isoformat()})
+        query += " ORDER BY c.timestamp ASC"
+        
+        messages = []
+        async for item in self.messages_container.query_items(
+            query=query,
+            parameters=parameters,
+            partition_key=conversation_id
+        ):
+            messages.append(Message(**item))
+        
+        return messages
+    
+    async def update_summary(
+        self,
+        conversation_id: str,
+        summary: str,
+        summarized_until: datetime
+    ) -> bool:
+        """Store the rolling summary without rewriting the rest of the conversation"""
+        try:
+            await self.conversations_container.patch_item(
+                item=conversation_id,
+                partition_key=conversation_id,
+                patch_operations=[
+                    {"op": "set", "path": "/summary", "value": summary},
+                    {"op": "set", "path": "/summarized_until", "value": summarized_until.isoformat()}
+                ]
+            )
+            if self.cache is not None:
+                await self.cache.update(
+                    _conversation_key(conversation_id),
+                    lambda data: {**data, "summary": summary, "summarized_until": summarized_until.isoformat()}
+                )
+            return True
+        except Exception as e:
+            logger.warning(f"Could not update summary of conversation {conversation_id}: {str(e)}")
+            return False
+    
     async def get_conversation_with_messages(self, conversation_id: str) -> Optional[Dict]:
         """Get conversation with all messages"""
         conversation = await self.get_conversation(conversation_id)
@@ -130,6 +381,12 @@ class ConversationRepository:
                 partition_key=conversation_id
             )
             
+            if self.cache is not None:
+                await self.cache.invalidate(
+                    _conversation_key(conversation_id),
+                    _recent_messages_key(conversation_id)
+                )
+            
             return True
         except Exception as e:
             logger.error(f"Error deleting conversation {conversation_id}: {str(e)}")
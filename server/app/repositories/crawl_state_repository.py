@@ -0,0 +1,129 @@
+# app/repositories/crawl_state_repository.py
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional
+from azure.cosmos.aio import DatabaseProxy
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from app.db.mongodb import get_database
+from app.schemas.document import CrawledURL
+from app.config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlStateRepository:
+    """Repository for URL crawl state in Cosmos DB
+
+    Uses the app's shared async database (its container is created at
+    startup with the others), looked up on first use so the repository can
+    be built before the connection is opened.
+    """
+
+    def __init__(self, db: Optional[DatabaseProxy] = None):
+        self._db = db
+        self._container = None
+
+    @property
+    def container(self):
+        if self._container is None:
+            db = self._db or get_database()
+            self._container = db.get_container_client(settings.COSMOS_DB_CRAWL_STATE_CONTAINER)
+        return self._container
+
+    async def get_state(self, url: str) -> Optional[CrawledURL]:
+        """Get crawl state of a URL"""
+        state_id = CrawledURL.id_for_url(url)
+        try:
+            item = await self.container.read_item(item=state_id, partition_key=state_id)
+            return CrawledURL(**item)
+        except CosmosResourceNotFoundError:
+            return None
+
+    async def upsert_state(self, state: CrawledURL) -> CrawledURL:
+        """Create or replace crawl state"""
+        await self.container.upsert_item(body=state.model_dump(mode='json'))
+        return state
+
+    async def get_due(self, now: datetime, limit: int = 50) -> List[CrawledURL]:
+        """Get URLs whose next crawl time has passed, oldest first"""
+        query = (
+            "SELECT TOP @limit * FROM c WHERE c.next_crawl_at <= @now "
+            "ORDER BY c.next_crawl_at ASC"
+        )
+        parameters = [
+            {"name": "@limit", "value": limit},
+            {"name": "@now", "value": now.isoformat()}
+        ]
+        states = []
+        async for item in self.container.query_items(query=query, parameters=parameters):
+            states.append(CrawledURL(**item))
+        return states
+
+
+class SQLiteCrawlStateRepository:
+    """Crawl state in a local SQLite file (tests, single-node deployments)"""
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS crawl_state ("
+                "id TEXT PRIMARY KEY, next_crawl_at TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_crawl_state_next ON crawl_state (next_crawl_at)"
+            )
+            self._db.commit()
+
+    async def get_state(self, url: str) -> Optional[CrawledURL]:
+        row = await asyncio.to_thread(
+            self._fetch_one,
+            "SELECT data FROM crawl_state WHERE id = ?",
+            (CrawledURL.id_for_url(url),)
+        )
+        return CrawledURL(**json.loads(row[0])) if row else None
+
+    async def upsert_state(self, state: CrawledURL) -> CrawledURL:
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO crawl_state (id, next_crawl_at, data) VALUES (?, ?, ?)",
+            (state.id, state.next_crawl_at.isoformat(), json.dumps(state.model_dump(mode='json')))
+        )
+        return state
+
+    async def get_due(self, now: datetime, limit: int = 50) -> List[CrawledURL]:
+        rows = await asyncio.to_thread(
+            self._fetch_all,
+            "SELECT data FROM crawl_state WHERE next_crawl_at <= ? ORDER BY next_crawl_at ASC LIMIT ?",
+            (now.isoformat(), limit)
+        )
+        return [CrawledURL(**json.loads(row[0])) for row in rows]
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock:
+            self._db.execute(sql, params)
+            self._db.commit()
+
+    def _fetch_one(self, sql: str, params: tuple):
+        with self._lock:
+            return self._db.execute(sql, params).fetchone()
+
+    def _fetch_all(self, sql: str, params: tuple):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+
+def get_crawl_state_repository():
+    """Crawl state repository selected by CRAWL_STATE_BACKEND (cosmos or sqlite)"""
+    if settings.CRAWL_STATE_BACKEND == "sqlite":
+        return SQLiteCrawlStateRepository(settings.CRAWL_STATE_SQLITE_PATH)
+    return CrawlStateRepository()
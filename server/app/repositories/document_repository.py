@@ -1,5 +1,7 @@
 # app/repositories/document_repository.py
+import asyncio
 import logging
+from datetime import datetime
 from typing import Optional, List
 from azure.cosmos import CosmosClient, PartitionKey
 from azure.cosmos.exceptions import CosmosResourceNotFoundError
@@ -13,8 +15,9 @@ logger = logging.getLogger(__name__)
 class DocumentRepository:
     """Repository for Document operations in Cosmos DB"""
     
-    def __init__(self):
-        self.client = CosmosClient(
+    def __init__(self, client: Optional[CosmosClient] = None):
+        # Pass the app's shared client to reuse its connection pool
+        self.client = client or CosmosClient(
             settings.COSMOS_DB_ENDPOINT,
             settings.COSMOS_DB_KEY
         )
@@ -49,6 +52,32 @@ class DocumentRepository:
             logger.error(f"Error reading document: {str(e)}")
             raise
     
+    async def get_document_by_content_hash(self, content_hash: str) -> Optional[Document]:
+        """Get a previously ingested (not failed or superseded) document with the same SHA-256"""
+        try:
+            # Cross-partition query on the sync client: keep it off the event loop
+            items = await asyncio.to_thread(self._query_by_content_hash, content_hash)
+            return Document(**items[0]) if items else None
+        except Exception as e:
+            logger.error(f"Error querying document by hash: {str(e)}")
+            raise
+    
+    def _query_by_content_hash(self, content_hash: str) -> List[dict]:
+        query = (
+            "SELECT TOP 1 * FROM c WHERE c.content_hash = @content_hash "
+            "AND c.status != @failed AND c.status != @superseded"
+        )
+        parameters = [
+            {"name": "@content_hash", "value": content_hash},
+            {"name": "@failed", "value": DocumentStatus.FAILED.value},
+            {"name": "@superseded", "value": DocumentStatus.SUPERSEDED.value}
+        ]
+        return list(self.container.query_items(
+            query=query,
+            parameters=parameters,
+            enable_cross_partition_query=True
+        ))
+    
     async def update_document(self, document: Document) -> Document:
         """Update existing document"""
         try:
@@ -63,6 +92,24 @@ class DocumentRepository:
             logger.error(f"Error updating document: {str(e)}")
             raise
     
+    async def mark_superseded(self, document_id: str, superseded_by: str):
+        """Mark a document as replaced by a newer version (partial update, no read)"""
+        try:
+            await asyncio.to_thread(
+                self.container.patch_item,
+                item=document_id,
+                partition_key=document_id,
+                patch_operations=[
+                    {"op": "set", "path": "/status", "value": DocumentStatus.SUPERSEDED.value},
+                    {"op": "set", "path": "/superseded_by", "value": superseded_by},
+                    {"op": "set", "path": "/superseded_at", "value": datetime.utcnow().isoformat()}
+                ]
+            )
+            logger.info(f"Document superseded: {document_id} -> {superseded_by}")
+        except Exception as e:
+            logger.error(f"Error superseding document: {str(e)}")
+            raise
+    
     async def get_documents_by_status(
         self, 
         status: DocumentStatus,
@@ -7,10 +7,6 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-class NotificationRepository(BaseRepository[Notification]):
-    def __init__(self):
-        super().__init__("notifications", Notification)
-
 class NotificationRepository:
     """Repository for managing notifications with Azure Cosmos DB"""
     
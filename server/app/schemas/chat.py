@@ -47,8 +47,9 @@ class ChatMessageResponse(BaseModel):
 
 
 class ConversationHistoryResponse(BaseModel):
-    """Response for conversation history"""
+    """Response for conversation history: one page of messages, newest first"""
     conversation_id: str
     messages: List[MessageSchema]
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+    next_cursor: Optional[str] = None  # Pass as `before` to get older messages; None on the last page
\ No newline at end of file
@@ -3,6 +3,7 @@ from pydantic import BaseModel, HttpUrl, Field
 from typing import List, Optional
 from datetime import datetime
 from enum import Enum
+import hashlib
 
 
 class DocumentStatus(str, Enum):
@@ -13,6 +14,7 @@ class DocumentStatus(str, Enum):
     PENDING_CHUNKING = "pending_chunking"
     INDEXED = "indexed"
     FAILED = "failed"
+    SUPERSEDED = "superseded"  # Replaced by a newer version of the same URL
 
 
 class URLItem(BaseModel):
@@ -36,8 +38,34 @@ class DocumentIngestResponse(BaseModel):
     urls_processed: int
     files_accepted: List[str]
     files_rejected: List[str]
+    files_duplicate: List[str] = []  # "filename: existing_document_id"
     urls_accepted: List[str]
     urls_rejected: List[str]
+    urls_duplicate: List[str] = []  # "url: existing_document_id"
+
+
+class IngestItemEvent(BaseModel):
+    """Streaming ingestion event for one file or URL"""
+    event: str = "item"
+    kind: str  # file or url
+    index: int  # position in the request's files / urls
+    name: str  # filename or url
+    status: str  # accepted, rejected or duplicate
+    document_id: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class IngestSummaryEvent(BaseModel):
+    """Final streaming ingestion event: counts only, no per-item lists"""
+    event: str = "summary"
+    files_processed: int
+    urls_processed: int
+    files_accepted: int = 0
+    files_rejected: int = 0
+    files_duplicate: int = 0
+    urls_accepted: int = 0
+    urls_rejected: int = 0
+    urls_duplicate: int = 0
 
 
 # ============================================================================
@@ -50,6 +78,7 @@ class Document(BaseModel):
     original_filename: str
     content_type: str  # application/pdf, application/vnd.openxmlformats-officedocument.wordprocessingml.document
     file_size: int  # bytes
+    content_hash: Optional[str] = None  # SHA-256 of the stored bytes
     
     # Storage
     blob_url: str  # Azure Blob Storage URL
@@ -79,6 +108,42 @@ class Document(BaseModel):
     validated_at: Optional[datetime] = None
     indexed_at: Optional[datetime] = None
     
+    # Recrawls: the document that replaced this one
+    superseded_by: Optional[str] = None
+    superseded_at: Optional[datetime] = None
+    
+    class Config:
+        json_encoders = {
+            datetime: lambda v: v.isoformat()
+        }
+
+
+# ============================================================================
+# Crawl state for conditional recrawls of ingested URLs
+# ============================================================================
+class CrawledURL(BaseModel):
+    """Validators and content hash of an ingested URL"""
+    id: str  # SHA-256 of the URL (Cosmos ids cannot contain "/")
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    document_id: Optional[str] = None
+    
+    # Scheduling
+    last_status: Optional[int] = None
+    last_crawled_at: Optional[datetime] = None
+    last_changed_at: Optional[datetime] = None
+    next_crawl_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    @classmethod
+    def for_url(cls, url: str) -> "CrawledURL":
+        return cls(id=cls.id_for_url(url), url=url)
+    
+    @staticmethod
+    def id_for_url(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+    
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat()
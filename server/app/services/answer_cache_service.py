@@ -0,0 +1,175 @@
+# app/services/answer_cache_service.py
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.services.search_index_service import get_index_generation
+from app.config.settings import settings
+from app.utils.metrics import civi_metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class CachedAnswer:
+    """Answer and citations given to a first-turn question"""
+    def __init__(self, question: str, answer: str, citations: List[Dict], generation: int):
+        self.question = question
+        self.answer = answer
+        self.citations = citations
+        self.generation = generation
+        self.created_at = time.monotonic()
+        self.hits = 0
+
+
+class SemanticAnswerCache:
+    """In-memory vector store of answers, looked up by cosine similarity
+
+    Vectors are kept normalized in one preallocated float32 matrix, so a
+    lookup is a single matrix-vector product over all entries. Entries
+    expire after ttl_seconds, the oldest are evicted beyond max_entries, and
+    everything is dropped when the search index generation changes (answers
+    may cite chunks that were re-indexed or deleted).
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: int, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[CachedAnswer]] = [None] * max_entries
+        self._order: "OrderedDict[int, None]" = OrderedDict()  # slots, oldest first
+        self._free: List[int] = []
+        self._high_water = 0
+        self._generation = get_index_generation()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    def lookup(self, vector: List[float]) -> Optional[CachedAnswer]:
+        self._check_generation()
+        self._expire()
+        if not self._order:
+            self.stats["misses"] += 1
+            return None
+
+        query = self._normalize(vector)
+        similarities = self._vectors[:self._high_water] @ query
+        slot = int(np.argmax(similarities))
+        # Free slots are zeroed, so they never reach the threshold
+        if similarities[slot] < self.threshold:
+            self.stats["misses"] += 1
+            return None
+
+        entry = self._entries[slot]
+        entry.hits += 1
+        self.stats["hits"] += 1
+        return entry
+
+    def store(self, vector: List[float], question: str, answer: str, citations: List[Dict]):
+        self._check_generation()
+        query = self._normalize(vector)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, query.shape[0]), dtype=np.float32)
+        elif self._order and float(np.max(self._vectors[:self._high_water] @ query)) >= self.threshold:
+            # A concurrent miss already stored an answer to the same question
+            return
+
+        if len(self._order) >= self.max_entries:
+            self._remove(next(iter(self._order)))
+            self.stats["evictions"] += 1
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self._high_water
+            self._high_water += 1
+
+        self._vectors[slot] = query
+        self._entries[slot] = CachedAnswer(question, answer, citations, self._generation)
+        self._order[slot] = None
+        self.stats["stores"] += 1
+
+    def snapshot(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._order),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "index_generation": self._generation,
+        }
+
+    def _check_generation(self):
+        generation = get_index_generation()
+        if generation != self._generation:
+            if self._order:
+                logger.info(f"Search index changed, dropping {len(self._order)} cached answers")
+                self.stats["invalidations"] += 1
+            for slot in list(self._order):
+                self._remove(slot)
+            self._free.clear()
+            self._high_water = 0
+            self._generation = generation
+
+    def _expire(self):
+        # Slots are in insertion order and share one TTL: expired ones are at the front
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._order:
+            slot = next(iter(self._order))
+            if self._entries[slot].created_at > deadline:
+                break
+            self._remove(slot)
+            self.stats["evictions"] += 1
+
+    def _remove(self, slot: int):
+        del self._order[slot]
+        self._entries[slot] = None
+        self._vectors[slot] = 0
+        self._free.append(slot)
+
+    def _normalize(self, vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+
+class AnswerCacheService:
+    """Reuses answers to first-turn questions that are semantically the same
+
+    The question is embedded with the Azure OpenAI embedding deployment and
+    looked up in a SemanticAnswerCache. Disabled (every lookup misses) when
+    ANSWER_CACHE_ENABLED is off or embeddings are not configured.
+    """
+
+    def __init__(self, embeddings=None):
+        self.cache = SemanticAnswerCache(
+            threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+        )
+        self.embeddings = embeddings
+        self.enabled = settings.ANSWER_CACHE_ENABLED and embeddings is not None
+        if settings.ANSWER_CACHE_ENABLED and embeddings is None:
+            logger.warning("Embeddings not configured - semantic answer cache disabled")
+
+    async def lookup(self, question: str) -> Tuple[Optional[List[float]], Optional[CachedAnswer]]:
+        """Return (question embedding, cached answer or None); the embedding is reused by store"""
+        if not self.enabled:
+            return None, None
+        try:
+            vector = await self.embeddings.embed_query(" ".join(question.split()))
+        except Exception as e:
+            logger.error(f"Error embedding question for the answer cache: {str(e)}")
+            return None, None
+        cached = self.cache.lookup(vector)
+        civi_metrics.record_answer_cache_lookup(cached is not None)
+        return vector, cached
+
+    def store(self, vector: Optional[List[float]], question: str, answer: str, citations: List[Dict]):
+        if self.enabled and vector is not None and answer:
+            self.cache.store(vector, question, answer, citations)
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, **self.cache.snapshot()}
+
+    async def close(self):
+        if self.embeddings is not None:
+            await self.embeddings.close()
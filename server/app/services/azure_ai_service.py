@@ -1,85 +1,436 @@
 # Azure OpenAI integration
-import os
-from openai import AzureOpenAI, OpenAI
+import asyncio
+import time
+from collections import deque
+from openai import (
+    AsyncAzureOpenAI,
+    AsyncOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
 from app.config.settings import settings
-from typing import List, Dict, Optional
+from app.utils.metrics import civi_metrics
+from typing import AsyncIterator, List, Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class LLMUnavailableError(Exception):
+    """No provider returned a completion before the deadline"""
+
+
+# Worth another attempt (same or other provider); anything else is a bad request
+RETRYABLE_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+
+def _failure_kind(error: Exception) -> str:
+    if isinstance(error, RateLimitError):
+        return "throttled"
+    if isinstance(error, (APITimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, APIConnectionError):
+        return "connection"
+    if isinstance(error, InternalServerError):
+        return "server_error"
+    return "other"
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMProvider:
+    """One configured chat endpoint with its latency windows and counters
+
+    Full completion latencies drive the hedge delay; time to first token of
+    streamed calls is much shorter and is kept in a window of its own.
+    """
+
+    def __init__(self, name: str, client, model: str):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.latencies = deque(maxlen=settings.LLM_LATENCY_WINDOW)
+        self.first_token_latencies = deque(maxlen=settings.LLM_LATENCY_WINDOW)
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.successes = 0
+        self.failures: Dict[str, int] = {}
+
+    @property
+    def cooling_down(self) -> bool:
+        return self.cooldown_until > time.monotonic()
+
+    def percentile(self, q: float) -> Optional[float]:
+        return _percentile(self.latencies, q)
+
+    def hedge_delay(self) -> float:
+        """p95 latency once there are enough samples, the configured delay before"""
+        if len(self.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DELAY_SECONDS
+        return self.percentile(0.95)
+
+    def record_success(self, latency: float):
+        self.successes += 1
+        self.latencies.append(latency)
+        civi_metrics.record_llm_call(self.name, latency * 1000)
+
+    def record_first_token(self, latency: float):
+        """A streamed call produced its first token (not a completion latency)"""
+        self.successes += 1
+        self.first_token_latencies.append(latency)
+        civi_metrics.record_llm_first_token(self.name, latency * 1000)
+
+    def record_failure(self, error: Exception):
+        kind = _failure_kind(error)
+        self.failures[kind] = self.failures.get(kind, 0) + 1
+        civi_metrics.record_llm_failure(self.name, kind)
+        if kind == "throttled":
+            # Send traffic to the other provider for a while
+            self.cooldown_until = time.monotonic() + settings.LLM_PROVIDER_COOLDOWN_SECONDS
+
+    def snapshot(self) -> Dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        ttft_p50 = _percentile(self.first_token_latencies, 0.5)
+        ttft_p95 = _percentile(self.first_token_latencies, 0.95)
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": dict(self.failures),
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "ttft_p50_ms": round(ttft_p50 * 1000) if ttft_p50 is not None else None,
+            "ttft_p95_ms": round(ttft_p95 * 1000) if ttft_p95 is not None else None,
+            "cooling_down": self.cooling_down,
+        }
+
+
 class AzureOpenAIService:
+    """Chat completions over the async OpenAI SDK
+
+    Azure OpenAI and OpenAI are both used when both are configured (Azure
+    first). Every call has a deadline, passed down by the endpoint; an
+    attempt that fails with a timeout, throttling or a server error fails
+    over to the next provider (a throttled provider is also skipped for
+    LLM_PROVIDER_COOLDOWN_SECONDS), up to LLM_MAX_ATTEMPTS. With
+    LLM_HEDGE_ENABLED a second attempt is started when the first has not
+    answered after the provider's p95 latency, and the first answer wins.
+
+    Failures raise LLMUnavailableError and are exported as OpenTelemetry
+    metrics (llm_failures_total, llm_retries_total, azure_ai_call_duration)
+    and in stats(); the mock response is only used when no provider is
+    configured at all.
+    """
+
     def __init__(self):
-        # Priority: Azure OpenAI > OpenAI regular > Mock
+        self.providers: List[LLMProvider] = []
+        # The SDK's own retries would ignore the deadline: attempts are managed here
         if settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT:
-            self.client = AzureOpenAI(
-                api_key=settings.AZURE_OPENAI_API_KEY,
-                api_version=settings.AZURE_OPENAI_API_VERSION,
-                azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
-            )
-            self.model_name = settings.AZURE_OPENAI_DEPLOYMENT_NAME
-            self.enabled = True
-            self.use_azure = True
-            logger.info("Using Azure OpenAI")
-        elif settings.OPENAI_API_KEY:
-            self.client = OpenAI(
-                api_key=settings.OPENAI_API_KEY
-            )
-            self.model_name = settings.OPENAI_MODEL
-            self.enabled = True
-            self.use_azure = False
-            logger.info(f"Using OpenAI with model: {self.model_name}")
+            self.providers.append(LLMProvider(
+                "azure",
+                AsyncAzureOpenAI(
+                    api_key=settings.AZURE_OPENAI_API_KEY,
+                    api_version=settings.AZURE_OPENAI_API_VERSION,
+                    azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+                    max_retries=0
+                ),
+                settings.AZURE_OPENAI_DEPLOYMENT_NAME
+            ))
+        if settings.OPENAI_API_KEY:
+            self.providers.append(LLMProvider(
+                "openai",
+                AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0),
+                settings.OPENAI_MODEL
+            ))
+        
+        self.enabled = bool(self.providers)
+        self.use_azure = self.enabled and self.providers[0].name == "azure"
+        self.model_name = self.providers[0].model if self.enabled else None
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        if self.enabled:
+            logger.info(f"Using LLM providers: {', '.join(f'{p.name} ({p.model})' for p in self.providers)}")
         else:
-            self.client = None
-            self.enabled = False
-            self.use_azure = False
             logger.warning("No AI service configured - using mock responses")
     
     async def get_chat_completion(
         self,
         messages: List[Dict],
         temperature: float = 0.7,
-        context_documents: Optional[List[Dict]] = None
+        context_documents: Optional[List[Dict]] = None,
+        deadline: Optional[float] = None
     ) -> str:
         """
         Get chat completion from Azure OpenAI or OpenAI with optional context from search
+
+        deadline is a time.monotonic() timestamp; LLM_TIMEOUT_SECONDS from
+        now when not given. Raises LLMUnavailableError.
         """
         if not self.enabled:
             return self._get_mock_response(messages, context_documents)
         
+        return await self._complete(
+            self._build_messages(messages, context_documents),
+            temperature=temperature,
+            max_tokens=settings.CHAT_MAX_TOKENS,
+            deadline=deadline
+        )
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.7,
+        context_documents: Optional[List[Dict]] = None,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the chat completion as text deltas, as the model produces them.
+
+        Attempts fail over between providers until the first token arrives
+        (which must happen before the deadline); errors after that propagate.
+        Raises LLMUnavailableError. Streams the mock response in word-sized
+        deltas when no AI service is configured.
+        """
+        if not self.enabled:
+            for delta in self._split_deltas(self._get_mock_response(messages, context_documents)):
+                yield delta
+            return
+        
+        deadline = deadline or time.monotonic() + settings.LLM_TIMEOUT_SECONDS
+        enhanced_messages = self._build_messages(messages, context_documents)
+        last_error: Optional[Exception] = None
+        for attempt, provider in enumerate(self._attempt_order()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt:
+                self.failovers += 1
+                civi_metrics.record_llm_retry("failover")
+            provider.requests += 1
+            started_at = time.monotonic()
+            stream = None
+            try:
+                stream = await provider.client.chat.completions.create(
+                    model=provider.model,
+                    messages=enhanced_messages,
+                    temperature=temperature,
+                    max_tokens=settings.CHAT_MAX_TOKENS,
+                    stream=True,
+                    timeout=remaining
+                )
+                chunks = stream.__aiter__()
+                first = await asyncio.wait_for(
+                    self._first_delta(chunks), timeout=max(deadline - time.monotonic(), 0.001)
+                )
+            except RETRYABLE_ERRORS + (asyncio.TimeoutError,) as e:
+                await self._close_stream(stream)
+                provider.record_failure(e)
+                logger.warning(f"LLM stream attempt on {provider.name} failed: {str(e) or type(e).__name__}")
+                last_error = e
+                continue
+            except Exception as e:
+                await self._close_stream(stream)
+                provider.record_failure(e)
+                raise LLMUnavailableError(f"{provider.name}: {str(e)}") from e
+            except asyncio.CancelledError:
+                await self._close_stream(stream)
+                raise
+            
+            provider.record_first_token(time.monotonic() - started_at)
+            try:
+                if first:
+                    yield first
+                async for chunk in chunks:
+                    # Azure sends a first chunk with prompt filter results and no choices
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                # Also when the client went away mid-answer: release the connection
+                await self._close_stream(stream)
+            return
+        
+        raise LLMUnavailableError(f"No LLM provider answered in time: {last_error or 'deadline exceeded'}")
+    
+    async def complete(
+        self,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float = 0.2
+    ) -> Optional[str]:
+        """
+        Plain completion without the assistant system prompt, for internal
+        tasks such as summarizing history. Returns None when no AI service is
+        configured or the call fails.
+        """
+        if not self.enabled:
+            return None
+        try:
+            return await self._complete(messages, temperature=temperature, max_tokens=max_tokens)
+        except LLMUnavailableError as e:
+            logger.error(f"AI API error: {str(e)}")
+            return None
+    
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "hedge_enabled": settings.LLM_HEDGE_ENABLED,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "providers": {p.name: p.snapshot() for p in self.providers},
+        }
+    
+    async def close(self):
+        """Close the HTTP connection pools of the OpenAI clients"""
+        for provider in self.providers:
+            await provider.client.close()
+    
+    def _attempt_order(self) -> List[LLMProvider]:
+        """Providers for up to LLM_MAX_ATTEMPTS attempts, those in cooldown last"""
+        ordered = sorted(self.providers, key=lambda p: p.cooling_down)
+        return [ordered[i % len(ordered)] for i in range(settings.LLM_MAX_ATTEMPTS)]
+    
+    async def _complete(
+        self,
+        messages: List[Dict],
+        temperature: float,
+        max_tokens: int,
+        deadline: Optional[float] = None
+    ) -> str:
+        deadline = deadline or time.monotonic() + settings.LLM_TIMEOUT_SECONDS
+        attempts = self._attempt_order()
+        pending: Dict[asyncio.Task, int] = {}
+        hedged = False
+        last_error: Optional[Exception] = None
+        
+        def launch(index: int):
+            task = asyncio.create_task(
+                self._attempt(attempts[index], messages, temperature, max_tokens, deadline)
+            )
+            pending[task] = index
+        
+        next_attempt = 1
+        launch(0)
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait = remaining
+                can_hedge = settings.LLM_HEDGE_ENABLED and not hedged and next_attempt < len(attempts)
+                if can_hedge:
+                    wait = min(wait, attempts[pending[next(iter(pending))]].hedge_delay())
+                
+                done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if can_hedge and deadline > time.monotonic():
+                        # The attempt is slower than usual: race a second one
+                        hedged = True
+                        self.hedges += 1
+                        civi_metrics.record_llm_retry("hedge")
+                        launch(next_attempt)
+                        next_attempt += 1
+                    continue
+                
+                for task in done:
+                    index = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if index > 0 and hedged:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if not isinstance(error, RETRYABLE_ERRORS):
+                        raise LLMUnavailableError(f"{attempts[index].name}: {str(error)}") from error
+                    last_error = error
+                
+                if not pending and next_attempt < len(attempts):
+                    self.failovers += 1
+                    civi_metrics.record_llm_retry("failover")
+                    launch(next_attempt)
+                    next_attempt += 1
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        raise LLMUnavailableError(f"No LLM provider answered in time: {last_error or 'deadline exceeded'}")
+    
+    async def _attempt(
+        self,
+        provider: LLMProvider,
+        messages: List[Dict],
+        temperature: float,
+        max_tokens: int,
+        deadline: float
+    ) -> str:
+        provider.requests += 1
+        started_at = time.monotonic()
+        try:
+            response = await provider.client.chat.completions.create(
+                model=provider.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=max(deadline - started_at, 0.001)
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            provider.record_failure(e)
+            logger.warning(f"LLM attempt on {provider.name} failed: {str(e) or type(e).__name__}")
+            raise
+        provider.record_success(time.monotonic() - started_at)
+        return response.choices[0].message.content
+    
+    async def _close_stream(self, stream):
+        if stream is None:
+            return
         try:
-            # Add context to system message if available
-            enhanced_messages = messages.copy()
-            if context_documents:
-                context_text = self._format_context(context_documents)
-                system_message = {
-                    "role": "system",
-                    "content": f"""You are CivicFlow Assistant, an AI helper for civic engagement and government information.
+            await stream.close()
+        except Exception as e:
+            logger.debug(f"Error closing LLM stream: {str(e)}")
+    
+    async def _first_delta(self, chunks) -> str:
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return chunk.choices[0].delta.content
+        return ""
+    
+    def _build_messages(self, messages: List[Dict], context_documents: Optional[List[Dict]]) -> List[Dict]:
+        """Prepend the system message, with search context if available"""
+        enhanced_messages = messages.copy()
+        if context_documents:
+            context_text = self._format_context(context_documents)
+            system_message = {
+                "role": "system",
+                "content": f"""You are CivicFlow Assistant, an AI helper for civic engagement and government information.
 Use the following context from official documents to answer questions:
 
 {context_text}
 
 Provide clear, accurate answers based on the context. If the context doesn't contain enough information, 
 acknowledge this and provide general guidance."""
-                }
-                enhanced_messages.insert(0, system_message)
-            else:
-                # Add default system message
-                enhanced_messages.insert(0, {
-                    "role": "system",
-                    "content": "You are CivicFlow Assistant, an AI helper for civic engagement and government information. Provide clear, helpful answers about local policies, regulations, and civic matters."
-                })
-            
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=enhanced_messages,
-                temperature=temperature,
-                max_tokens=800
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"AI API error: {str(e)}")
-            return self._get_mock_response(messages, context_documents)
+            }
+            enhanced_messages.insert(0, system_message)
+        else:
+            # Add default system message
+            enhanced_messages.insert(0, {
+                "role": "system",
+                "content": "You are CivicFlow Assistant, an AI helper for civic engagement and government information. Provide clear, helpful answers about local policies, regulations, and civic matters."
+            })
+        return enhanced_messages
+    
+    def _split_deltas(self, text: str) -> List[str]:
+        """Split a complete response into word-sized deltas for the streaming API"""
+        words = text.split(" ")
+        return [word if i == len(words) - 1 else word + " " for i, word in enumerate(words)]
     
     def _format_context(self, documents: List[Dict]) -> str:
         """Format search documents as context for the AI"""
@@ -1,8 +1,10 @@
 # app/services/blob_storage_service.py
-import os
+import asyncio
 import logging
-from typing import Optional
-from azure.storage.blob import BlobServiceClient, BlobClient
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional, IO
+from azure.storage.blob import ContentSettings
+from azure.storage.blob.aio import BlobServiceClient
 from azure.core.exceptions import ResourceNotFoundError
 from app.config.settings import settings
 
@@ -10,22 +12,93 @@ from app.config.settings import settings
 logger = logging.getLogger(__name__)
 
 
-class BlobStorageService:
-    """Service for Azure Blob Storage operations"""
-    
+async def _read_chunks(stream: IO[bytes], chunk_size: int) -> AsyncIterator[bytes]:
+    """Read a blocking file object in chunks off the event loop"""
+    while True:
+        chunk = await asyncio.to_thread(stream.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class BlobStorageBackend(ABC):
+    """Interface of the document file store
+
+    Implementations: BlobStorageService (Azure Blob Storage) and
+    LocalBlobStorageService (content-addressed local filesystem), selected
+    with STORAGE_BACKEND. Missing blobs raise ResourceNotFoundError.
+    """
+
+    @abstractmethod
+    async def upload_file(
+        self,
+        file_content: bytes,
+        blob_name: str,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """Store bytes under blob_name, returns the blob URL"""
+
+    @abstractmethod
+    async def upload_stream(
+        self,
+        stream: IO[bytes],
+        blob_name: str,
+        length: Optional[int] = None,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """Store a file-like object under blob_name, returns the blob URL"""
+
+    @abstractmethod
+    async def download_file(self, blob_name: str) -> bytes:
+        """Return the whole blob"""
+
+    @abstractmethod
+    def iter_download(
+        self,
+        blob_name: str,
+        offset: Optional[int] = None,
+        length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream the blob, or `length` bytes from `offset`, in chunks"""
+
+    @abstractmethod
+    async def delete_file(self, blob_name: str) -> bool:
+        """Delete a blob, returns False if it could not be deleted"""
+
+    @abstractmethod
+    async def get_blob_url(self, blob_name: str) -> str:
+        """URL of a blob"""
+
+    async def close(self):
+        """Release connections or handles held by the backend"""
+
+
+class BlobStorageService(BlobStorageBackend):
+    """Service for Azure Blob Storage operations
+
+    Built on the async SDK so uploads and downloads never block the event
+    loop. Large uploads are sent as blocks of max_block_size, up to
+    AZURE_STORAGE_MAX_CONCURRENCY in parallel; iter_download streams a blob
+    (or a byte range of it) in chunks of AZURE_STORAGE_MAX_CHUNK_GET_SIZE.
+    """
+
     def __init__(self):
         self.connection_string = settings.AZURE_STORAGE_CONNECTION_STRING
         self.container_name = settings.AZURE_STORAGE_CONTAINER_NAME
+        self.max_concurrency = settings.AZURE_STORAGE_MAX_CONCURRENCY
         self.blob_service_client = BlobServiceClient.from_connection_string(
-            self.connection_string
+            self.connection_string,
+            max_block_size=settings.AZURE_STORAGE_MAX_BLOCK_SIZE,
+            max_single_put_size=settings.AZURE_STORAGE_MAX_SINGLE_PUT_SIZE,
+            max_chunk_get_size=settings.AZURE_STORAGE_MAX_CHUNK_GET_SIZE
         )
         self.container_client = self.blob_service_client.get_container_client(
             self.container_name
         )
-    
+
     async def upload_file(
-        self, 
-        file_content: bytes, 
+        self,
+        file_content: bytes,
         blob_name: str,
         content_type: str = "application/octet-stream"
     ) -> str:
@@ -34,52 +107,135 @@ class BlobStorageService:
         Returns the blob URL
         """
         try:
-            from azure.storage.blob import ContentSettings
-            
             blob_client = self.container_client.get_blob_client(blob_name)
-            
+
             # Create ContentSettings object properly
             content_settings = ContentSettings(content_type=content_type)
-            
-            blob_client.upload_blob(
+
+            await blob_client.upload_blob(
                 file_content,
                 overwrite=True,
-                content_settings=content_settings
+                content_settings=content_settings,
+                max_concurrency=self.max_concurrency
             )
-            
+
             blob_url = blob_client.url
             logger.info(f"Uploaded blob: {blob_name}")
             return blob_url
-            
+
         except Exception as e:
             logger.error(f"Error uploading blob {blob_name}: {str(e)}")
             raise
-    
+
+    async def upload_stream(
+        self,
+        stream: IO[bytes],
+        blob_name: str,
+        length: Optional[int] = None,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """
+        Upload a file-like object to Azure Blob Storage
+        Streams above max_single_put_size are sent as staged blocks of
+        max_block_size, max_concurrency at a time. The stream is read in a
+        worker thread, so disk reads never block the event loop.
+        Returns the blob URL
+        """
+        try:
+            blob_client = self.container_client.get_blob_client(blob_name)
+
+            await blob_client.upload_blob(
+                _read_chunks(stream, settings.AZURE_STORAGE_MAX_BLOCK_SIZE),
+                length=length,
+                overwrite=True,
+                content_settings=ContentSettings(content_type=content_type),
+                max_concurrency=self.max_concurrency
+            )
+
+            blob_url = blob_client.url
+            logger.info(f"Uploaded blob (streamed): {blob_name}")
+            return blob_url
+
+        except Exception as e:
+            logger.error(f"Error uploading blob {blob_name}: {str(e)}")
+            raise
+
     async def download_file(self, blob_name: str) -> bytes:
-        """Download file from Azure Blob Storage"""
+        """Download file from Azure Blob Storage (whole blob in memory, prefer iter_download)"""
         try:
             blob_client = self.container_client.get_blob_client(blob_name)
-            blob_data = blob_client.download_blob()
-            return blob_data.readall()
+            downloader = await blob_client.download_blob(max_concurrency=self.max_concurrency)
+            return await downloader.readall()
         except ResourceNotFoundError:
             logger.error(f"Blob not found: {blob_name}")
             raise
         except Exception as e:
             logger.error(f"Error downloading blob {blob_name}: {str(e)}")
             raise
-    
+
+    async def iter_download(
+        self,
+        blob_name: str,
+        offset: Optional[int] = None,
+        length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream a blob, or `length` bytes from `offset`, as consecutive byte
+        ranges of at most AZURE_STORAGE_MAX_CHUNK_GET_SIZE. Only one range
+        is held in memory at a time.
+        """
+        blob_client = self.container_client.get_blob_client(blob_name)
+        try:
+            downloader = await blob_client.download_blob(offset=offset, length=length)
+        except ResourceNotFoundError:
+            logger.error(f"Blob not found: {blob_name}")
+            raise
+        async for chunk in downloader.chunks():
+            yield chunk
+
     async def delete_file(self, blob_name: str) -> bool:
         """Delete file from Azure Blob Storage"""
         try:
             blob_client = self.container_client.get_blob_client(blob_name)
-            blob_client.delete_blob()
+            await blob_client.delete_blob()
             logger.info(f"Deleted blob: {blob_name}")
             return True
         except Exception as e:
             logger.error(f"Error deleting blob {blob_name}: {str(e)}")
             return False
-    
+
     async def get_blob_url(self, blob_name: str) -> str:
         """Get the URL of a blob"""
         blob_client = self.container_client.get_blob_client(blob_name)
         return blob_client.url
+
+    async def close(self):
+        """Close the underlying HTTP transport"""
+        await self.blob_service_client.close()
+
+
+# Module-level backend shared by all requests (one connection pool)
+_blob_storage_service: Optional[BlobStorageBackend] = None
+
+
+def get_blob_storage_service() -> BlobStorageBackend:
+    """Return the shared storage backend selected by STORAGE_BACKEND (azure or local)"""
+    global _blob_storage_service
+    if _blob_storage_service is None:
+        if settings.STORAGE_BACKEND == "local":
+            from app.services.local_blob_storage_service import LocalBlobStorageService
+            _blob_storage_service = LocalBlobStorageService()
+        else:
+            _blob_storage_service = BlobStorageService()
+    return _blob_storage_service
+
+
+async def close_blob_storage_service():
+    """Close the shared storage backend. Call once at application shutdown."""
+    global _blob_storage_service
+    if _blob_storage_service is not None:
+        try:
+            await _blob_storage_service.close()
+        except Exception:
+            logger.exception("Error while closing storage backend")
+        _blob_storage_service = None
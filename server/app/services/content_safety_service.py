@@ -1,32 +1,220 @@
 # Azure Content Safety
+import asyncio
+import hashlib
+import logging
+import math
 import os
-import aiohttp
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
 from app.config.settings import settings
+from app.core.http_session import get_http_session
 AZURE_CONTENT_SAFETY_ENDPOINT = settings.AZURE_CONTENT_SAFETY_ENDPOINT
 AZURE_CONTENT_SAFETY_KEY = settings.AZURE_CONTENT_SAFETY_KEY
+API_VERSION = "2023-10-01"
+MAX_RATE_LIMIT_RETRIES = 3
+MAX_RETRY_AFTER_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+def retry_after_seconds(value: Optional[str], default: float) -> float:
+    """
+    Delay asked for by a Retry-After header, given as seconds or as an HTTP
+    date; default when missing or invalid, capped at MAX_RETRY_AFTER_SECONDS
+    """
+    if not value:
+        return default
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    if not math.isfinite(delay):
+        return default
+    return min(max(delay, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+
+def split_text_segments(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into segments of at most max_chars, preferring to cut on
+    whitespace so words are not broken across segments.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    segments = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Look back (at most 10% of the segment) for a whitespace boundary
+            cut = text.rfind(" ", end - max_chars // 10, end)
+            newline = text.rfind("\n", end - max_chars // 10, end)
+            cut = max(cut, newline)
+            if cut > start:
+                end = cut
+        segments.append(text[start:end])
+        start = end
+    return segments
+
+
+class SafetyVerdictCache:
+    """Segment verdicts keyed by hash: in-process LRU in front of a SQLite file"""
+
+    def __init__(self, max_entries: int, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, bool]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            directory = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, safe INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[bool]:
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            return self._lru[key]
+        if self._db is None:
+            return None
+        verdict = await asyncio.to_thread(self._db_get, key)
+        if verdict is not None:
+            self._remember(key, verdict)
+        return verdict
+
+    async def set(self, key: str, verdict: bool):
+        self._remember(key, verdict)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, verdict)
+
+    def _remember(self, key: str, verdict: bool):
+        self._lru[key] = verdict
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[bool]:
+        with self._db_lock:
+            row = self._db.execute("SELECT safe FROM verdicts WHERE key = ?", (key,)).fetchone()
+        return None if row is None else bool(row[0])
+
+    def _db_set(self, key: str, verdict: bool):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO verdicts (key, safe, created_at) VALUES (?, ?, ?)",
+                (key, int(verdict), time.time())
+            )
+            self._db.commit()
+
+
+# Shared across service instances so every request benefits from the cache
+_verdict_cache: Optional[SafetyVerdictCache] = None
+
+
+def get_verdict_cache() -> SafetyVerdictCache:
+    global _verdict_cache
+    if _verdict_cache is None:
+        _verdict_cache = SafetyVerdictCache(
+            max_entries=settings.CONTENT_SAFETY_CACHE_SIZE,
+            db_path=settings.CONTENT_SAFETY_CACHE_PATH or None
+        )
+    return _verdict_cache
+
 
 class ContentSafetyService:
-    """Service to validate text safety with Azure Content Safety API"""
+    """Service to validate text safety with Azure Content Safety API
+
+    The whole text is checked: it is split into API-sized segments that are
+    analysed concurrently, stopping at the first violation. Verdicts are
+    cached per segment hash, so re-ingesting known text makes no API calls.
+    """
+
+    def __init__(self, cache: Optional[SafetyVerdictCache] = None):
+        self.cache = cache or get_verdict_cache()
 
     async def validate_text(self, text: str) -> bool:
         """
         Returns True if text is safe, False if it contains restricted content.
         """
-        url = f"{AZURE_CONTENT_SAFETY_ENDPOINT}/contentsafety/text:analyze?api-version=2023-10-01"
+        segments = split_text_segments(text, settings.CONTENT_SAFETY_SEGMENT_CHARS)
+
+        pending = []
+        for segment in segments:
+            key = self._cache_key(segment)
+            verdict = await self.cache.get(key)
+            if verdict is False:
+                return False
+            if verdict is None:
+                pending.append((key, segment))
+
+        if not pending:
+            return True
+
+        semaphore = asyncio.Semaphore(settings.CONTENT_SAFETY_MAX_CONCURRENCY)
+
+        async def analyze(key: str, segment: str) -> bool:
+            async with semaphore:
+                verdict = await self._analyze_segment(segment)
+            if verdict is not None:
+                await self.cache.set(key, verdict)
+            return bool(verdict)  # default to unsafe if the call fails
+
+        tasks = [asyncio.create_task(analyze(key, segment)) for key, segment in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                if not await next_done:
+                    return False
+            return True
+        finally:
+            # Early exit: stop analysing the remaining segments
+            for task in tasks:
+                task.cancel()
+
+    async def _analyze_segment(self, segment: str) -> Optional[bool]:
+        """Returns the verdict for one segment, or None if the API call failed"""
+        url = f"{AZURE_CONTENT_SAFETY_ENDPOINT}/contentsafety/text:analyze?api-version={API_VERSION}"
         headers = {
             "Ocp-Apim-Subscription-Key": AZURE_CONTENT_SAFETY_KEY,
             "Content-Type": "application/json"
         }
-        data = {"text": text[:8192]}  # Azure Content Safety has a payload limit, truncate if needed
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=data) as resp:
-                if resp.status == 200:
-                    result = await resp.json()
-                    # Check any category detected with severity >= 2 (you can adjust threshold)
-                    for cat in result.get("categoriesAnalysis", []):
-                        if cat["severity"] >= 2:
-                            return False
-                    return True
-                else:
-                    return False  # default to unsafe if call fails
+        data = {"text": segment}
+
+        session = get_http_session()
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            try:
+                async with session.post(url, headers=headers, json=data) as resp:
+                    if resp.status == 200:
+                        result = await resp.json()
+                        # Check any category detected with severity >= threshold
+                        for cat in result.get("categoriesAnalysis", []):
+                            if cat["severity"] >= settings.CONTENT_SAFETY_SEVERITY_THRESHOLD:
+                                return False
+                        return True
+                    if resp.status != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                        logger.warning(f"Content Safety returned status {resp.status}")
+                        return None
+                    retry_after = retry_after_seconds(resp.headers.get("Retry-After"), 2 ** attempt)
+            except Exception as e:
+                logger.error(f"Content Safety request failed: {str(e)}")
+                return None
+            # Throttled: wait with the connection back in the pool
+            await asyncio.sleep(retry_after)
+        return None
+
+    def _cache_key(self, segment: str) -> str:
+        digest = hashlib.sha256(segment.encode("utf-8")).hexdigest()
+        return f"{API_VERSION}:{settings.CONTENT_SAFETY_SEVERITY_THRESHOLD}:{digest}"
@@ -0,0 +1,126 @@
+# app/services/context_packer_service.py
+import logging
+from typing import Dict, List, Optional
+from app.utils.helpers import count_tokens, truncate_to_tokens
+from app.config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Shortest text accepted as the overlap of two adjacent chunks, so a common
+# word at the boundary is not mistaken for it
+MIN_OVERLAP_CHARS = 16
+
+# Between non-adjacent passages of one document
+PASSAGE_SEPARATOR = "\n[...]\n"
+
+
+def merge_overlapping(first: str, second: str) -> str:
+    """
+    Join two consecutive chunks, dropping the text the second one repeats
+    (DocumentChunkerService starts each chunk with the tail of the previous).
+    """
+    anchor = second[:MIN_OVERLAP_CHARS]
+    if len(anchor) < MIN_OVERLAP_CHARS:
+        return first + second
+    # The overlap is a suffix of `first` starting with the anchor: try the longest first
+    position = first.find(anchor)
+    while position != -1:
+        overlap = len(first) - position
+        if second.startswith(first[position:]):
+            return first + second[overlap:]
+        position = first.find(anchor, position + 1)
+    return first + second
+
+
+class _Passage:
+    """A run of consecutive chunks of one document"""
+
+    def __init__(self, document: Dict, rank: int):
+        self.document = document
+        self.first_index = document.get("chunk_index")
+        self.last_index = self.first_index
+        self.rank = rank  # Best (lowest) search rank among its chunks
+        self.content = document.get("content", "")
+
+    def extend(self, document: Dict, rank: int):
+        self.content = merge_overlapping(self.content, document.get("content", ""))
+        self.last_index = document.get("chunk_index")
+        self.rank = min(self.rank, rank)
+
+
+class ContextPackerService:
+    """Assembles retrieved chunks into the context sent to the LLM
+
+    Chunks are grouped by document; runs of consecutive chunk_index are
+    merged into one passage with the chunker's overlap removed. Passages are
+    then taken by relevance (their best search rank) until
+    CONTEXT_MAX_TOKENS is used, the last one truncated to fit, and returned
+    as one entry per document so each maps to one citation.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None):
+        self.max_tokens = max_tokens or settings.CONTEXT_MAX_TOKENS
+
+    def pack(self, documents: List[Dict]) -> List[Dict]:
+        """documents: search results, most relevant first"""
+        passages = self._merge_passages(documents)
+        passages.sort(key=lambda p: p.rank)
+
+        budget = self.max_tokens
+        selected: List[_Passage] = []
+        for passage in passages:
+            if budget < settings.CONTEXT_MIN_PASSAGE_TOKENS:
+                break
+            tokens = count_tokens(passage.content)
+            if tokens > budget:
+                passage.content = truncate_to_tokens(passage.content, budget)
+                tokens = budget
+            selected.append(passage)
+            budget -= tokens
+
+        # One entry per document, ordered by its best passage, passages in reading order
+        packed: Dict[str, Dict] = {}
+        by_document: Dict[str, List[_Passage]] = {}
+        for passage in selected:
+            key = self._document_key(passage.document)
+            by_document.setdefault(key, []).append(passage)
+        for key, document_passages in by_document.items():
+            document_passages.sort(key=lambda p: p.first_index if p.first_index is not None else 0)
+            entry = {k: v for k, v in document_passages[0].document.items() if k not in ("content", "chunk_index")}
+            entry["content"] = PASSAGE_SEPARATOR.join(p.content for p in document_passages)
+            packed[key] = entry
+
+        logger.info(
+            f"Packed {len(documents)} chunks into {len(selected)} passages from {len(packed)} "
+            f"documents ({self.max_tokens - budget}/{self.max_tokens} tokens)"
+        )
+        return list(packed.values())
+
+    def _merge_passages(self, documents: List[Dict]) -> List[_Passage]:
+        groups: Dict[str, List] = {}
+        for rank, document in enumerate(documents):
+            groups.setdefault(self._document_key(document), []).append((rank, document))
+
+        passages = []
+        for chunks in groups.values():
+            seen = set()
+            current: Optional[_Passage] = None
+            for rank, document in sorted(chunks, key=lambda c: self._chunk_order(c[1])):
+                index = document.get("chunk_index")
+                if index is not None and index in seen:
+                    continue
+                seen.add(index)
+                if current is not None and index is not None and current.last_index is not None and index == current.last_index + 1:
+                    current.extend(document, rank)
+                    continue
+                current = _Passage(document, rank)
+                passages.append(current)
+        return passages
+
+    def _document_key(self, document: Dict) -> str:
+        return document.get("document_id") or document.get("uri") or document.get("title", "")
+
+    def _chunk_order(self, document: Dict) -> int:
+        index = document.get("chunk_index")
+        return index if index is not None else 0
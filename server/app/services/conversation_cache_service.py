@@ -0,0 +1,153 @@
+# app/services/conversation_cache_service.py
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from app.config.settings import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed for CONVERSATION_CACHE_REDIS_ENABLED
+    aioredis = None
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "civi:conversation-cache:"
+
+
+class ConversationCacheService:
+    """Read-through cache of conversation documents and recent messages
+
+    Values are JSON-compatible data (model_dump(mode="json")) kept in an
+    in-process LRU with a TTL, or in Redis when
+    CONVERSATION_CACHE_REDIS_ENABLED so several API processes share loads.
+    Concurrent misses for the same key share one load.
+
+    With Redis, Redis is the only tier: an in-process copy would keep
+    serving a conversation after another process wrote to it. update()
+    then deletes the Redis entry (the next read reloads it) rather than
+    racing other processes with a read-modify-write. In-process only,
+    update() changes the local entry.
+    """
+
+    def __init__(self):
+        self.max_entries = settings.CONVERSATION_CACHE_MAX_ENTRIES
+        self.ttl_seconds = settings.CONVERSATION_CACHE_TTL_SECONDS
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._loads: Dict[str, asyncio.Task] = {}
+        # Bumped by every write, so a load that started before it is not cached
+        self._versions: Dict[str, int] = {}
+        self._redis = None
+        if settings.CONVERSATION_CACHE_REDIS_ENABLED:
+            if aioredis is None:
+                logger.warning("redis package not installed - conversation cache is in-process only")
+            else:
+                self._redis = aioredis.from_url(settings.REDIS_URL)
+        self._local = self._redis is None
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value of key, loading it once for all concurrent callers on a miss (None is not cached)"""
+        if self._local:
+            value = self._get_local(key)
+            if value is not None:
+                return value
+
+        load = self._loads.get(key)
+        if load is None:
+            load = asyncio.create_task(self._load(key, loader, self._versions.get(key, 0)))
+            self._loads[key] = load
+            load.add_done_callback(lambda _: self._loads.pop(key, None))
+        # A cancelled caller must not cancel the load other callers wait for
+        return await asyncio.shield(load)
+
+    async def set(self, key: str, value: Any):
+        self._bump(key)
+        if self._local:
+            self._set_local(key, value)
+        await self._redis_set(key, value)
+
+    async def update(self, key: str, change: Callable[[Any], Any]):
+        """Apply change to the cached value of key, if any (with Redis: drop it)"""
+        self._bump(key)
+        if not self._local:
+            await self._redis_delete(key)
+            return
+        value = self._get_local(key)
+        if value is not None:
+            self._set_local(key, change(value))
+
+    async def invalidate(self, *keys: str):
+        for key in keys:
+            self._bump(key)
+            self._entries.pop(key, None)
+        await self._redis_delete(*keys)
+
+    async def close(self):
+        for load in list(self._loads.values()):
+            load.cancel()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], version: int) -> Any:
+        value = await self._redis_get(key)
+        from_redis = value is not None
+        if value is None:
+            value = await loader()
+        if value is not None and self._versions.get(key, 0) == version:
+            if self._local:
+                self._set_local(key, value)
+            elif not from_redis:
+                await self._redis_set(key, value)
+        return value
+
+    def _bump(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+        # Versions only matter while a load is in flight
+        if len(self._versions) > self.max_entries and key not in self._loads:
+            self._versions = {k: v for k, v in self._versions.items() if k in self._loads}
+
+    def _get_local(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _redis_get(self, key: str) -> Any:
+        if self._redis is None:
+            return None
+        try:
+            raw = await self._redis.get(KEY_PREFIX + key)
+            return json.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning(f"Conversation cache Redis read failed: {str(e)}")
+            return None
+
+    async def _redis_set(self, key: str, value: Any):
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(KEY_PREFIX + key, json.dumps(value), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Conversation cache Redis write failed: {str(e)}")
+
+    async def _redis_delete(self, *keys: str):
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(*(KEY_PREFIX + key for key in keys))
+        except Exception as e:
+            logger.warning(f"Conversation cache Redis delete failed: {str(e)}")
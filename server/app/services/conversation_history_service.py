@@ -0,0 +1,178 @@
+# app/services/conversation_history_service.py
+import asyncio
+import logging
+from typing import Dict, List, Set
+from app.models.conversation import Conversation, Message
+from app.repositories.conversation_repository import ConversationRepository
+from app.schemas.chat import Role
+from app.config.settings import settings
+from app.utils.helpers import count_tokens
+from app.services.message_writer_service import merge_messages
+
+
+logger = logging.getLogger(__name__)
+
+# Approximate per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Stored roles use the frontend's names; the chat API expects "assistant"
+CHAT_API_ROLES = {Role.USER.value: "user", Role.ASSISTANT.value: "assistant"}
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a citizen and "
+    "CivicFlow Assistant, a civic information assistant. Update the summary "
+    "with the new messages. Keep facts the user shared, their questions, and "
+    "the answers and sources given. Be concise and write in the language of "
+    "the conversation."
+)
+
+
+def count_message_tokens(text: str) -> int:
+    return count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ConversationHistoryService:
+    """Builds the history sent to the LLM within a token budget
+
+    Each turn reads only the CHAT_HISTORY_MAX_MESSAGES most recent messages
+    and keeps the newest ones that fit in CHAT_HISTORY_MAX_TOKENS, together
+    with the conversation's rolling summary. When older messages fall out
+    of the window without being summarized, a background task folds them
+    into the summary (stored on the Conversation document) so the next turn
+    can use it; the current turn never waits for it.
+
+    Messages still queued by the write-behind MessageWriterService are
+    merged into the recent messages.
+    """
+
+    def __init__(self, ai_service, message_writer=None):
+        self.ai_service = ai_service
+        self.message_writer = message_writer
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def recent_messages(
+        self,
+        conversation_repo: ConversationRepository,
+        conversation: Conversation
+    ) -> List[Message]:
+        """Bounded read of the latest messages (none for an empty conversation)"""
+        pending = self.message_writer.pending_messages(conversation.id) if self.message_writer else []
+        if conversation.message_count == 0 and not pending:
+            return []
+        messages = await conversation_repo.get_recent_messages(
+            conversation.id, settings.CHAT_HISTORY_MAX_MESSAGES
+        )
+        if pending:
+            messages = merge_messages(messages, pending)[-settings.CHAT_HISTORY_MAX_MESSAGES:]
+        return messages
+
+    def build_history(
+        self,
+        conversation_repo: ConversationRepository,
+        conversation: Conversation,
+        messages: List[Message]
+    ) -> List[Dict]:
+        """
+        Chat API messages for the given recent messages (oldest first):
+        the summary, then the newest messages that fit the token budget.
+        Schedules a summary refresh when unsummarized messages were left out.
+        """
+        summarized_until = conversation.summarized_until
+        pending = [m for m in messages if summarized_until is None or m.timestamp > summarized_until]
+
+        budget = settings.CHAT_HISTORY_MAX_TOKENS
+        summary_message = None
+        if conversation.summary:
+            summary_message = {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{conversation.summary}"
+            }
+            budget -= count_message_tokens(summary_message["content"])
+
+        kept: List[Message] = []
+        for message in reversed(pending):
+            tokens = count_message_tokens(message.content)
+            # Always keep the latest message, even when it alone exceeds the budget
+            if kept and tokens > budget:
+                break
+            kept.append(message)
+            budget -= tokens
+        kept.reverse()
+
+        left_out = len(pending) - len(kept)
+        # A full window may hide older messages the query did not return
+        older_unread = (
+            len(messages) >= settings.CHAT_HISTORY_MAX_MESSAGES
+            and conversation.message_count > len(messages)
+            and len(pending) == len(messages)
+        )
+        if kept and (left_out or older_unread):
+            self._schedule_refresh(conversation_repo, conversation, before=kept[0].timestamp)
+
+        history = [summary_message] if summary_message else []
+        history.extend(
+            {"role": CHAT_API_ROLES.get(m.role, m.role), "content": m.content}
+            for m in kept
+        )
+        return history
+
+    def _schedule_refresh(
+        self,
+        conversation_repo: ConversationRepository,
+        conversation: Conversation,
+        before
+    ):
+        # One refresh per conversation at a time
+        if conversation.id in self._refreshing or not self.ai_service.enabled:
+            return
+        self._refreshing.add(conversation.id)
+        task = asyncio.create_task(self._refresh_summary(conversation_repo, conversation, before))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_summary(
+        self,
+        conversation_repo: ConversationRepository,
+        conversation: Conversation,
+        before
+    ):
+        try:
+            messages = await conversation_repo.get_messages_between(
+                conversation.id,
+                after=conversation.summarized_until,
+                before=before,
+                limit=settings.CHAT_HISTORY_SUMMARY_BATCH
+            )
+            if not messages:
+                return
+
+            transcript = "\n".join(
+                f"{CHAT_API_ROLES.get(m.role, m.role)}: {m.content}" for m in messages
+            )
+            summary = await self.ai_service.complete(
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {
+                        "role": "user",
+                        "content": f"Current summary:\n{conversation.summary or '(none)'}\n\nNew messages:\n{transcript}"
+                    }
+                ],
+                max_tokens=settings.CHAT_HISTORY_SUMMARY_MAX_TOKENS
+            )
+            if not summary:
+                return
+
+            await conversation_repo.update_summary(conversation.id, summary, messages[-1].timestamp)
+            logger.info(f"Folded {len(messages)} messages into the summary of conversation {conversation.id}")
+        except Exception as e:
+            logger.error(f"Error refreshing summary of conversation {conversation.id}: {str(e)}")
+        finally:
+            self._refreshing.discard(conversation.id)
+
+    async def close(self):
+        """Cancel summary refreshes still running. Call once at application shutdown."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
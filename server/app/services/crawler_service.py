@@ -0,0 +1,375 @@
+# app/services/crawler_service.py
+import asyncio
+import logging
+import time
+import zlib
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+from lxml import etree
+
+from app.config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid"}
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+ROBOTS_TIMEOUT_SECONDS = 10
+GZIP_INPUT_CHUNK = 64 * 1024
+
+
+def _gunzip_limited(data: bytes, max_bytes: int) -> bytes:
+    """Decompress gzip data in chunks, refusing to produce more than max_bytes"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    output = bytearray()
+    for offset in range(0, len(data), GZIP_INPUT_CHUNK):
+        # At most one byte over the limit, enough to tell it was exceeded
+        output += decompressor.decompress(data[offset:offset + GZIP_INPUT_CHUNK], max_bytes + 1 - len(output))
+        if len(output) > max_bytes:
+            raise ValueError(f"decompressed size exceeds {max_bytes} bytes")
+        if decompressor.eof:
+            break
+    output += decompressor.flush()
+    if len(output) > max_bytes:
+        raise ValueError(f"decompressed size exceeds {max_bytes} bytes")
+    return bytes(output)
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """
+    Canonical form used to dedupe URLs: lowercase scheme and host, no default
+    port, no fragment, no tracking parameters, sorted query, "/" for an empty
+    path. Returns None for anything that is not an absolute http(s) URL.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = parts.hostname
+        port = parts.port
+    except (AttributeError, ValueError):
+        return None
+    if scheme not in DEFAULT_PORTS or not host:
+        return None
+
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _same_site(url: str, other: str) -> bool:
+    def site(u):
+        host = urlsplit(u).hostname or ""
+        return host[4:] if host.startswith("www.") else host
+    return site(url) == site(other)
+
+
+class RobotsCache:
+    """robots.txt rules per origin, fetched once and kept for a TTL
+
+    Follows RFC 9309: a missing robots.txt (4xx) allows everything, while an
+    unreachable one (5xx, network error) disallows the whole site until the
+    entry expires.
+    """
+
+    def __init__(self, url_validator, ttl_seconds: Optional[int] = None):
+        self.url_validator = url_validator
+        self.ttl_seconds = ttl_seconds or settings.CRAWLER_ROBOTS_CACHE_TTL_SECONDS
+        self._entries: Dict[str, Tuple[float, RobotFileParser]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get(self, url: str) -> RobotFileParser:
+        origin = _origin(url)
+        entry = self._entries.get(origin)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        # Single flight: concurrent requests for one origin share the fetch
+        inflight = self._inflight.get(origin)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[origin] = future
+        try:
+            parser = await self._fetch(origin)
+            self._entries[origin] = (time.monotonic() + self.ttl_seconds, parser)
+            future.set_result(parser)
+            return parser
+        finally:
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(origin, None)
+
+    async def can_fetch(self, url: str) -> bool:
+        parser = await self.get(url)
+        return parser.can_fetch(settings.HTTP_USER_AGENT, url)
+
+    async def crawl_delay(self, url: str) -> Optional[float]:
+        parser = await self.get(url)
+        delay = parser.crawl_delay(settings.HTTP_USER_AGENT)
+        return float(delay) if delay is not None else None
+
+    async def sitemaps(self, url: str) -> List[str]:
+        parser = await self.get(url)
+        return parser.site_maps() or []
+
+    async def _fetch(self, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        page = await self.url_validator.fetch_validated_url(
+            f"{origin}/robots.txt",
+            timeout=ROBOTS_TIMEOUT_SECONDS
+        )
+        if page is None or page.status >= 500:
+            logger.warning(f"robots.txt unreachable for {origin}, treating site as disallowed")
+            parser.disallow_all = True
+        elif page.status >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(page.text().splitlines())
+        return parser
+
+
+class _HostSlot:
+    """Per-host concurrency limit and request spacing"""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self._lock = asyncio.Lock()
+        self._next_request_at = 0.0
+
+    async def wait_turn(self, delay: float):
+        async with self._lock:
+            wait = self._next_request_at - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_request_at = time.monotonic() + delay
+
+
+class CrawlerService:
+    """Polite concurrent crawler for bulk government URL sources
+
+    Each url item is {"url": ..., "sitemap": ...}. With "sitemap": true the
+    sitemaps listed in the site's robots.txt (or /sitemap.xml) are expanded;
+    a string is used as the sitemap URL. URLs are normalized and deduped,
+    fetched under a global and a per-host concurrency limit with robots.txt
+    rules and Crawl-delay honoured, and every fetched page is handed to
+    DocumentIngestionService.ingest_fetched_page as soon as it arrives.
+    """
+
+    def __init__(self, ingestion_service=None):
+        if ingestion_service is None:
+            from app.services.document_ingestion_service import DocumentIngestionService
+            ingestion_service = DocumentIngestionService()
+        self.ingestion = ingestion_service
+        self.url_validator = ingestion_service.url_validator
+        self.robots = RobotsCache(self.url_validator)
+        self._fetch_semaphore = asyncio.Semaphore(settings.CRAWLER_MAX_CONCURRENCY)
+        self._ingest_semaphore = asyncio.Semaphore(settings.INGESTION_MAX_CONCURRENCY)
+        self._hosts: Dict[str, _HostSlot] = {}
+
+    async def crawl(self, url_items: List[Dict]) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Crawl the given sources, yielding (url, ingestion result) pairs in
+        completion order. Results carry "skipped": True for URLs excluded by
+        robots.txt.
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        seen = set()
+        tasks = set()
+
+        def schedule(url: str):
+            normalized = normalize_url(url or "")
+            if normalized is None:
+                results.put_nowait((url, {"safe": False, "reason": "Invalid URL"}))
+                return
+            if normalized in seen:
+                return
+            seen.add(normalized)
+            task = asyncio.create_task(self._crawl_url(normalized, results))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        async def expand():
+            try:
+                for item in url_items:
+                    url = item.get("url")
+                    schedule(url)
+                    if item.get("sitemap") and normalize_url(url or ""):
+                        try:
+                            async for page_url in self._sitemap_urls(url, item["sitemap"]):
+                                schedule(page_url)
+                        except Exception as e:
+                            logger.error(f"Error expanding sitemaps of {url}: {str(e)}")
+                # No more URLs after expansion: wait for the last fetches
+                while tasks:
+                    await asyncio.gather(*list(tasks))
+            finally:
+                results.put_nowait(None)
+
+        expander = asyncio.create_task(expand())
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            expander.cancel()
+            for task in list(tasks):
+                task.cancel()
+
+    async def crawl_all(self, url_items: List[Dict]) -> Dict:
+        """Crawl the sources and aggregate results like process_ingestion does"""
+        summary = {
+            "urls_processed": 0,
+            "urls_accepted": [],
+            "urls_rejected": [],
+            "urls_duplicate": [],
+            "urls_skipped": [],
+        }
+        async for url, result in self.crawl(url_items):
+            summary["urls_processed"] += 1
+            if result.get("skipped"):
+                summary["urls_skipped"].append(f"{url}: {result['reason']}")
+            elif result.get("duplicate"):
+                summary["urls_duplicate"].append(f"{url}: {result['document_id']}")
+            elif result["safe"]:
+                summary["urls_accepted"].append(url)
+            else:
+                summary["urls_rejected"].append(f"{url}: {result['reason']}")
+        return summary
+
+    async def _crawl_url(self, url: str, results: asyncio.Queue):
+        try:
+            result = await self._fetch_and_ingest(url)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error crawling {url}: {str(e)}")
+            result = {"safe": False, "reason": f"Processing error: {str(e)}"}
+        await results.put((url, result))
+
+    async def _fetch_and_ingest(self, url: str) -> Dict:
+        if not self.url_validator.is_allowed_domain(url):
+            return {"safe": False, "reason": "URL not from an allowed government domain"}
+
+        host = urlsplit(url).netloc
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = _HostSlot(settings.CRAWLER_MAX_CONCURRENCY_PER_HOST)
+
+        async with slot.semaphore:
+            delay = settings.CRAWLER_MIN_DELAY_SECONDS
+            if settings.CRAWLER_RESPECT_ROBOTS:
+                if not await self.robots.can_fetch(url):
+                    return {"safe": False, "skipped": True, "reason": "Disallowed by robots.txt"}
+                delay = max(delay, await self.robots.crawl_delay(url) or 0)
+
+            await slot.wait_turn(delay)
+            async with self._fetch_semaphore:
+                page = await self.url_validator.fetch_validated_url(url, timeout=30)
+
+        if page is None:
+            return {"safe": False, "reason": "URL not reachable"}
+        content_type = page.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if page.status == 200 and content_type and content_type not in HTML_CONTENT_TYPES:
+            return {"safe": False, "reason": f"Unsupported content type {content_type}"}
+
+        async with self._ingest_semaphore:
+            return await self.ingestion.ingest_fetched_page(page)
+
+    async def _sitemap_urls(self, seed_url: str, sitemap) -> AsyncIterator[str]:
+        """Page URLs listed in the seed site's sitemaps (indexes are followed)"""
+        if isinstance(sitemap, str):
+            roots = [sitemap]
+        else:
+            roots = []
+            if settings.CRAWLER_RESPECT_ROBOTS:
+                roots = await self.robots.sitemaps(seed_url)
+            roots = roots or [f"{_origin(seed_url)}/sitemap.xml"]
+
+        max_sitemaps = settings.CRAWLER_MAX_SITEMAPS
+        roots = list(dict.fromkeys(roots))[:max_sitemaps]
+        queue = deque((root, 0) for root in roots)
+        queued = set(roots)
+        emitted = 0
+        while queue and emitted < settings.CRAWLER_MAX_SITEMAP_URLS:
+            sitemap_url, depth = queue.popleft()
+
+            pages, children = await self._fetch_sitemap(sitemap_url)
+            if depth < settings.CRAWLER_SITEMAP_MAX_DEPTH:
+                for child in children:
+                    if len(queued) >= max_sitemaps:
+                        logger.warning(
+                            f"Sitemap expansion for {seed_url} stopped at {max_sitemaps} sitemaps "
+                            f"(CRAWLER_MAX_SITEMAPS)"
+                        )
+                        break
+                    if child not in queued:
+                        queued.add(child)
+                        queue.append((child, depth + 1))
+            for page_url in pages:
+                if emitted >= settings.CRAWLER_MAX_SITEMAP_URLS:
+                    logger.warning(
+                        f"Sitemap expansion for {seed_url} stopped at {emitted} URLs "
+                        f"(CRAWLER_MAX_SITEMAP_URLS)"
+                    )
+                    break
+                if _same_site(page_url, seed_url):
+                    emitted += 1
+                    yield page_url
+
+        logger.info(f"Expanded {emitted} URLs from sitemaps of {seed_url}")
+
+    async def _fetch_sitemap(self, sitemap_url: str) -> Tuple[List[str], List[str]]:
+        """Return (page URLs, nested sitemap URLs) of one sitemap document"""
+        page = await self.url_validator.fetch_validated_url(sitemap_url, timeout=30)
+        if page is None or page.status != 200:
+            logger.warning(f"Could not fetch sitemap {sitemap_url}")
+            return [], []
+
+        body = page.body
+        max_bytes = settings.CRAWLER_SITEMAP_MAX_BYTES
+        try:
+            if body[:2] == b"\x1f\x8b":
+                body = _gunzip_limited(body, max_bytes)
+            elif len(body) > max_bytes:
+                raise ValueError(f"size exceeds {max_bytes} bytes")
+        except (ValueError, zlib.error) as e:
+            logger.warning(f"Skipping sitemap {sitemap_url}: {str(e)}")
+            return [], []
+        try:
+            parser = etree.XMLParser(resolve_entities=False, no_network=True, recover=True)
+            root = etree.fromstring(body, parser=parser)
+        except etree.XMLSyntaxError as e:
+            logger.warning(f"Invalid sitemap {sitemap_url}: {str(e)}")
+            return [], []
+        if root is None:
+            return [], []
+
+        # A sitemap may list 50,000 URLs; nothing past the expansion cap is used
+        max_locs = settings.CRAWLER_MAX_SITEMAP_URLS + settings.CRAWLER_MAX_SITEMAPS
+        pages, children = [], []
+        for loc in root.iter("{*}loc"):
+            if len(pages) + len(children) >= max_locs:
+                break
+            parent = loc.getparent()
+            if not loc.text or parent is None:
+                continue
+            if etree.QName(parent).localname == "sitemap":
+                children.append(loc.text.strip())
+            else:
+                pages.append(loc.text.strip())
+        return pages, children
@@ -101,7 +101,11 @@ class DocumentChunkerService:
             )
             
             chunks.append(chunk)
-            
+
+            # The last chunk reached the end (stepping back by the overlap would loop forever)
+            if end == total_tokens:
+                break
+
             # Move start position with overlap
             start = end - self.chunk_overlap
             chunk_index += 1
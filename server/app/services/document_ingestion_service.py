@@ -1,34 +1,96 @@
 # app/services/document_ingestion_service.py
-from typing import List, Dict
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Union
 from fastapi import UploadFile
+import asyncio
+import hashlib
 import os
 import aiohttp
-from bs4 import BeautifulSoup
 import uuid
 import tempfile
 import logging
-from datetime import datetime
+import re
+from datetime import datetime, timedelta
 from app.services.content_safety_service import ContentSafetyService
-from app.services.url_validator_service import URLValidatorService
+from app.services.url_validator_service import URLValidatorService, FetchedPage
 from app.services.text_extraction_service import TextExtractionService
-from app.services.blob_storage_service import BlobStorageService
+from app.services.html_extraction_service import HTMLExtractionService
+from app.services.blob_storage_service import get_blob_storage_service
+from app.services.search_index_service import SearchIndexService
 from app.repositories.document_repository import DocumentRepository
-from app.schemas.document import Document, DocumentStatus
+from app.repositories.crawl_state_repository import get_crawl_state_repository
+from app.schemas.document import (
+    Document, DocumentStatus, CrawledURL, IngestItemEvent, IngestSummaryEvent
+)
+from app.config.settings import settings
 
 
 logger = logging.getLogger(__name__)
 
 
+def _blob_extension(filename: str) -> str:
+    """Extension of a user-supplied filename, reduced to what every storage backend accepts in a blob name"""
+    _, dot, extension = filename.rpartition(".")
+    extension = re.sub(r"[^a-z0-9]", "", extension.lower()) if dot else ""
+    return extension or "bin"
+
+
+class SpooledUpload:
+    """An upload streamed to a local temp file, with its size and SHA-256"""
+    def __init__(
+        self,
+        path: str,
+        filename: str,
+        content_type: str,
+        size: int,
+        sha256: str
+    ):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+    
+    def cleanup(self):
+        """Remove the temp file"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
 class DocumentIngestionService:
     """Service to handle document and URL ingestion with safety validation"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        document_repo: Optional[DocumentRepository] = None,
+        search_index_factory: Optional[Callable[[], SearchIndexService]] = None
+    ):
         self.content_safety = ContentSafetyService()
         self.url_validator = URLValidatorService()
         self.text_extractor = TextExtractionService()
-        self.blob_storage = BlobStorageService()
-        self.document_repo = DocumentRepository()
+        self.html_extractor = HTMLExtractionService()
+        self.blob_storage = get_blob_storage_service()
+        self.document_repo = document_repo or DocumentRepository()
+        self.crawl_state_repo = get_crawl_state_repository()
+        # A search index from search_index_factory belongs to the caller, who closes it
+        self._owns_search_index = search_index_factory is None
+        self._search_index_factory = search_index_factory or SearchIndexService
+        self._search_index: Optional[SearchIndexService] = None
         self.staging_path = tempfile.gettempdir()
+        self._item_semaphore = asyncio.Semaphore(settings.INGESTION_MAX_CONCURRENCY)
+        self._extraction_semaphore = asyncio.Semaphore(settings.INGESTION_EXTRACTION_CONCURRENCY)
+        self._inflight_hashes: Dict[str, asyncio.Future] = {}
+    
+    @property
+    def search_index(self) -> SearchIndexService:
+        # Built on first use: only recrawls of changed pages need it
+        if self._search_index is None:
+            self._search_index = self._search_index_factory()
+        return self._search_index
+    
+    async def close(self):
+        """Close the search index if it was built here; the other clients are app-wide"""
+        if self._owns_search_index and self._search_index is not None:
+            await self._search_index.close()
     
     async def process_ingestion(
         self, 
@@ -37,36 +99,39 @@ class DocumentIngestionService:
     ) -> Dict:
         """
         Process uploaded files and URLs with safety validation
+
+        Items are processed concurrently (bounded by INGESTION_MAX_CONCURRENCY),
+        text extraction is further bounded by INGESTION_EXTRACTION_CONCURRENCY.
+        Results are aggregated in the original order of files and URLs.
         """
         files_accepted = []
         files_rejected = []
+        files_duplicate = []
         urls_accepted = []
         urls_rejected = []
+        urls_duplicate = []
         
-        # Process files
-        for file in files:
-            try:
-                result = await self._process_file(file)
-                if result["safe"]:
-                    files_accepted.append(file.filename)
-                else:
-                    files_rejected.append(f"{file.filename}: {result['reason']}")
-            except Exception as e:
-                logger.error(f"Error processing file {file.filename}: {str(e)}")
-                files_rejected.append(f"{file.filename}: Processing error")
+        file_results, url_results = await asyncio.gather(
+            asyncio.gather(*(self._run_file(file) for file in files)),
+            asyncio.gather(*(self._run_url(url_item) for url_item in urls))
+        )
         
-        # Process URLs
-        for url_item in urls:
-            try:
-                url = url_item.get("url")
-                result = await self._process_url(url)
-                if result["safe"]:
-                    urls_accepted.append(url)
-                else:
-                    urls_rejected.append(f"{url}: {result['reason']}")
-            except Exception as e:
-                logger.error(f"Error processing URL {url}: {str(e)}")
-                urls_rejected.append(f"{url}: Validation error")
+        for file, result in zip(files, file_results):
+            if result.get("duplicate"):
+                files_duplicate.append(f"{file.filename}: {result['document_id']}")
+            elif result["safe"]:
+                files_accepted.append(file.filename)
+            else:
+                files_rejected.append(f"{file.filename}: {result['reason']}")
+        
+        for url_item, result in zip(urls, url_results):
+            url = url_item.get("url")
+            if result.get("duplicate"):
+                urls_duplicate.append(f"{url}: {result['document_id']}")
+            elif result["safe"]:
+                urls_accepted.append(url)
+            else:
+                urls_rejected.append(f"{url}: {result['reason']}")
         
         return {
             "message": "Ingestion completed",
@@ -74,22 +139,201 @@ class DocumentIngestionService:
             "urls_processed": len(urls),
             "files_accepted": files_accepted,
             "files_rejected": files_rejected,
+            "files_duplicate": files_duplicate,
             "urls_accepted": urls_accepted,
-            "urls_rejected": urls_rejected
+            "urls_rejected": urls_rejected,
+            "urls_duplicate": urls_duplicate
         }
     
+    async def spool_uploads(self, files: List[UploadFile]) -> List[SpooledUpload]:
+        """
+        Spool every upload to disk up front, for callers that process them
+        after the request body is gone (streaming responses)
+        """
+        spooled = []
+        try:
+            for file in files:
+                spooled.append(await self._spool_upload(file))
+        except Exception:
+            for upload in spooled:
+                upload.cleanup()
+            raise
+        return spooled
+    
+    async def stream_ingestion(
+        self,
+        uploads: List[SpooledUpload],
+        urls: List[Dict]
+    ) -> AsyncIterator[Union[IngestItemEvent, IngestSummaryEvent]]:
+        """
+        Process spooled uploads and URLs like process_ingestion, yielding an
+        IngestItemEvent per item as soon as it is accepted, rejected or found
+        to be a duplicate, then an IngestSummaryEvent with counts only.
+        
+        Takes ownership of the uploads: they are removed when the stream ends.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def run(kind: str, index: int, name: Optional[str], work: Awaitable[Dict]):
+            # Every item must produce an event, or the stream would wait for it forever
+            try:
+                event = self._item_event(kind, index, name or "", await work)
+            except Exception as e:
+                logger.error(f"Error processing {kind} {index} ({name}): {str(e)}")
+                event = IngestItemEvent(
+                    kind=kind, index=index, name=name or "", status="rejected", reason="Processing error"
+                )
+            await events.put(event)
+        
+        tasks = [
+            asyncio.create_task(run("file", index, upload.filename, self._run_spooled(upload)))
+            for index, upload in enumerate(uploads)
+        ] + [
+            asyncio.create_task(run("url", index, url_item.get("url"), self._run_url(url_item)))
+            for index, url_item in enumerate(urls)
+        ]
+        
+        summary = IngestSummaryEvent(files_processed=len(uploads), urls_processed=len(urls))
+        try:
+            for _ in range(len(tasks)):
+                event = await events.get()
+                counter = f"{event.kind}s_{event.status}"
+                setattr(summary, counter, getattr(summary, counter) + 1)
+                yield event
+            yield summary
+        finally:
+            # Client went away: stop the remaining work
+            for task in tasks:
+                task.cancel()
+            for upload in uploads:
+                upload.cleanup()
+    
+    def _item_event(self, kind: str, index: int, name: str, result: Dict) -> IngestItemEvent:
+        if result.get("duplicate"):
+            return IngestItemEvent(
+                kind=kind, index=index, name=name, status="duplicate", document_id=result["document_id"]
+            )
+        if result["safe"]:
+            return IngestItemEvent(
+                kind=kind, index=index, name=name, status="accepted", document_id=result["document_id"]
+            )
+        return IngestItemEvent(kind=kind, index=index, name=name, status="rejected", reason=result["reason"])
+    
+    async def _run_spooled(self, spooled: SpooledUpload) -> Dict:
+        """Process an already spooled upload under the ingestion concurrency limit"""
+        async with self._item_semaphore:
+            try:
+                return await self._ingest_once(
+                    spooled.sha256,
+                    lambda: self._process_spooled_file(spooled)
+                )
+            except Exception as e:
+                logger.error(f"Error processing file {spooled.filename}: {str(e)}")
+                return {"safe": False, "reason": "Processing error"}
+    
+    async def _run_file(self, file: UploadFile) -> Dict:
+        """Process a single file under the ingestion concurrency limit"""
+        async with self._item_semaphore:
+            try:
+                return await self._process_file(file)
+            except Exception as e:
+                logger.error(f"Error processing file {file.filename}: {str(e)}")
+                return {"safe": False, "reason": "Processing error"}
+    
+    async def _run_url(self, url_item: Dict) -> Dict:
+        """Process a single URL under the ingestion concurrency limit"""
+        url = url_item.get("url")
+        async with self._item_semaphore:
+            try:
+                return await self._process_url(url)
+            except Exception as e:
+                logger.error(f"Error processing URL {url}: {str(e)}")
+                return {"safe": False, "reason": "Validation error"}
+    
     async def _process_file(self, file: UploadFile) -> Dict:
         """Process and validate a single file"""
-        # Save file temporarily
-        temp_path = os.path.join(self.staging_path, file.filename)
-        file_content = await file.read()
+        spooled = await self._spool_upload(file)
+        try:
+            return await self._ingest_once(
+                spooled.sha256,
+                lambda: self._process_spooled_file(spooled)
+            )
+        finally:
+            spooled.cleanup()
+    
+    async def _ingest_once(self, content_hash: str, ingest: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Run `ingest` only if no document with this content hash exists yet.
         
-        with open(temp_path, "wb") as f:
-            f.write(file_content)
+        Known content short-circuits to the existing document id before any
+        extraction, Content Safety, Blob or embedding cost. Identical content
+        already in flight in this service waits for the first copy instead of
+        racing it.
+        """
+        inflight = self._inflight_hashes.get(content_hash)
+        if inflight is not None:
+            result = await inflight
+            if result.get("safe"):
+                return {"safe": True, "duplicate": True, "document_id": result["document_id"]}
+            return result
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_hashes[content_hash] = future
+        result = {"safe": False, "reason": "Processing error"}
+        try:
+            existing = await self.document_repo.get_document_by_content_hash(content_hash)
+            if existing:
+                logger.info(f"Duplicate content {content_hash[:12]} -> existing document {existing.id}")
+                result = {"safe": True, "duplicate": True, "document_id": existing.id}
+            else:
+                result = await ingest()
+            return result
+        finally:
+            future.set_result(result)
+            del self._inflight_hashes[content_hash]
+    
+    async def _spool_upload(self, file: UploadFile) -> SpooledUpload:
+        """
+        Stream an upload to a uniquely named temp file in fixed-size chunks,
+        hashing while writing so the whole file is never held in memory
+        """
+        extension = os.path.splitext(file.filename or "")[1].lower()
+        hasher = hashlib.sha256()
+        size = 0
         
+        temp = tempfile.NamedTemporaryFile(
+            prefix="ingest_",
+            suffix=extension,
+            dir=self.staging_path,
+            delete=False
+        )
         try:
-            # Extract text from file
-            full_text = await self.text_extractor.extract_text(temp_path, file.filename)
+            with temp:
+                while True:
+                    chunk = await file.read(settings.INGESTION_UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            os.remove(temp.name)
+            raise
+        
+        return SpooledUpload(
+            path=temp.name,
+            filename=file.filename,
+            content_type=file.content_type or "application/octet-stream",
+            size=size,
+            sha256=hasher.hexdigest()
+        )
+    
+    async def _process_spooled_file(self, spooled: SpooledUpload) -> Dict:
+        """Validate a spooled upload, store it in Blob Storage and register it"""
+        try:
+            # Extract text from the spooled file
+            async with self._extraction_semaphore:
+                full_text = await self.text_extractor.extract_text(spooled.path, spooled.filename)
             
             # Validate content safety
             is_safe = await self.content_safety.validate_text(full_text)
@@ -98,23 +342,24 @@ class DocumentIngestionService:
                 return {"safe": False, "reason": "Content safety violation"}
             
             # Generate unique blob name
-            import uuid
-            file_extension = file.filename.split(".")[-1]
-            blob_name = f"{uuid.uuid4()}.{file_extension}"
+            blob_name = f"{uuid.uuid4()}.{_blob_extension(spooled.filename)}"
             
-            # Upload to Azure Blob Storage
-            blob_url = await self.blob_storage.upload_file(
-                file_content=file_content,
-                blob_name=blob_name,
-                content_type=file.content_type
-            )
+            # Upload to Azure Blob Storage straight from the spooled file (chunked block upload)
+            with open(spooled.path, "rb") as stream:
+                blob_url = await self.blob_storage.upload_stream(
+                    stream=stream,
+                    blob_name=blob_name,
+                    length=spooled.size,
+                    content_type=spooled.content_type
+                )
             
             # Create document metadata in Cosmos DB
             document = Document(
                 filename=blob_name,
-                original_filename=file.filename,
-                content_type=file.content_type,
-                file_size=len(file_content),
+                original_filename=spooled.filename,
+                content_type=spooled.content_type,
+                file_size=spooled.size,
+                content_hash=spooled.sha256,
                 blob_url=blob_url,
                 text_preview=full_text[:500] if full_text else None,
                 full_text_extracted=True,
@@ -128,57 +373,107 @@ class DocumentIngestionService:
             
             await self.document_repo.create_document(document)
             
-            logger.info(f"Document ingested successfully: {file.filename} -> {document.id}")
+            logger.info(f"Document ingested successfully: {spooled.filename} -> {document.id}")
             return {"safe": True, "document_id": document.id}
         
         except Exception as e:
             logger.error(f"Error processing file: {str(e)}")
             return {"safe": False, "reason": f"Processing error: {str(e)}"}
-        
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
     
     async def _process_url(self, url: str) -> Dict:
         """Validate and process a single URL"""
-        
-        
         try:
-            # Validate URL safety and governmental domain
-            is_valid = await self.url_validator.validate_url(url)
+            # Validate URL safety and governmental domain; the validation
+            # fetch doubles as the scrape so each URL is downloaded once
+            page = await self.url_validator.fetch_validated_url(url, timeout=30)
             
-            if not is_valid:
+            if page is None:
                 return {"safe": False, "reason": "URL validation failed (non-governmental domain or unreachable)"}
             
-            # Scrape content from URL
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=30) as response:
-                    if response.status != 200:
-                        return {"safe": False, "reason": f"URL returned status {response.status}"}
-                    
-                    html_content = await response.text()
-            
-            # Extract text from HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Get text
-            text = soup.get_text()
-            
-            # Clean up text (remove extra whitespace)
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            full_text = '\n'.join(chunk for chunk in chunks if chunk)
-            
-            if not full_text or len(full_text) < 100:
-                return {"safe": False, "reason": "Insufficient content extracted from URL"}
-            
+            return await self.ingest_fetched_page(page)
+        
+        except aiohttp.ClientError as e:
+            logger.error(f"Network error scraping URL {url}: {str(e)}")
+            return {"safe": False, "reason": f"Network error: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Error processing URL {url}: {str(e)}")
+            return {"safe": False, "reason": f"Processing error: {str(e)}"}
+    
+    async def ingest_fetched_page(self, page: FetchedPage) -> Dict:
+        """
+        Extract, validate and store an already fetched page, then record its
+        crawl state (ETag, Last-Modified, content hash) for conditional recrawls
+        """
+        url = page.url
+        if page.status != 200:
+            return {"safe": False, "reason": f"URL returned status {page.status}"}
+        
+        full_text = self.html_extractor.extract_text(page.text())
+        
+        if not full_text or len(full_text) < 100:
+            return {"safe": False, "reason": "Insufficient content extracted from URL"}
+        
+        content = full_text.encode('utf-8')
+        content_hash = hashlib.sha256(content).hexdigest()
+        result = await self._ingest_once(
+            content_hash,
+            lambda: self._store_url_text(url, full_text, content, content_hash)
+        )
+        
+        if result.get("safe"):
+            await self._record_crawl_state(page, content_hash, result["document_id"])
+        return result
+    
+    async def _record_crawl_state(self, page: FetchedPage, content_hash: str, document_id: str):
+        """
+        Remember validators and content hash of an ingested URL; when the
+        page changed, supersede the document of its previous version
+        """
+        previous_document_id = None
+        try:
+            now = datetime.utcnow()
+            state = await self.crawl_state_repo.get_state(page.url) or CrawledURL.for_url(page.url)
+            if state.content_hash != content_hash:
+                if state.document_id and state.document_id != document_id:
+                    logger.info(f"URL content changed: {page.url} ({state.document_id} -> {document_id})")
+                    previous_document_id = state.document_id
+                state.last_changed_at = now
+            state.etag = page.headers.get("ETag")
+            state.last_modified = page.headers.get("Last-Modified")
+            state.content_hash = content_hash
+            state.document_id = document_id
+            state.last_status = page.status
+            state.last_crawled_at = now
+            state.next_crawl_at = now + timedelta(seconds=settings.RECRAWL_INTERVAL_SECONDS)
+            await self.crawl_state_repo.upsert_state(state)
+        except Exception as e:
+            logger.warning(f"Could not record crawl state for {page.url}: {str(e)}")
+        
+        if previous_document_id:
+            await self._supersede_document(previous_document_id, document_id, page.url)
+    
+    async def _supersede_document(self, document_id: str, superseded_by: str, url: str):
+        """Retire the previous version of a URL so searches stop returning it"""
+        try:
+            document = await self.document_repo.get_document(document_id)
+            # Identical content of another URL may share the document: leave it alone
+            if (
+                document is None
+                or document.original_filename != url
+                or document.status == DocumentStatus.SUPERSEDED
+            ):
+                return
+            await self.document_repo.mark_superseded(document_id, superseded_by)
+            if not await self.search_index.delete_document_chunks(document_id):
+                logger.warning(f"Could not delete index chunks of superseded document {document_id}")
+        except Exception as e:
+            logger.warning(f"Could not supersede document {document_id} of {url}: {str(e)}")
+    
+    async def _store_url_text(self, url: str, full_text: str, content: bytes, content_hash: str) -> Dict:
+        """Validate scraped text, store it in Blob Storage and register it"""
+        try:
             # Validate content safety
-            is_safe = await self.content_safety.validate_text(full_text[:8000])
+            is_safe = await self.content_safety.validate_text(full_text)
             
             if not is_safe:
                 return {"safe": False, "reason": "Content safety violation"}
@@ -189,18 +484,18 @@ class DocumentIngestionService:
             
             # Upload extracted text to Blob Storage
             blob_url = await self.blob_storage.upload_file(
-                file_content=full_text.encode('utf-8'),
+                file_content=content,
                 blob_name=blob_name,
                 content_type="text/plain"
             )
             
             # Create document metadata in Cosmos DB
-            from datetime import datetime
             document = Document(
                 filename=blob_name,
                 original_filename=url,
                 content_type="text/html",
-                file_size=len(full_text.encode('utf-8')),
+                file_size=len(content),
+                content_hash=content_hash,
                 blob_url=blob_url,
                 text_preview=full_text[:100000] if full_text else None,
                 full_text_extracted=True,
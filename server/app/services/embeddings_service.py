@@ -1,7 +1,7 @@
 # app/services/embeddings_service.py
 import logging
 from typing import List
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from app.config.settings import settings
 
 
@@ -18,6 +18,12 @@ class EmbeddingsService:
             api_version=settings.AZURE_OPENAI_API_VERSION,
             azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
         )
+        # Used on the request path (query embeddings), where blocking the loop hurts
+        self.async_client = AsyncAzureOpenAI(
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=settings.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
+        )
         
         self.deployment_name = settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
         
@@ -56,6 +62,19 @@ class EmbeddingsService:
             logger.error(f"Error generating embedding: {str(e)}")
             raise
     
+    async def embed_query(self, text: str) -> List[float]:
+        """Embedding of a user query, without blocking the event loop"""
+        response = await self.async_client.embeddings.create(
+            input=text.replace("\n", " ").strip(),
+            model=self.deployment_name
+        )
+        return response.data[0].embedding
+    
+    async def close(self):
+        """Close the HTTP connection pools of the OpenAI clients"""
+        self.client.close()
+        await self.async_client.close()
+    
     async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for multiple texts in batch
@@ -0,0 +1,228 @@
+import logging
+import re
+from typing import Callable, Dict
+
+import lxml.html
+from bs4 import BeautifulSoup
+
+from app.config.settings import settings
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax is optional, lxml is always available
+    LexborHTMLParser = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# Never content: dropped before anything else
+REMOVE_TAGS = ("script", "style", "noscript", "template", "svg", "iframe", "object", "embed", "canvas")
+
+# Page chrome: dropped when extracting main content only. header/footer are
+# kept inside <main>/<article>, where they hold the title and byline.
+BOILERPLATE_TAGS = ("nav", "aside")
+PAGE_CHROME_TAGS = ("header", "footer")
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search"}
+BOILERPLATE_TOKENS = {
+    "nav", "navbar", "navigation", "menu", "breadcrumb", "breadcrumbs",
+    "footer", "sidebar", "cookie", "cookies", "social", "share", "skip",
+}
+CONTENT_TAGS = {"html", "body", "main", "article"}
+_TOKEN_SPLIT = re.compile(r"[\s_-]+")
+
+# Elements that start a new line in the extracted text
+BLOCK_TAGS = (
+    "p", "div", "section", "article", "main", "header", "footer", "h1", "h2", "h3",
+    "h4", "h5", "h6", "li", "ul", "ol", "dl", "dt", "dd", "table", "tr", "blockquote",
+    "pre", "address", "figcaption", "caption", "br", "hr",
+)
+CELL_TAGS = ("td", "th")
+
+
+def _normalize_whitespace(text: str) -> str:
+    """Collapse whitespace inside lines and drop empty lines"""
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _is_boilerplate_attr(tag: str, role: str, classes: str, element_id: str) -> bool:
+    if tag in CONTENT_TAGS:
+        return False
+    if role in BOILERPLATE_ROLES:
+        return True
+    tokens = _TOKEN_SPLIT.split(f"{classes} {element_id}".lower())
+    return any(token in BOILERPLATE_TOKENS for token in tokens)
+
+
+# ============================================================================
+# Engines
+#
+# Each engine turns an HTML document into normalized text. With
+# main_content_only, page chrome (navigation, headers, footers, sidebars,
+# cookie banners) is removed and the <main>/[role=main] region, or the
+# page's articles, is preferred over the whole body. Regions shorter than
+# min_chars fall back to the cleaned body.
+# ============================================================================
+def _lxml_text(html: str, main_content_only: bool, min_chars: int) -> str:
+    if not html.strip():
+        return ""
+    # Parse bytes so pages with an XML encoding declaration are accepted
+    parser = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+    root = lxml.html.document_fromstring(html.encode("utf-8"), parser=parser)
+
+    for element in root.xpath("|".join(f"//{tag}" for tag in REMOVE_TAGS)):
+        element.drop_tree()
+
+    if main_content_only:
+        for element in root.xpath("|".join(f"//{tag}" for tag in BOILERPLATE_TAGS)):
+            element.drop_tree()
+        for element in root.xpath("|".join(
+            f"//{tag}[not(ancestor::main or ancestor::article)]" for tag in PAGE_CHROME_TAGS
+        )):
+            element.drop_tree()
+        for element in root.xpath("//*[@role or @class or @id]"):
+            if _is_boilerplate_attr(
+                element.tag,
+                element.get("role", ""),
+                element.get("class", ""),
+                element.get("id", "")
+            ) and not element.xpath(".//main|.//article"):
+                element.drop_tree()
+
+    for element in root.iter(*BLOCK_TAGS):
+        element.text = "\n" + (element.text or "")
+        element.tail = "\n" + (element.tail or "")
+    for element in root.iter(*CELL_TAGS):
+        element.tail = " " + (element.tail or "")
+
+    body = root.find("body")
+    if body is None:
+        body = root
+    if main_content_only:
+        regions = root.xpath("//main|//*[@role='main']")[:1] or root.xpath("//article[not(ancestor::article)]")
+        if regions:
+            text = _normalize_whitespace("\n".join(region.text_content() for region in regions))
+            if len(text) >= min_chars:
+                return text
+    return _normalize_whitespace(body.text_content())
+
+
+def _has_ancestor(node, tags) -> bool:
+    parent = node.parent
+    while parent is not None:
+        if parent.tag in tags:
+            return True
+        parent = parent.parent
+    return False
+
+
+def _has_flagged_ancestor(node, flagged) -> bool:
+    parent = node.parent
+    while parent is not None:
+        if parent in flagged:
+            return True
+        parent = parent.parent
+    return False
+
+
+def _has_descendant(node, tags) -> bool:
+    return any(node.css_first(tag) is not None for tag in tags)
+
+
+def _selectolax_text(html: str, main_content_only: bool, min_chars: int) -> str:
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(list(REMOVE_TAGS))
+
+    if main_content_only:
+        tree.strip_tags(list(BOILERPLATE_TAGS))
+        flagged = [
+            node for node in tree.css(", ".join(PAGE_CHROME_TAGS))
+            if not _has_ancestor(node, ("main", "article"))
+        ]
+        for node in tree.css("[role], [class], [id]"):
+            attrs = node.attributes
+            if _is_boilerplate_attr(
+                node.tag,
+                attrs.get("role") or "",
+                attrs.get("class") or "",
+                attrs.get("id") or ""
+            ) and not _has_descendant(node, ("main", "article")):
+                flagged.append(node)
+        # Decompose frees the subtree, so only remove the outermost flagged nodes
+        flagged_set = set(flagged)
+        for node in flagged:
+            if not _has_flagged_ancestor(node, flagged_set):
+                node.decompose()
+
+    for node in tree.css(", ".join(BLOCK_TAGS)):
+        node.insert_before("\n")
+        node.insert_after("\n")
+    for node in tree.css(", ".join(CELL_TAGS)):
+        node.insert_after(" ")
+
+    body = tree.body or tree.root
+    if body is None:
+        return ""
+    if main_content_only:
+        regions = tree.css("main, [role=main]")[:1] or [
+            node for node in tree.css("article") if not _has_ancestor(node, ("article",))
+        ]
+        if regions:
+            text = _normalize_whitespace("\n".join(region.text(deep=True) for region in regions))
+            if len(text) >= min_chars:
+                return text
+    return _normalize_whitespace(body.text(deep=True))
+
+
+def _bs4_text(html: str, main_content_only: bool, min_chars: int) -> str:
+    """Legacy html.parser extraction: whole page, scripts and styles removed"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    # Get text
+    text = soup.get_text()
+
+    # Clean up text (remove extra whitespace)
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+HTML_ENGINES: Dict[str, Callable[[str, bool, int], str]] = {
+    "lxml": _lxml_text,
+    "bs4": _bs4_text,
+}
+if LexborHTMLParser is not None:
+    HTML_ENGINES["selectolax"] = _selectolax_text
+
+
+class HTMLExtractionService:
+    """Service to extract readable text from HTML pages
+
+    Uses selectolax (lexbor) when installed and lxml otherwise; "bs4" keeps
+    the original html.parser extraction for comparison. By default only the
+    page's main content is kept (HTML_MAIN_CONTENT_ONLY).
+    """
+
+    def __init__(self, engine: str = None, main_content_only: bool = None):
+        engine = engine or settings.HTML_EXTRACTION_ENGINE
+        if engine == "auto":
+            engine = "selectolax" if "selectolax" in HTML_ENGINES else "lxml"
+        if engine not in HTML_ENGINES:
+            raise ValueError(f"Unknown HTML extraction engine: {engine}")
+        self.engine = engine
+        self.main_content_only = (
+            settings.HTML_MAIN_CONTENT_ONLY if main_content_only is None else main_content_only
+        )
+
+    def extract_text(self, html: str) -> str:
+        """Return the normalized text of an HTML document"""
+        return HTML_ENGINES[self.engine](
+            html,
+            self.main_content_only,
+            settings.HTML_MAIN_CONTENT_MIN_CHARS
+        )
@@ -0,0 +1,228 @@
+# app/services/local_blob_storage_service.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, IO, Iterable, Optional
+from azure.core.exceptions import ResourceNotFoundError
+from app.services.blob_storage_service import BlobStorageBackend
+from app.config.settings import settings
+
+try:
+    import zstandard
+except ImportError:  # only needed for LOCAL_STORAGE_COMPRESSION=zstd
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+BLOB_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class LocalBlobStorageService(BlobStorageBackend):
+    """Content-addressed blob store on the local filesystem
+
+    Layout under LOCAL_STORAGE_PATH:
+
+        objects/ab/cd/abcd...      file bytes, named by their SHA-256
+        objects/ab/cd/abcd....zst  same, zstd-compressed
+        refs/<blob_name>.json      blob name -> hash, size, content type
+        tmp/                       in-progress writes
+
+    Objects are written to tmp/ and moved into place with os.replace, so a
+    reader never sees a partial file and identical content is stored once.
+    Deleting a blob removes its ref; prune() removes unreferenced objects
+    (run it while no uploads are in flight).
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        compression: Optional[str] = None
+    ):
+        self.root = Path(root or settings.LOCAL_STORAGE_PATH).resolve()
+        self.compression = (compression or settings.LOCAL_STORAGE_COMPRESSION).lower()
+        if self.compression not in ("none", "zstd"):
+            raise ValueError(f"Unknown local storage compression: {self.compression}")
+        if self.compression == "zstd" and zstandard is None:
+            raise RuntimeError("LOCAL_STORAGE_COMPRESSION=zstd requires the zstandard package")
+        self.chunk_size = settings.LOCAL_STORAGE_CHUNK_SIZE
+        self.objects_dir = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+        self.tmp_dir = self.root / "tmp"
+        for directory in (self.objects_dir, self.refs_dir, self.tmp_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    async def upload_file(
+        self,
+        file_content: bytes,
+        blob_name: str,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """Store bytes under blob_name, returns the object URL"""
+        return await asyncio.to_thread(self._store, blob_name, [file_content], content_type)
+
+    async def upload_stream(
+        self,
+        stream: IO[bytes],
+        blob_name: str,
+        length: Optional[int] = None,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """Store a file-like object under blob_name in chunks, returns the object URL"""
+        chunks = iter(lambda: stream.read(self.chunk_size), b"")
+        return await asyncio.to_thread(self._store, blob_name, chunks, content_type)
+
+    async def download_file(self, blob_name: str) -> bytes:
+        """Return the whole blob"""
+        return b"".join([chunk async for chunk in self.iter_download(blob_name)])
+
+    async def iter_download(
+        self,
+        blob_name: str,
+        offset: Optional[int] = None,
+        length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream the blob, or `length` bytes from `offset`, in LOCAL_STORAGE_CHUNK_SIZE chunks"""
+        ref = await asyncio.to_thread(self._read_ref, blob_name)
+        offset = offset or 0
+        remaining = ref["size"] - offset if length is None else min(length, ref["size"] - offset)
+        handle = await asyncio.to_thread(self._open_object, ref, offset)
+        try:
+            while remaining > 0:
+                chunk = await asyncio.to_thread(handle.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            handle.close()
+
+    async def delete_file(self, blob_name: str) -> bool:
+        """Remove the blob's ref (the object stays until prune)"""
+        try:
+            os.remove(self._ref_path(blob_name))
+            logger.info(f"Deleted blob: {blob_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting blob {blob_name}: {str(e)}")
+            return False
+
+    async def get_blob_url(self, blob_name: str) -> str:
+        """file:// URL of the blob's object"""
+        ref = await asyncio.to_thread(self._read_ref, blob_name)
+        return self._object_path(ref["sha256"], ref["compression"]).as_uri()
+
+    async def prune(self) -> int:
+        """Remove objects no ref points to, returns how many were removed"""
+        return await asyncio.to_thread(self._prune)
+
+    # ------------------------------------------------------------------
+    # Blocking helpers (run in a worker thread)
+    # ------------------------------------------------------------------
+    def _store(self, blob_name: str, chunks: Iterable[bytes], content_type: str) -> str:
+        ref_path = self._ref_path(blob_name)
+        hasher = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                writer = raw
+                if self.compression == "zstd":
+                    writer = zstandard.ZstdCompressor(level=settings.LOCAL_STORAGE_ZSTD_LEVEL).stream_writer(
+                        raw, closefd=False
+                    )
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    writer.write(chunk)
+                    size += len(chunk)
+                if writer is not raw:
+                    writer.close()  # writes the end of the zstd frame
+                raw.flush()
+                os.fsync(raw.fileno())
+
+            digest = hasher.hexdigest()
+            object_path = self._object_path(digest, self.compression)
+            if object_path.exists():
+                # Same content already stored: keep the existing object
+                os.remove(tmp_path)
+            else:
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, object_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._write_json_atomic(ref_path, {
+            "sha256": digest,
+            "size": size,
+            "content_type": content_type,
+            "compression": self.compression,
+            "created_at": datetime.utcnow().isoformat()
+        })
+        logger.info(f"Stored blob {blob_name} -> {digest[:12]} ({size} bytes)")
+        return object_path.as_uri()
+
+    def _write_json_atomic(self, path: Path, data: Dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read_ref(self, blob_name: str) -> Dict:
+        try:
+            with open(self._ref_path(blob_name), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"Blob not found: {blob_name}")
+
+    def _open_object(self, ref: Dict, offset: int):
+        path = self._object_path(ref["sha256"], ref["compression"])
+        if not path.exists():
+            raise ResourceNotFoundError(f"Blob object missing: {ref['sha256']}")
+        if ref["compression"] == "zstd":
+            handle = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        else:
+            handle = open(path, "rb")
+        if offset:
+            # Forward seek; zstd readers decompress and discard up to offset
+            handle.seek(offset)
+        return handle
+
+    def _prune(self) -> int:
+        referenced = set()
+        for ref_path in self.refs_dir.glob("*.json"):
+            with open(ref_path, encoding="utf-8") as f:
+                ref = json.load(f)
+            referenced.add(self._object_path(ref["sha256"], ref["compression"]))
+
+        removed = 0
+        for object_path in self.objects_dir.glob("*/*/*"):
+            if object_path not in referenced:
+                object_path.unlink()
+                removed += 1
+        if removed:
+            logger.info(f"Pruned {removed} unreferenced blob objects")
+        return removed
+
+    def _object_path(self, digest: str, compression: str) -> Path:
+        # Two levels of 256 shards keep directories small
+        name = f"{digest}.zst" if compression == "zstd" else digest
+        return self.objects_dir / digest[:2] / digest[2:4] / name
+
+    def _ref_path(self, blob_name: str) -> Path:
+        if not BLOB_NAME_PATTERN.match(blob_name):
+            raise ValueError(f"Invalid blob name: {blob_name}")
+        return self.refs_dir / f"{blob_name}.json"
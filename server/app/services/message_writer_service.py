@@ -0,0 +1,182 @@
+# app/services/message_writer_service.py
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from app.models.conversation import Message
+from app.repositories.conversation_repository import ConversationRepository
+from app.db.mongodb import get_database
+from app.config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Operations allowed in one Cosmos transactional batch
+MAX_BATCH_SIZE = 100
+
+
+def merge_messages(stored: List[Message], pending: List[Message]) -> List[Message]:
+    """Stored messages plus pending ones not yet among them, oldest first"""
+    stored_ids = {m.id for m in stored}
+    merged = stored + [m for m in pending if m.id not in stored_ids]
+    merged.sort(key=lambda m: m.timestamp)
+    return merged
+
+
+class MessageWriterService:
+    """Write-behind persistence of chat messages
+
+    With MESSAGE_WRITE_BEHIND_ENABLED, add_message returns as soon as the
+    message is queued; a background flusher persists queued messages in
+    batches (one conversation patch and one transactional batch per
+    conversation), retrying failed writes with backoff. Until a message is
+    persisted it is kept in a per-conversation buffer that history reads
+    merge in (pending_messages / merge_pending).
+
+    The queue is bounded: when it is full, add_message waits for room.
+    close() drains the queue at shutdown. Disabled, add_message writes
+    inline through the repository.
+    """
+
+    def __init__(self, conversation_cache=None):
+        self.conversation_cache = conversation_cache
+        self.enabled = settings.MESSAGE_WRITE_BEHIND_ENABLED
+        self.batch_size = min(settings.MESSAGE_WRITE_BEHIND_BATCH_SIZE, MAX_BATCH_SIZE)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.MESSAGE_WRITE_BEHIND_QUEUE_SIZE)
+        self._pending: Dict[str, List[Message]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._closed = False
+        self.stats = {"queued": 0, "persisted": 0, "retries": 0, "dropped": 0}
+
+    async def add_message(
+        self,
+        conversation_repo: ConversationRepository,
+        conversation_id: str,
+        role: str,
+        content: str,
+        citations: Optional[List[dict]] = None
+    ) -> Optional[Message]:
+        """Queue a message of an existing conversation, or write it inline when disabled"""
+        if not self.enabled or self._closed:
+            return await conversation_repo.add_message(
+                conversation_id=conversation_id,
+                role=role,
+                content=content,
+                citations=citations
+            )
+
+        message = Message(
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            citations=citations
+        )
+        # Visible to history reads before it is queued, even while waiting for room
+        self._pending.setdefault(conversation_id, []).append(message)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+        try:
+            await self._queue.put(message)
+        except BaseException:
+            # Cancelled while waiting for room: the message will never be written
+            self._forget(conversation_id, [message])
+            raise
+        self.stats["queued"] += 1
+        return message
+
+    def pending_messages(self, conversation_id: str) -> List[Message]:
+        """Messages of the conversation not persisted yet, oldest first"""
+        return list(self._pending.get(conversation_id, ()))
+
+    def merge_pending(self, conversation_id: str, messages: List[Message]) -> List[Message]:
+        """Add the conversation's unpersisted messages to messages read from Cosmos"""
+        pending = self.pending_messages(conversation_id)
+        return merge_messages(messages, pending) if pending else messages
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "queue_size": self._queue.qsize(),
+            "pending_conversations": len(self._pending),
+        }
+
+    async def close(self):
+        """Persist queued messages and stop the flusher. Call once at application shutdown."""
+        self._closed = True
+        if self._flusher is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=settings.MESSAGE_WRITE_BEHIND_DRAIN_TIMEOUT_SECONDS)
+            logger.info("Write-behind message queue drained")
+        except asyncio.TimeoutError:
+            logger.error(f"Write-behind drain timed out, {self._queue.qsize()} queued messages not persisted")
+        self._flusher.cancel()
+        await asyncio.gather(self._flusher, return_exceptions=True)
+        self._flusher = None
+
+    async def _run(self):
+        interval = settings.MESSAGE_WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                # Let the rest of the turn's writes arrive, then take what is queued
+                await asyncio.sleep(interval)
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                await self._flush(batch)
+            except Exception:
+                # Keep the flusher alive: later messages must still be written
+                logger.exception(f"Error flushing {len(batch)} queued messages, dropping them")
+                self.stats["dropped"] += len(batch)
+                for message in batch:
+                    self._forget(message.conversation_id, [message])
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Message]):
+        by_conversation: Dict[str, List[Message]] = {}
+        for message in batch:
+            by_conversation.setdefault(message.conversation_id, []).append(message)
+        conversation_repo = ConversationRepository(get_database(), cache=self.conversation_cache)
+        await asyncio.gather(*(
+            self._flush_conversation(conversation_repo, conversation_id, messages)
+            for conversation_id, messages in by_conversation.items()
+        ))
+
+    async def _flush_conversation(
+        self,
+        conversation_repo: ConversationRepository,
+        conversation_id: str,
+        messages: List[Message]
+    ):
+        try:
+            for attempt in range(settings.MESSAGE_WRITE_BEHIND_MAX_RETRIES + 1):
+                try:
+                    if await conversation_repo.save_messages(conversation_id, messages):
+                        self.stats["persisted"] += len(messages)
+                    else:
+                        # Conversation deleted meanwhile
+                        self.stats["dropped"] += len(messages)
+                    return
+                except Exception as e:
+                    if attempt == settings.MESSAGE_WRITE_BEHIND_MAX_RETRIES:
+                        self.stats["dropped"] += len(messages)
+                        logger.error(
+                            f"Dropping {len(messages)} messages of conversation {conversation_id} "
+                            f"after {attempt + 1} attempts: {str(e)}"
+                        )
+                        return
+                    self.stats["retries"] += 1
+                    logger.warning(f"Error persisting messages of conversation {conversation_id}, retrying: {str(e)}")
+                    await asyncio.sleep(min(0.1 * 2 ** attempt, 5))
+        finally:
+            self._forget(conversation_id, messages)
+
+    def _forget(self, conversation_id: str, messages: List[Message]):
+        ids = {m.id for m in messages}
+        remaining = [m for m in self._pending.get(conversation_id, ()) if m.id not in ids]
+        if remaining:
+            self._pending[conversation_id] = remaining
+        else:
+            self._pending.pop(conversation_id, None)
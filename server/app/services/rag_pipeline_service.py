@@ -1,6 +1,6 @@
 # app/services/rag_pipeline_service.py
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from app.services.document_chunker_service import DocumentChunkerService
 from app.services.embeddings_service import EmbeddingsService
 from app.services.search_index_service import SearchIndexService
@@ -17,14 +17,26 @@ logger = logging.getLogger(__name__)
 class RAGPipelineService:
     """Service to orchestrate the RAG pipeline: chunking → embeddings → indexing"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        document_repo: Optional[DocumentRepository] = None,
+        search_index: Optional[SearchIndexService] = None
+    ):
         self.chunker = DocumentChunkerService()
         self.embeddings = EmbeddingsService()
-        self.search_index = SearchIndexService()
-        self.document_repo = DocumentRepository()
+        # A search index passed in belongs to the caller, who closes it
+        self._owns_search_index = search_index is None
+        self.search_index = search_index or SearchIndexService()
+        self.document_repo = document_repo or DocumentRepository()
         
         logger.info("RAG Pipeline Service initialized")
     
+    async def close(self):
+        """Close the embeddings clients, and the search index if built here"""
+        await self.embeddings.close()
+        if self._owns_search_index:
+            await self.search_index.close()
+    
     async def process_document(self, document_id: str) -> bool:
         """
         Process a validated document through the RAG pipeline
@@ -0,0 +1,118 @@
+# app/services/recrawl_scheduler_service.py
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from app.config.settings import settings
+from app.schemas.document import CrawledURL
+
+
+logger = logging.getLogger(__name__)
+
+
+class RecrawlSchedulerService:
+    """
+    Periodically recrawls ingested URLs with conditional GETs
+
+    Each due URL is requested with If-None-Match / If-Modified-Since from its
+    stored crawl state. 304 responses only reschedule the URL; 200 responses
+    go back through ingestion, where the content hash decides whether the
+    page actually changed (unchanged text short-circuits to the existing
+    document, new text is ingested as a new document).
+    """
+
+    def __init__(self, ingestion_service=None, crawl_state_repo=None):
+        if ingestion_service is None:
+            from app.services.document_ingestion_service import DocumentIngestionService
+            ingestion_service = DocumentIngestionService()
+        self.ingestion = ingestion_service
+        self.url_validator = ingestion_service.url_validator
+        self.crawl_state_repo = crawl_state_repo or ingestion_service.crawl_state_repo
+        self._task: Optional[asyncio.Task] = None
+
+    async def recrawl_url(self, state: CrawledURL) -> str:
+        """
+        Recrawl a single URL
+
+        Returns:
+            "not_modified", "unchanged", "reingested" or "failed"
+        """
+        headers = {}
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+
+        now = datetime.utcnow()
+        page = None
+        outcome = "failed"
+        try:
+            page = await self.url_validator.fetch_validated_url(state.url, timeout=30, headers=headers)
+
+            if page is not None and page.status == 304:
+                outcome = "not_modified"
+            elif page is not None and page.status == 200:
+                result = await self.ingestion.ingest_fetched_page(page)
+                if result.get("safe"):
+                    # Ingestion stored fresh validators and the next crawl time
+                    return "unchanged" if result["document_id"] == state.document_id else "reingested"
+                logger.warning(f"Recrawl of {state.url} rejected: {result.get('reason')}")
+        except Exception as e:
+            logger.error(f"Error recrawling {state.url}: {str(e)}")
+
+        state.last_crawled_at = now
+        if page is not None:
+            state.last_status = page.status
+        delay = settings.RECRAWL_INTERVAL_SECONDS if outcome == "not_modified" else settings.RECRAWL_RETRY_SECONDS
+        state.next_crawl_at = now + timedelta(seconds=delay)
+        await self.crawl_state_repo.upsert_state(state)
+        return outcome
+
+    async def run_once(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """Recrawl every URL that is due, up to `limit`"""
+        due = await self.crawl_state_repo.get_due(
+            datetime.utcnow(),
+            limit=limit or settings.RECRAWL_BATCH_SIZE
+        )
+        if not due:
+            return {}
+
+        semaphore = asyncio.Semaphore(settings.INGESTION_MAX_CONCURRENCY)
+
+        async def recrawl(state: CrawledURL) -> str:
+            async with semaphore:
+                return await self.recrawl_url(state)
+
+        outcomes = await asyncio.gather(*(recrawl(state) for state in due))
+        summary = dict(Counter(outcomes))
+        logger.info(f"Recrawled {len(due)} URLs: {summary}")
+        return summary
+
+    async def run_forever(self):
+        """Poll for due URLs until cancelled"""
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Recrawl cycle failed: {str(e)}")
+            await asyncio.sleep(settings.RECRAWL_POLL_INTERVAL_SECONDS)
+
+    def start(self):
+        """Start the background recrawl loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+            logger.info("Recrawl scheduler started")
+
+    async def stop(self):
+        """Stop the background recrawl loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Recrawl scheduler stopped")
@@ -18,6 +18,19 @@ from app.services.document_chunker_service import DocumentChunk
 
 logger = logging.getLogger(__name__)
 
+# Bumped whenever this process changes the index; caches of answers built
+# from search results compare it to know when they went stale
+_index_generation = 0
+
+
+def get_index_generation() -> int:
+    return _index_generation
+
+
+def bump_index_generation():
+    global _index_generation
+    _index_generation += 1
+
 
 class SearchIndexService:
     """Service to manage Azure AI Search indexing for RAG"""
@@ -173,6 +186,8 @@ class SearchIndexService:
             result = self.search_client.upload_documents(documents=documents)
             
             success_count = sum(1 for r in result if r.succeeded)
+            if success_count:
+                bump_index_generation()
             logger.info(f"Indexed {success_count}/{len(documents)} chunks successfully")
             
             return success_count == len(documents)
@@ -181,6 +196,11 @@ class SearchIndexService:
             logger.error(f"Error indexing chunks: {str(e)}")
             raise
     
+    async def close(self):
+        """Close the HTTP connection pools of the search clients"""
+        self.search_client.close()
+        self.index_client.close()
+    
     async def delete_document_chunks(self, document_id: str) -> bool:
         """
         Delete all chunks for a specific document from the index
@@ -204,6 +224,7 @@ class SearchIndexService:
             
             if ids_to_delete:
                 self.search_client.delete_documents(documents=ids_to_delete)
+                bump_index_generation()
                 logger.info(f"Deleted {len(ids_to_delete)} chunks for document {document_id}")
             
             return True
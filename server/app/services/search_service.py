@@ -1,4 +1,6 @@
 # Azure AI Search for gov data
+import asyncio
+import os
 from typing import List, Dict, Optional
 from azure.search.documents import SearchClient
 from azure.core.credentials import AzureKeyCredential
@@ -24,36 +26,51 @@ class SearchService:
             self.enabled = False
             logger.warning("Azure Search not configured - using mock data")
     
-    async def search_documents(self, query: str, top: int = 3) -> List[Dict]:
+    async def search_documents(self, query: str, top: Optional[int] = None) -> List[Dict]:
         """
-        Search for relevant government documents
-        Returns list of documents with title, content, and metadata
+        Search for relevant government document chunks (CONTEXT_SEARCH_TOP by default)
+        Returns list of chunks with title, content, and metadata, most relevant first
         """
         if not self.enabled:
             return self._get_mock_results(query)
         
         try:
-            results = self.client.search(
-                search_text=query,
-                top=top,
-                select=["title", "content", "uri", "type", "size"]
-            )
-            
-            documents = []
-            for result in results:
-                documents.append({
-                    "title": result.get("title", "Untitled Document"),
-                    "content": result.get("content", ""),
-                    "uri": result.get("uri", "#"),
-                    "type": result.get("type", "PDF"),
-                    "size": result.get("size", "N/A")
-                })
-            
-            return documents
+            # The client is synchronous: run it (and the paging it triggers) in a
+            # worker thread so chat requests can overlap search with Cosmos calls
+            return await asyncio.to_thread(self._search, query, top or settings.CONTEXT_SEARCH_TOP)
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
             return self._get_mock_results(query)
     
+    async def close(self):
+        """Close the search client's HTTP connection pool"""
+        if self.client is not None:
+            self.client.close()
+    
+    def _search(self, query: str, top: int) -> List[Dict]:
+        # Fields of the chunk index built by SearchIndexService
+        results = self.client.search(
+            search_text=query,
+            top=top,
+            select=["document_id", "chunk_index", "content", "filename", "source"]
+        )
+        
+        documents = []
+        for result in results:
+            filename = result.get("filename") or "Untitled Document"
+            extension = os.path.splitext(filename)[1].lstrip(".").upper()
+            documents.append({
+                "document_id": result.get("document_id"),
+                "chunk_index": result.get("chunk_index"),
+                "title": filename,
+                "content": result.get("content", ""),
+                "uri": f"/api/v1/documents/{result.get('document_id')}/content",
+                "type": extension or "Web",
+                "size": "N/A"
+            })
+        
+        return documents
+    
     def _get_mock_results(self, query: str) -> List[Dict]:
         """Return mock search results for development"""
         return [
@@ -1,33 +1,326 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
 import os
+import queue
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 
 import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_raw
 import docx
+from pdfminer.high_level import extract_pages as pdfminer_extract_pages
+from pdfminer.layout import LTTextContainer
+
+from app.config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# Module-level process pool that will be created lazily and shut down at app exit
+_executor: Optional[ProcessPoolExecutor] = None
+
+# Workers report (task_id, start time) here when they pick up a task. In the
+# parent it belongs to the current pool; in a worker it is set by _init_worker.
+_started_queue = None
+
+# Start time of every task submitted from this process, None while it is queued
+_task_started: Dict[int, Optional[float]] = {}
+_task_ids = itertools.count()
+
+# Extra time given to a worker to honour its own time limit before the pool is recycled
+WORKER_KILL_GRACE_SECONDS = 5.0
+
+# How often a waiting task checks whether its worker is stuck
+WATCHDOG_INTERVAL_SECONDS = 1.0
+
+
+class ExtractionTimeLimitError(Exception):
+    """Raised inside a pool worker when an extraction task runs past its time limit"""
+
+
+def get_extraction_executor() -> ProcessPoolExecutor:
+    """Get (or create) the shared process pool used for text extraction"""
+    global _executor, _started_queue
+    if _executor is None:
+        # spawn: never fork a process that is running an event loop and threads
+        context = multiprocessing.get_context("spawn")
+        # A fresh queue per pool: a worker killed mid-put may leave the old one locked
+        _started_queue = context.Queue()
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.TEXT_EXTRACTION_MAX_WORKERS or None,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(_started_queue,)
+        )
+    return _executor
+
+
+def _init_worker(started_queue):
+    global _started_queue
+    _started_queue = started_queue
+
+
+def recycle_extraction_executor():
+    """
+    Replace the shared pool and kill its workers. Last resort for a worker
+    stuck past its time limit (e.g. inside native code that never returns
+    to Python); other extractions running on the old pool fail.
+    """
+    global _executor, _started_queue
+    old, _executor, _started_queue = _executor, None, None
+    if old is None:
+        return
+    processes = list((old._processes or {}).values())
+    old.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    logger.warning(f"Text extraction process pool recycled, {len(processes)} workers terminated")
+
+
+def _refresh_task_start_times():
+    """Move start times reported by the workers into _task_started"""
+    if _started_queue is None:
+        return
+    while True:
+        try:
+            task_id, started = _started_queue.get_nowait()
+        except queue.Empty:
+            return
+        # Tasks that already finished are no longer tracked
+        if task_id in _task_started:
+            _task_started[task_id] = started
+
+
+def _call_with_time_limit(seconds: float, func, *args, task_id: Optional[int] = None):
+    """
+    Run func in a pool worker, raising ExtractionTimeLimitError after
+    `seconds` so a runaway parse frees its worker (SIGALRM, Unix only).
+    The start time is reported to the parent, which measures a stuck
+    worker from when it began the task, not from when it was submitted.
+    """
+    if task_id is not None and _started_queue is not None:
+        _started_queue.put((task_id, time.time()))
+    if not hasattr(signal, "setitimer"):
+        return func(*args)
+
+    def expire(signum, frame):
+        raise ExtractionTimeLimitError(f"Extraction task exceeded {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def shutdown_extraction_executor():
+    """Shut down the extraction process pool. Call once at application shutdown."""
+    global _executor, _started_queue
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor, _started_queue = None, None
+        logger.info("Text extraction process pool shut down")
+
+
+# ============================================================================
+# PDF engines (module-level so they can be pickled into the pool)
+#
+# Each engine extracts the text of pages [start, end) and returns one string
+# per page. pdfplumber is the most faithful on tables and complex layouts;
+# pdfium (PDFium text API) and pdfminer skip the layout analysis and are much
+# faster on plain-text documents. Both ship as pdfplumber dependencies.
+# ============================================================================
+def _pdfplumber_pages(path: str, start: int, end: int) -> List[str]:
+    with pdfplumber.open(path, pages=list(range(start + 1, end + 1))) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+def _pdfium_pages(path: str, start: int, end: int) -> List[str]:
+    pdf = pdfium.PdfDocument(path)
+    try:
+        texts = []
+        for index in range(start, end):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
+
+def _pdfminer_pages(path: str, start: int, end: int) -> List[str]:
+    return [
+        "".join(element.get_text() for element in page_layout if isinstance(element, LTTextContainer))
+        for page_layout in pdfminer_extract_pages(path, page_numbers=range(start, end))
+    ]
+
+
+PDF_ENGINES: Dict[str, Callable[[str, int, int], List[str]]] = {
+    "pdfplumber": _pdfplumber_pages,
+    "pdfium": _pdfium_pages,
+    "pdfminer": _pdfminer_pages,
+}
+
+
+def _count_ruling_segments(page) -> int:
+    """Count thin horizontal/vertical path objects (table rules, cell borders)"""
+    count = 0
+    for obj in page.get_objects(filter=[pdfium_raw.FPDF_PAGEOBJ_PATH], max_depth=2):
+        left, bottom, right, top = obj.get_bounds()
+        thickness, length = sorted((right - left, top - bottom))
+        if thickness < 2 and length > 20:
+            count += 1
+    return count
+
+
+def _choose_pdf_engine(pdf) -> str:
+    """
+    Pick pdfplumber for table-heavy documents, the fast engine otherwise.
+    Samples a few pages evenly and looks for ruling lines, which is cheap
+    compared to running table detection.
+    """
+    page_count = len(pdf)
+    if page_count == 0:
+        return settings.PDF_FAST_ENGINE
+
+    sample_size = min(page_count, settings.PDF_TABLE_SAMPLE_PAGES)
+    step = page_count / sample_size
+    table_pages = 0
+    for i in range(sample_size):
+        page = pdf[int(i * step)]
+        if _count_ruling_segments(page) >= settings.PDF_TABLE_RULE_THRESHOLD:
+            table_pages += 1
+        page.close()
+
+    if table_pages / sample_size >= settings.PDF_TABLE_PAGE_RATIO:
+        return "pdfplumber"
+    return settings.PDF_FAST_ENGINE
+
+
+def _extract_pdf_pages(path: str, start: int, end: int, engine: str) -> str:
+    return "\n".join(PDF_ENGINES[engine](path, start, end))
+
+
+def _inspect_pdf(path: str, max_pages: int, engine: str) -> Tuple[int, str, Optional[str]]:
+    """
+    Return (page_count, engine, text). The engine is resolved when "auto";
+    text is None when the PDF is large enough to be split into page ranges.
+    """
+    pdf = pdfium.PdfDocument(path)
+    try:
+        page_count = len(pdf)
+        if engine == "auto":
+            engine = _choose_pdf_engine(pdf)
+    finally:
+        pdf.close()
+
+    if page_count > max_pages:
+        return page_count, engine, None
+    return page_count, engine, _extract_pdf_pages(path, 0, page_count, engine)
+
+
+def _extract_docx(path: str) -> str:
+    doc = docx.Document(path)
+    return "\n".join(p.text for p in doc.paragraphs)
+
+
+def _extract_txt(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
 
 class TextExtractionService:
-    """Service to extract text from PDF and DOCX files"""
+    """Service to extract text from PDF and DOCX files
+
+    Parsing runs in a process pool so it never blocks the event loop. Large
+    PDFs are split into page ranges that are extracted in parallel and
+    reassembled in page order. The PDF engine is chosen per document
+    (PDF_EXTRACTION_ENGINE=auto) or forced to one of PDF_ENGINES.
+
+    Every pool task enforces the extraction timeout itself, so a runaway
+    parse frees its worker. Time spent queued behind other documents does
+    not count; if a task that started does not come back shortly after
+    its timeout, the worker is stuck and the pool is recycled.
+    """
 
-    async def extract_text(self, filepath: str, filename: str) -> str:
+    def __init__(self, pdf_engine: Optional[str] = None):
+        self.pdf_engine = pdf_engine or settings.PDF_EXTRACTION_ENGINE
+        if self.pdf_engine != "auto" and self.pdf_engine not in PDF_ENGINES:
+            raise ValueError(f"Unknown PDF extraction engine: {self.pdf_engine}")
+
+    async def extract_text(self, filepath: str, filename: str, timeout: Optional[float] = None) -> str:
         ext = filename.lower().split(".")[-1]
+        if ext not in ("pdf", "docx", "txt"):
+            raise ValueError("Unsupported file format")
+
+        timeout = timeout or settings.TEXT_EXTRACTION_TIMEOUT_SECONDS
+        try:
+            return await self._extract(filepath, ext, timeout)
+        except ExtractionTimeLimitError:
+            raise TimeoutError(f"Text extraction of {filename} timed out after {timeout}s")
+
+    async def _extract(self, path: str, ext: str, time_limit: float) -> str:
         if ext == "pdf":
-            return self._extract_pdf(filepath)
+            return await self._extract_pdf(path, time_limit)
         elif ext == "docx":
-            return self._extract_docx(filepath)
-        elif ext == "txt":
-            return self._extract_txt(filepath)
+            return await self._run(time_limit, _extract_docx, path)
         else:
-            raise ValueError("Unsupported file format")
-    
-    def _extract_pdf(self, path: str) -> str:
-        text = ""
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        return text
-
-    def _extract_docx(self, path: str) -> str:
-        doc = docx.Document(path)
-        return "\n".join([p.text for p in doc.paragraphs])
-
-    def _extract_txt(self, path: str) -> str:
-        with open(path, encoding="utf-8") as f:
-            return f.read()
+            return await self._run(time_limit, _extract_txt, path)
+
+    async def _extract_pdf(self, path: str, time_limit: float) -> str:
+        pages_per_task = settings.TEXT_EXTRACTION_PAGES_PER_TASK
+
+        # Small PDFs are extracted in the same call that counts their pages
+        page_count, engine, text = await self._run(
+            time_limit, _inspect_pdf, path, pages_per_task, self.pdf_engine
+        )
+        if text is not None:
+            return text
+
+        ranges = [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+        logger.info(
+            f"Extracting {page_count} PDF pages with {engine} in {len(ranges)} parallel ranges: "
+            f"{os.path.basename(path)}"
+        )
+
+        parts = await asyncio.gather(*(
+            self._run(time_limit, _extract_pdf_pages, path, start, end, engine)
+            for start, end in ranges
+        ))
+        return "\n".join(parts)
+
+    async def _run(self, time_limit: float, func, *args):
+        task_id = next(_task_ids)
+        _task_started[task_id] = None
+        future = asyncio.wrap_future(get_extraction_executor().submit(
+            _call_with_time_limit, time_limit, func, *args, task_id=task_id
+        ))
+        try:
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=WATCHDOG_INTERVAL_SECONDS)
+                if done:
+                    return future.result()
+
+                _refresh_task_start_times()
+                started = _task_started[task_id]
+                if started is not None and time.time() - started > time_limit + WORKER_KILL_GRACE_SECONDS:
+                    # The worker ignored its time limit: cancelling the future does not stop it
+                    recycle_extraction_executor()
+                    raise ExtractionTimeLimitError(f"Extraction task exceeded {time_limit}s")
+        finally:
+            # Only a task still queued can be cancelled; it then never runs
+            future.cancel()
+            _task_started.pop(task_id, None)
@@ -1,29 +1,198 @@
 import aiohttp
-import re
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+from multidict import CIMultiDict
+from app.config.settings import settings
+from app.core.http_session import get_http_session
+
+logger = logging.getLogger(__name__)
+
+# Only hosts ending in one of these suffixes are accepted: "gob.mx" matches
+# "sat.gob.mx", "gob" matches "sat.gob"
+ALLOWED_DOMAIN_SUFFIXES = frozenset(
+    suffix.lower().strip(".") for suffix in settings.URL_ALLOWED_DOMAIN_SUFFIXES
+)
+
+# Errors that mean the host itself cannot be reached (DNS, refused connection, timeout)
+UNREACHABLE_ERRORS = (aiohttp.ClientConnectorError, asyncio.TimeoutError)
+
+# Servers that reject HEAD answer with one of these; retry those with GET
+HEAD_FALLBACK_STATUSES = {403, 405, 501}
+
+
+@lru_cache(maxsize=4096)
+def _is_allowed_host(host: str) -> bool:
+    labels = host.lower().rstrip(".").split(".")
+    # Every proper suffix of the host: "a.gob.mx" -> "gob.mx", "mx"
+    return any(".".join(labels[i:]) in ALLOWED_DOMAIN_SUFFIXES for i in range(1, len(labels)))
+
+
+def _url_host(url: str) -> Optional[str]:
+    try:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return None
+        return parts.hostname
+    except ValueError:
+        return None
+
+
+class HostReachabilityCache:
+    """Per-host reachability with separate TTLs for reachable and unreachable hosts"""
+
+    def __init__(self, ttl_seconds: int, unreachable_ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.unreachable_ttl_seconds = unreachable_ttl_seconds
+        self._entries: Dict[str, Tuple[float, bool]] = {}
+
+    def get(self, host: str) -> Optional[bool]:
+        entry = self._entries.get(host)
+        if entry is None:
+            return None
+        expires_at, reachable = entry
+        if expires_at <= time.monotonic():
+            del self._entries[host]
+            return None
+        return reachable
+
+    def set(self, host: str, reachable: bool):
+        ttl = self.ttl_seconds if reachable else self.unreachable_ttl_seconds
+        self._entries[host] = (time.monotonic() + ttl, reachable)
+
+
+# Shared across service instances so bulk imports probe each host once
+_reachability_cache: Optional[HostReachabilityCache] = None
+
+
+def get_reachability_cache() -> HostReachabilityCache:
+    global _reachability_cache
+    if _reachability_cache is None:
+        _reachability_cache = HostReachabilityCache(
+            ttl_seconds=settings.URL_REACHABILITY_TTL_SECONDS,
+            unreachable_ttl_seconds=settings.URL_UNREACHABLE_TTL_SECONDS
+        )
+    return _reachability_cache
+
+
+class FetchedPage:
+    """Response of a validated URL fetch, reused as the scrape result"""
+    def __init__(
+        self,
+        url: str,
+        status: int,
+        body: bytes,
+        headers: Mapping[str, str],
+        charset: Optional[str] = None
+    ):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.charset = charset
+
+    def text(self) -> str:
+        return self.body.decode(self.charset or "utf-8", errors="replace")
 
-# example: only allow .gov, .gob, .gov.co domains
-ALLOWED_DOMAINS = [
-    r"\.gov", r"\.gob", r"\.gov\.co"
-]
 
 class URLValidatorService:
-    """Service to validate if a URL is safe and governmental"""
+    """Service to validate if a URL is safe and governmental
+
+    The domain check parses the host and matches it against
+    ALLOWED_DOMAIN_SUFFIXES, so ".gov" in a path or query no longer passes.
+    Reachability is tracked per host: one HEAD probe (GET only when the
+    server rejects HEAD) per host and TTL, and every fetch refreshes it.
+    """
+
+    def __init__(self, reachability: Optional[HostReachabilityCache] = None):
+        self.reachability = reachability or get_reachability_cache()
+
+    def is_allowed_domain(self, url: str) -> bool:
+        """Returns True if the URL's host is in the government whitelist."""
+        host = _url_host(url)
+        return host is not None and _is_allowed_host(host)
 
     async def validate_url(self, url: str) -> bool:
         """
-        Returns True if the URL is in the government whitelist and is reachable.
+        Returns True if the URL is in the government whitelist and its host is reachable.
         """
-        # Check if in allowed domains
-        if not any(re.search(domain, url) for domain in ALLOWED_DOMAINS):
+        host = _url_host(url)
+        if host is None or not _is_allowed_host(host):
             return False
 
-        # Basic reachability check
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=10) as resp:
-                    if resp.status == 200:
-                        return True
-        except Exception:
-            pass
+        reachable = self.reachability.get(host)
+        if reachable is not None:
+            return reachable
 
+        try:
+            status = await self._probe(url)
+        except aiohttp.ClientError as e:
+            # The host answered but the exchange failed: not valid, but not unreachable either
+            logger.debug(f"Reachability probe failed for {url}: {str(e)}")
+            return False
+        if status is None:
+            self.reachability.set(host, False)
+            return False
+        # A 404 or 5xx for this URL says nothing about the host, so only cache successes
+        if 200 <= status < 300:
+            self.reachability.set(host, True)
+            return True
         return False
+
+    async def _probe(self, url: str) -> Optional[int]:
+        """HEAD the URL, falling back to GET (headers only); None if the host is unreachable"""
+        session = get_http_session()
+        timeout = aiohttp.ClientTimeout(total=settings.URL_VALIDATION_TIMEOUT_SECONDS)
+        try:
+            async with session.head(url, allow_redirects=True, timeout=timeout) as resp:
+                if resp.status not in HEAD_FALLBACK_STATUSES:
+                    return resp.status
+            # The body is never read, the connection is released on exit
+            async with session.get(url, timeout=timeout) as resp:
+                return resp.status
+        except UNREACHABLE_ERRORS as e:
+            logger.debug(f"Host unreachable for {url}: {str(e)}")
+            return None
+
+    async def fetch_validated_url(
+        self,
+        url: str,
+        timeout: float = 30,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Optional[FetchedPage]:
+        """
+        Validate the domain and GET the URL over the shared session.
+
+        Returns the fetched page (any status, e.g. 304 for conditional
+        requests) so callers can reuse the body instead of downloading it
+        again, or None if the domain is not allowed or the host is
+        unreachable (including hosts that recently failed).
+        """
+        host = _url_host(url)
+        if host is None or not _is_allowed_host(host):
+            return None
+        if self.reachability.get(host) is False:
+            return None
+
+        try:
+            session = get_http_session()
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                body = await resp.read()
+                # Any response, 5xx included, means the host is up
+                self.reachability.set(host, True)
+                return FetchedPage(
+                    url=url,
+                    status=resp.status,
+                    body=body,
+                    headers=CIMultiDict(resp.headers),
+                    charset=resp.charset
+                )
+        except UNREACHABLE_ERRORS:
+            # DNS failure, refused connection or timeout: fail fast for this host for a while
+            self.reachability.set(host, False)
+            return None
+        except Exception:
+            return None
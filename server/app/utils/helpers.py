@@ -1 +1,20 @@
-# Helper functions
\ No newline at end of file
+# Helper functions
+from functools import lru_cache
+import tiktoken
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # cl100k_base: the tokenizer of the GPT-4 family and ada-002 embeddings
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    tokens = _encoding().encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return _encoding().decode(tokens[:max_tokens])
@@ -25,6 +25,24 @@ class CiviChatMetrics:
             unit="1"
         )
         
+        self.llm_failures = self.meter.create_counter(
+            name="llm_failures_total",
+            description="Failed LLM attempts by provider and kind (timeout, throttled, ...)",
+            unit="1"
+        )
+        
+        self.llm_retries = self.meter.create_counter(
+            name="llm_retries_total",
+            description="Extra LLM attempts (failover or hedge)",
+            unit="1"
+        )
+        
+        self.answer_cache_lookups = self.meter.create_counter(
+            name="answer_cache_lookups_total",
+            description="Semantic answer cache lookups by result (hit or miss)",
+            unit="1"
+        )
+        
         # Custom histograms
         self.chat_response_time = self.meter.create_histogram(
             name="chat_response_duration",
@@ -32,11 +50,39 @@ class CiviChatMetrics:
             unit="ms"
         )
         
+        self.chat_step_duration = self.meter.create_histogram(
+            name="chat_step_duration",
+            description="Latency of each step of a chat request (search, history, llm, ...)",
+            unit="ms"
+        )
+        
         self.azure_ai_latency = self.meter.create_histogram(
             name="azure_ai_call_duration",
             description="Azure AI service call latency",
             unit="ms"
         )
+        
+        self.llm_first_token_latency = self.meter.create_histogram(
+            name="llm_first_token_duration",
+            description="Time to first token of streamed LLM calls",
+            unit="ms"
+        )
+    
+    def record_llm_call(self, provider: str, duration_ms: float):
+        self.azure_ai_latency.record(duration_ms, {"provider": provider})
+    
+    def record_llm_first_token(self, provider: str, duration_ms: float):
+        self.llm_first_token_latency.record(duration_ms, {"provider": provider})
+    
+    def record_llm_failure(self, provider: str, kind: str):
+        self.llm_failures.add(1, {"provider": provider, "kind": kind})
+    
+    def record_llm_retry(self, reason: str):
+        """reason is "failover" or "hedge"."""
+        self.llm_retries.add(1, {"reason": reason})
+    
+    def record_answer_cache_lookup(self, hit: bool):
+        self.answer_cache_lookups.add(1, {"result": "hit" if hit else "miss"})
     
     def record_chat_request(self, user_location: str = None):
         attributes = {}
@@ -44,6 +90,14 @@ class CiviChatMetrics:
             attributes["location"] = user_location
         self.chat_requests.add(1, attributes)
     
+    def record_chat_timings(self, timings: dict):
+        """Record per-step durations (ms); the "total" step is the response time"""
+        for step, duration_ms in timings.items():
+            if step == "total":
+                self.chat_response_time.record(duration_ms)
+            else:
+                self.chat_step_duration.record(duration_ms, {"step": step})
+    
     def record_government_query(self, query_type: str):
         self.government_queries.add(1, {"query_type": query_type})
     
@@ -0,0 +1,87 @@
+"""Compare HTML extraction engines over saved pages.
+
+Runs every engine in HTMLExtractionService's HTML_ENGINES over all .html/.htm
+files under the corpus directory, with and without main-content detection,
+and reports:
+
+- pages/sec and MB/sec of input HTML
+- total output size, and output size relative to the legacy bs4 path
+- share of the output's words that also appear in the legacy output; the
+  gap mostly comes from the legacy path gluing words across adjacent tags
+  ("ciudadano.Parrafo"), which the new engines split
+
+Save pages to benchmark with e.g.:
+
+    curl -sL https://www.registraduria.gov.co/ -o ~/pages/registraduria.html
+
+Usage (from the server/ directory):
+
+    python -m scripts.benchmark_html_extraction ~/pages
+    python -m scripts.benchmark_html_extraction ~/pages --engines selectolax lxml --repeat 5
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from app.services.html_extraction_service import HTML_ENGINES
+
+
+BASELINE_ENGINE = "bs4"
+MIN_CHARS = 200
+
+
+def _word_precision(reference: str, candidate: str) -> float:
+    ref, cand = Counter(reference.split()), Counter(candidate.split())
+    if not cand:
+        return 1.0
+    return sum((ref & cand).values()) / sum(cand.values())
+
+
+def _run(engine: str, main_content_only: bool, pages, repeat: int):
+    texts = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path, html in pages.items():
+            texts[path] = HTML_ENGINES[engine](html, main_content_only, MIN_CHARS)
+    return texts, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path, help="Directory with saved HTML pages (searched recursively)")
+    parser.add_argument("--engines", nargs="+", default=list(HTML_ENGINES), choices=list(HTML_ENGINES))
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per engine")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in args.corpus.rglob("*") if p.suffix.lower() in (".html", ".htm"))
+    if not paths:
+        sys.exit(f"No HTML files found under {args.corpus}")
+    pages = {str(p): p.read_text(encoding="utf-8", errors="replace") for p in paths}
+    input_mb = sum(len(html.encode("utf-8")) for html in pages.values()) / (1024 * 1024)
+
+    baseline, _ = _run(BASELINE_ENGINE, False, pages, 1)
+    baseline_chars = sum(len(t) for t in baseline.values())
+
+    print(f"Corpus: {len(pages)} pages, {input_mb:.1f} MB of HTML\n")
+    print(
+        f"{'engine':<12}{'main only':>10}{'pages/sec':>12}{'MB/sec':>10}"
+        f"{'chars':>12}{'vs legacy':>11}{'word prec':>11}"
+    )
+    for engine in args.engines:
+        # The legacy path has no main-content detection
+        modes = (False,) if engine == BASELINE_ENGINE else (False, True)
+        for main_content_only in modes:
+            texts, elapsed = _run(engine, main_content_only, pages, args.repeat)
+            chars = sum(len(t) for t in texts.values())
+            precision = sum(_word_precision(baseline[p], texts[p]) for p in pages) / len(pages)
+            print(
+                f"{engine:<12}{'yes' if main_content_only else 'no':>10}"
+                f"{len(pages) / elapsed:>12.1f}{input_mb / elapsed:>10.2f}"
+                f"{chars:>12}{chars / baseline_chars if baseline_chars else 0:>10.0%}{precision:>11.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
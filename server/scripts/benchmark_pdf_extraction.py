@@ -0,0 +1,119 @@
+"""Compare PDF extraction engines over a local corpus.
+
+For every engine in TextExtractionService's PDF_ENGINES, extracts all PDFs
+found under the corpus directory and reports:
+
+- pages/sec and total wall time
+- peak RSS of the process that ran the engine (each engine runs in its own
+  fresh process so numbers are not polluted by the previous one)
+- text quality against the pdfplumber baseline, as word-level F1 (bag of
+  words) and a sequence similarity ratio on the first 20k words
+
+Usage (from the server/ directory):
+
+    python -m scripts.benchmark_pdf_extraction app/files/documents
+    python -m scripts.benchmark_pdf_extraction ~/corpus --engines pdfium pdfplumber
+"""
+import argparse
+import difflib
+import multiprocessing
+import resource
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from app.services.text_extraction_service import PDF_ENGINES, _choose_pdf_engine
+import pypdfium2 as pdfium
+
+
+BASELINE_ENGINE = "pdfplumber"
+SEQUENCE_WORD_LIMIT = 20000
+
+
+def _run_engine(engine: str, paths: List[str], queue):
+    """Child process: extract every PDF with one engine and report back"""
+    texts: Dict[str, str] = {}
+    pages = 0
+    start = time.perf_counter()
+    for path in paths:
+        pdf = pdfium.PdfDocument(path)
+        page_count = len(pdf)
+        resolved = _choose_pdf_engine(pdf) if engine == "auto" else engine
+        pdf.close()
+        texts[path] = "\n".join(PDF_ENGINES[resolved](path, 0, page_count))
+        pages += page_count
+    elapsed = time.perf_counter() - start
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({"engine": engine, "pages": pages, "elapsed": elapsed, "peak_rss_kb": peak_rss_kb, "texts": texts})
+
+
+def _word_f1(reference: str, candidate: str) -> float:
+    ref, cand = Counter(reference.split()), Counter(candidate.split())
+    if not ref and not cand:
+        return 1.0
+    overlap = sum((ref & cand).values())
+    if overlap == 0:
+        return 0.0
+    precision = overlap / sum(cand.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def _sequence_ratio(reference: str, candidate: str) -> float:
+    matcher = difflib.SequenceMatcher(
+        None,
+        reference.split()[:SEQUENCE_WORD_LIMIT],
+        candidate.split()[:SEQUENCE_WORD_LIMIT],
+        autojunk=False
+    )
+    return matcher.ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path, help="Directory with PDF files (searched recursively)")
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=list(PDF_ENGINES) + ["auto"],
+        choices=list(PDF_ENGINES) + ["auto"]
+    )
+    args = parser.parse_args()
+
+    paths = sorted(str(p) for p in args.corpus.rglob("*.pdf"))
+    if not paths:
+        sys.exit(f"No PDF files found under {args.corpus}")
+
+    engines = list(args.engines)
+    if BASELINE_ENGINE not in engines:
+        engines.insert(0, BASELINE_ENGINE)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for engine in engines:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_engine, args=(engine, paths, queue))
+        process.start()
+        results[engine] = queue.get()
+        process.join()
+
+    baseline = results[BASELINE_ENGINE]["texts"]
+    print(f"Corpus: {len(paths)} PDFs, {results[BASELINE_ENGINE]['pages']} pages\n")
+    print(f"{'engine':<12}{'pages/sec':>12}{'time (s)':>12}{'peak RSS (MB)':>16}{'word F1':>10}{'seq ratio':>11}{'chars':>12}")
+    for engine in engines:
+        result = results[engine]
+        texts = result["texts"]
+        f1 = sum(_word_f1(baseline[p], texts[p]) for p in paths) / len(paths)
+        ratio = sum(_sequence_ratio(baseline[p], texts[p]) for p in paths) / len(paths)
+        chars = sum(len(t) for t in texts.values())
+        pages_per_sec = result["pages"] / result["elapsed"] if result["elapsed"] else float("inf")
+        print(
+            f"{engine:<12}{pages_per_sec:>12.1f}{result['elapsed']:>12.2f}"
+            f"{result['peak_rss_kb'] / 1024:>16.1f}{f1:>10.3f}{ratio:>11.3f}{chars:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from app.services import answer_cache_service, search_index_service
+from app.services.answer_cache_service import SemanticAnswerCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def make_cache(monkeypatch, ttl_seconds=60, max_entries=3):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache_service.time, "monotonic", clock.monotonic)
+    return SemanticAnswerCache(threshold=0.95, ttl_seconds=ttl_seconds, max_entries=max_entries), clock
+
+
+def axis(index, size=4):
+    """Unit vector along one axis: orthogonal questions never match each other"""
+    return [1.0 if i == index else 0.0 for i in range(size)]
+
+
+def test_similar_question_hits_and_different_one_misses(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.store(axis(0), "¿Cómo saco el pasaporte?", "En la cancillería", [])
+
+    hit = cache.lookup([0.99, 0.05, 0.0, 0.0])
+
+    assert hit is not None and hit.answer == "En la cancillería"
+    assert cache.lookup(axis(1)) is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache, clock = make_cache(monkeypatch, ttl_seconds=60)
+    cache.store(axis(0), "q0", "a0", [])
+    clock.now += 30
+    cache.store(axis(1), "q1", "a1", [])
+
+    clock.now += 31
+    assert cache.lookup(axis(0)) is None
+    assert cache.lookup(axis(1)).answer == "a1"
+
+    clock.now += 30
+    assert cache.lookup(axis(1)) is None
+    assert cache.snapshot()["entries"] == 0
+    assert cache.stats["evictions"] == 2
+
+
+def test_oldest_entry_is_evicted_beyond_max_entries(monkeypatch):
+    cache, _ = make_cache(monkeypatch, max_entries=3)
+    for i in range(4):
+        cache.store(axis(i), f"q{i}", f"a{i}", [])
+
+    assert cache.lookup(axis(0)) is None
+    assert [cache.lookup(axis(i)).answer for i in (1, 2, 3)] == ["a1", "a2", "a3"]
+    assert cache.stats["evictions"] == 1
+    assert cache.snapshot()["entries"] == 3
+
+
+def test_evicted_slot_is_reused(monkeypatch):
+    cache, _ = make_cache(monkeypatch, max_entries=2)
+    for i in range(3):
+        cache.store(axis(i), f"q{i}", f"a{i}", [])
+
+    assert cache._high_water == 2
+    assert cache.lookup(axis(2)).answer == "a2"
+
+
+def test_duplicate_store_is_ignored(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.store(axis(0), "q", "first", [])
+    cache.store(axis(0), "q", "second", [])
+
+    assert cache.lookup(axis(0)).answer == "first"
+    assert cache.stats["stores"] == 1
+
+
+def test_index_change_drops_every_answer(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.store(axis(0), "q", "a", [])
+
+    search_index_service.bump_index_generation()
+
+    assert cache.lookup(axis(0)) is None
+    assert cache.stats["invalidations"] == 1
+    assert cache.snapshot()["entries"] == 0
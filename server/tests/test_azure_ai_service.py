@@ -0,0 +1,214 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APITimeoutError, BadRequestError, RateLimitError
+
+from app.config.settings import settings
+from app.services.azure_ai_service import AzureOpenAIService, LLMProvider, LLMUnavailableError
+
+REQUEST = httpx.Request("POST", "https://example.openai.azure.com/openai/deployments/gpt/chat/completions")
+
+
+def chunk(content=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices)
+
+
+class FakeStream:
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        for item in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield item
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """chat.completions.create answering from a script: results, errors or (delay, result)"""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.script.pop(0)
+        if isinstance(outcome, tuple):
+            delay, outcome = outcome
+            await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_service(*clients):
+    service = AzureOpenAIService.__new__(AzureOpenAIService)
+    service.providers = [LLMProvider(f"p{i}", client, "gpt") for i, client in enumerate(clients)]
+    service.enabled = True
+    service.hedges = service.hedge_wins = service.failovers = 0
+    return service
+
+
+def stream(service, limit=None):
+    async def run():
+        deltas = []
+        async for delta in service.stream_chat_completion([{"role": "user", "content": "hola"}]):
+            deltas.append(delta)
+            if limit and len(deltas) == limit:
+                break
+        return deltas
+    return asyncio.run(run())
+
+
+def test_stream_yields_deltas_and_skips_chunks_without_content():
+    response = FakeStream([chunk(), chunk("Hola"), chunk(""), chunk(", ¿en qué"), chunk(" ayudo?")])
+    service = make_service(FakeClient(response))
+
+    assert stream(service) == ["Hola", ", ¿en qué", " ayudo?"]
+    assert response.closed
+    call = service.providers[0].client.calls[0]
+    assert call["stream"] is True and call["messages"][0]["role"] == "system"
+    assert len(service.providers[0].first_token_latencies) == 1
+    assert len(service.providers[0].latencies) == 0
+
+
+def test_stream_fails_over_before_the_first_token():
+    failing = FakeClient(APITimeoutError(request=REQUEST))
+    response = FakeStream([chunk("respuesta")])
+    service = make_service(failing, FakeClient(response))
+
+    assert stream(service) == ["respuesta"]
+    assert service.failovers == 1
+    assert service.providers[0].failures == {"timeout": 1}
+
+
+def test_stream_is_closed_when_the_client_stops_reading():
+    response = FakeStream([chunk("uno"), chunk(" dos"), chunk(" tres")])
+    service = make_service(FakeClient(response))
+
+    assert stream(service, limit=2) == ["uno", " dos"]
+    assert response.closed
+
+
+def test_stream_without_a_first_token_before_the_deadline_fails(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_ATTEMPTS", 1)
+    slow = FakeStream([chunk("tarde")], delay=1)
+    service = make_service(FakeClient(slow))
+
+    async def run():
+        deadline = time.monotonic() + 0.05
+        return [d async for d in service.stream_chat_completion([{"role": "user", "content": "hola"}], deadline=deadline)]
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(run())
+    assert slow.closed
+
+
+def test_mock_response_is_streamed_in_words_when_no_provider_is_configured():
+    service = make_service()
+    service.enabled = False
+
+    deltas = stream(service)
+
+    assert len(deltas) > 1 and all(d.endswith(" ") for d in deltas[:-1])
+    assert "".join(deltas) == service._get_mock_response([{"role": "user", "content": "hola"}])
+
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def complete(service, deadline=None):
+    return asyncio.run(service.get_chat_completion([{"role": "user", "content": "hola"}], deadline=deadline))
+
+
+def rate_limited():
+    return RateLimitError("throttled", response=httpx.Response(429, request=REQUEST), body=None)
+
+
+def test_retryable_failure_fails_over_to_the_next_provider():
+    first, second = FakeClient(APITimeoutError(request=REQUEST)), FakeClient(completion("de respaldo"))
+    service = make_service(first, second)
+
+    assert complete(service) == "de respaldo"
+    assert service.failovers == 1
+    assert service.providers[0].failures == {"timeout": 1}
+    assert len(service.providers[1].latencies) == 1
+
+
+def test_bad_request_is_not_retried():
+    error = BadRequestError("bad", response=httpx.Response(400, request=REQUEST), body=None)
+    first, second = FakeClient(error), FakeClient(completion("no"))
+    service = make_service(first, second)
+
+    with pytest.raises(LLMUnavailableError):
+        complete(service)
+    assert second.calls == []
+
+
+def test_throttled_provider_is_tried_last_during_its_cooldown():
+    first = FakeClient(rate_limited(), completion("nunca"))
+    second = FakeClient(completion("b1"), completion("b2"))
+    service = make_service(first, second)
+
+    assert complete(service) == "b1"
+    assert service.providers[0].cooling_down
+    assert complete(service) == "b2"
+    assert len(first.calls) == 1
+
+
+def test_every_attempt_shares_the_call_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_ATTEMPTS", 3)
+    first = FakeClient((1, completion("tarde")))
+    service = make_service(first)
+
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        complete(service, deadline=time.monotonic() + 0.1)
+
+    assert time.monotonic() - started < 0.5
+    assert len(first.calls) == 1 and first.calls[0]["timeout"] <= 0.1
+
+
+def test_slow_attempt_is_hedged_and_the_first_answer_wins(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_SECONDS", 0.05)
+    first, second = FakeClient((1, completion("lenta"))), FakeClient((0.01, completion("rápida")))
+    service = make_service(first, second)
+
+    assert complete(service) == "rápida"
+    assert (service.hedges, service.hedge_wins, service.failovers) == (1, 1, 0)
+
+
+def test_no_hedge_when_the_first_attempt_is_fast_enough(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_SECONDS", 0.5)
+    first, second = FakeClient((0.01, completion("a tiempo"))), FakeClient(completion("no"))
+    service = make_service(first, second)
+
+    assert complete(service) == "a tiempo"
+    assert service.hedges == 0 and second.calls == []
+
+
+def test_hedge_delay_follows_the_p95_latency(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 20)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_SECONDS", 8)
+    provider = LLMProvider("p0", FakeClient(), "gpt")
+    for latency in range(1, 20):
+        provider.latencies.append(latency / 100)
+    assert provider.hedge_delay() == 8
+
+    provider.latencies.append(0.2)
+
+    assert provider.hedge_delay() == 0.2
+    assert provider.snapshot()["p50_ms"] == 110
@@ -0,0 +1,57 @@
+import asyncio
+import io
+import threading
+
+from app.config.settings import settings
+from app.services.blob_storage_service import BlobStorageService
+
+
+class RecordingStream(io.BytesIO):
+    """Remembers which threads read it"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.reader_threads = set()
+
+    def read(self, size=-1):
+        self.reader_threads.add(threading.get_ident())
+        return super().read(size)
+
+
+class FakeBlobClient:
+    url = "https://account.blob.core.windows.net/documents/doc.pdf"
+
+    def __init__(self):
+        self.uploaded = None
+
+    async def upload_blob(self, data, length=None, **kwargs):
+        self.uploaded = b"".join([chunk async for chunk in data])
+        self.length = length
+
+
+class FakeContainer:
+    def __init__(self):
+        self.blob = FakeBlobClient()
+
+    def get_blob_client(self, blob_name):
+        return self.blob
+
+
+def test_upload_stream_reads_the_file_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(settings, "AZURE_STORAGE_MAX_BLOCK_SIZE", 1000)
+    service = BlobStorageService.__new__(BlobStorageService)
+    service.container_client = FakeContainer()
+    service.max_concurrency = 2
+    data = bytes(range(256)) * 20
+    stream = RecordingStream(data)
+
+    async def run():
+        url = await service.upload_stream(stream, "doc.pdf", length=len(data), content_type="application/pdf")
+        return url, threading.get_ident()
+
+    url, loop_thread = asyncio.run(run())
+
+    assert url == FakeBlobClient.url
+    assert service.container_client.blob.uploaded == data
+    assert service.container_client.blob.length == len(data)
+    assert loop_thread not in stream.reader_threads
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.chat import (
+    _decode_cursor,
+    _encode_cursor,
+    _history_etag,
+    _parse_if_none_match,
+)
+
+
+def test_cursor_round_trips_a_continuation_token():
+    token = '{"token":"+RID:~abc==#RT:1#TRC:10","range":{"min":"","max":"FF"}}'
+
+    cursor = _encode_cursor(token)
+
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert _decode_cursor(cursor) == token
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "@@@@", "//8"])
+def test_garbage_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as exc:
+        _decode_cursor(cursor)
+
+    assert exc.value.status_code == 400
+
+
+def test_if_none_match_accepts_weak_strong_and_lists():
+    assert _parse_if_none_match(None) == []
+    assert _parse_if_none_match('W/"a", "b"') == ['W/"a"', 'W/"b"']
+
+
+def test_history_etag_changes_with_version_page_and_pending_messages():
+    base = _history_etag("c1", '"00000001"', 20, None, [])
+
+    assert base.startswith('W/"')
+    assert base == _history_etag("c1", '"00000001"', 20, None, [])
+    assert base != _history_etag("c1", '"00000002"', 20, None, [])
+    assert base != _history_etag("c1", '"00000001"', 10, None, [])
+    assert base != _history_etag("c1", '"00000001"', 20, "cursor", [])
+    assert base != _history_etag("c1", '"00000001"', 20, None, [SimpleNamespace(id="m1")])
@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+from aiohttp import web
+
+from app.config.settings import settings
+from app.core.http_session import close_http_session
+from app.services import content_safety_service
+from app.services.content_safety_service import (
+    MAX_RETRY_AFTER_SECONDS,
+    ContentSafetyService,
+    SafetyVerdictCache,
+    retry_after_seconds,
+    split_text_segments,
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("3", 3.0),
+    ("0.5", 0.5),
+    ("-4", 0.0),
+    ("86400", MAX_RETRY_AFTER_SECONDS),
+    (None, 2.0),
+    ("", 2.0),
+    ("soon", 2.0),
+    ("nan", 2.0),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+])
+def test_retry_after_seconds(value, expected):
+    assert retry_after_seconds(value, default=2.0) == expected
+
+
+def test_retry_after_http_date_in_the_future():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    delay = retry_after_seconds(format_datetime(retry_at, usegmt=True), default=2.0)
+
+    assert 28 <= delay <= 30
+
+
+def test_segments_cut_on_whitespace_and_cover_the_text():
+    text = " ".join(f"palabra{i}" for i in range(300))
+
+    segments = split_text_segments(text, max_chars=100)
+
+    assert "".join(segments) == text
+    assert all(len(s) <= 100 for s in segments)
+    assert all(s.endswith(tuple("0123456789")) for s in segments[:-1])
+
+
+def test_text_without_whitespace_is_cut_at_the_limit():
+    assert split_text_segments("x" * 250, max_chars=100) == ["x" * 100, "x" * 100, "x" * 50]
+
+
+def test_verdicts_persist_in_sqlite_behind_a_bounded_lru(tmp_path):
+    path = str(tmp_path / "cache" / "verdicts.db")
+    cache = SafetyVerdictCache(max_entries=2, db_path=path)
+
+    async def run():
+        for key, verdict in (("a", True), ("b", False), ("c", True)):
+            await cache.set(key, verdict)
+        reopened = SafetyVerdictCache(max_entries=2, db_path=path)
+        return list(cache._lru), await reopened.get("a"), await reopened.get("b"), await reopened.get("z")
+
+    lru, a, b, missing = asyncio.run(run())
+
+    assert lru == ["b", "c"]
+    assert (a, b, missing) == (True, False, None)
+
+
+class ScriptedService(ContentSafetyService):
+    """Verdicts by segment text, with a delay per segment; records the calls"""
+
+    def __init__(self, verdicts, delays=None):
+        super().__init__(SafetyVerdictCache(max_entries=100))
+        self.verdicts = verdicts
+        self.delays = delays or {}
+        self.analyzed = []
+        self.cancelled = []
+
+    async def _analyze_segment(self, segment):
+        self.analyzed.append(segment)
+        try:
+            await asyncio.sleep(self.delays.get(segment, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(segment)
+            raise
+        return self.verdicts[segment]
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_SAFETY_SEGMENT_CHARS", 5)
+    monkeypatch.setattr(settings, "CONTENT_SAFETY_MAX_CONCURRENCY", 4)
+
+
+def test_known_segments_are_not_sent_again(small_segments):
+    service = ScriptedService({"aaaa ": True, "bbbb ": True, "cccc": True})
+
+    async def run():
+        first = await service.validate_text("aaaa bbbb cccc")
+        service.analyzed.clear()
+        second = await service.validate_text("aaaa bbbb cccc")
+        return first, second
+
+    assert asyncio.run(run()) == (True, True)
+    assert service.analyzed == []
+
+
+def test_first_unsafe_segment_stops_the_others(small_segments):
+    service = ScriptedService(
+        {"aaaa ": True, "bbbb ": False, "cccc": True},
+        delays={"aaaa ": 1, "cccc": 1},
+    )
+
+    assert asyncio.run(service.validate_text("aaaa bbbb cccc")) is False
+    assert sorted(service.cancelled) == ["aaaa ", "cccc"]
+
+
+def test_cached_unsafe_verdict_rejects_without_calls(small_segments):
+    service = ScriptedService({"aaaa ": True, "bbbb ": False, "cccc": True})
+    asyncio.run(service.validate_text("bbbb "))
+    service.analyzed.clear()
+
+    assert asyncio.run(service.validate_text("aaaa bbbb cccc")) is False
+    assert service.analyzed == []
+
+
+def test_failed_call_is_unsafe_and_not_cached(small_segments):
+    service = ScriptedService({"aaaa": None})
+
+    assert asyncio.run(service.validate_text("aaaa")) is False
+    assert asyncio.run(service.validate_text("aaaa")) is False
+    assert service.analyzed == ["aaaa", "aaaa"]
+
+
+def test_throttled_call_is_retried(monkeypatch):
+    responses = [
+        web.json_response({}, status=429, headers={"Retry-After": "0"}),
+        web.json_response({"categoriesAnalysis": [{"category": "Hate", "severity": 6}]}),
+    ]
+    requests = []
+
+    async def analyze(request):
+        requests.append(await request.json())
+        return responses.pop(0)
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/contentsafety/text:analyze", analyze)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        endpoint = f"http://127.0.0.1:{runner.addresses[0][1]}"
+        monkeypatch.setattr(content_safety_service, "AZURE_CONTENT_SAFETY_ENDPOINT", endpoint)
+        monkeypatch.setattr(content_safety_service, "AZURE_CONTENT_SAFETY_KEY", "key")
+        try:
+            return await ContentSafetyService(SafetyVerdictCache(max_entries=10))._analyze_segment("texto")
+        finally:
+            await close_http_session()
+            await runner.cleanup()
+
+    assert asyncio.run(run()) is False
+    assert requests == [{"text": "texto"}, {"text": "texto"}]
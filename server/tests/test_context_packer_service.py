@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.config.settings import settings
+from app.services.context_packer_service import (
+    PASSAGE_SEPARATOR,
+    ContextPackerService,
+    merge_overlapping,
+)
+from app.utils import helpers
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """One token per word, so tests need no tiktoken download"""
+    encoding = SimpleNamespace(encode=str.split, decode=" ".join)
+    monkeypatch.setattr(helpers, "_encoding", lambda: encoding)
+    monkeypatch.setattr(settings, "CONTEXT_MIN_PASSAGE_TOKENS", 2)
+
+
+def words(start, end):
+    return " ".join(f"w{i}" for i in range(start, end))
+
+
+def chunk(document_id, index, content, **extra):
+    return {"document_id": document_id, "chunk_index": index, "content": content, "title": document_id, **extra}
+
+
+def test_merge_overlapping_drops_the_repeated_text():
+    first = "El pasaporte se solicita en línea y se recoge en la oficina"
+    second = "se recoge en la oficina con la cita impresa"
+
+    assert merge_overlapping(first, second) == (
+        "El pasaporte se solicita en línea y se recoge en la oficina con la cita impresa"
+    )
+
+
+def test_merge_overlapping_picks_the_longest_overlap():
+    first = "uno dos tres cuatro cinco seis uno dos tres cuatro cinco seis"
+    second = "uno dos tres cuatro cinco seis siete"
+
+    assert merge_overlapping(first, second) == first + " siete"
+
+
+def test_merge_overlapping_without_overlap_concatenates():
+    assert merge_overlapping("primer bloque de texto ", "segundo bloque de texto largo") == (
+        "primer bloque de texto segundo bloque de texto largo"
+    )
+
+
+def test_merge_overlapping_ignores_short_common_words():
+    # Shorter than MIN_OVERLAP_CHARS: never treated as an overlap
+    assert merge_overlapping("termina en la", "la oficina") == "termina en lala oficina"
+
+
+def test_pack_merges_consecutive_chunks_of_a_document():
+    documents = [
+        chunk("a", 1, words(4, 20)),
+        chunk("a", 0, words(0, 10)),
+        chunk("b", 0, words(100, 105)),
+    ]
+
+    packed = ContextPackerService(max_tokens=100).pack(documents)
+
+    assert [d["document_id"] for d in packed] == ["a", "b"]
+    assert packed[0]["content"] == words(0, 20)
+    assert "chunk_index" not in packed[0]
+
+
+def test_pack_separates_non_adjacent_passages_in_reading_order():
+    documents = [chunk("a", 5, words(50, 55)), chunk("a", 1, words(10, 15))]
+
+    packed = ContextPackerService(max_tokens=100).pack(documents)
+
+    assert packed[0]["content"] == words(10, 15) + PASSAGE_SEPARATOR + words(50, 55)
+
+
+def test_pack_skips_duplicate_chunks():
+    documents = [chunk("a", 0, words(0, 5)), chunk("a", 0, words(0, 5))]
+
+    assert ContextPackerService(max_tokens=100).pack(documents)[0]["content"] == words(0, 5)
+
+
+def test_pack_fills_the_budget_by_relevance_and_truncates_the_last():
+    documents = [
+        chunk("a", 0, words(0, 6)),
+        chunk("b", 0, words(100, 106)),
+        chunk("c", 0, words(200, 206)),
+    ]
+
+    packed = ContextPackerService(max_tokens=10).pack(documents)
+
+    assert [d["document_id"] for d in packed] == ["a", "b"]
+    assert packed[1]["content"] == words(100, 104)
+
+
+def test_pack_leaves_a_leftover_below_the_minimum_unused(monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_MIN_PASSAGE_TOKENS", 5)
+    documents = [chunk("a", 0, words(0, 7)), chunk("b", 0, words(100, 106))]
+
+    packed = ContextPackerService(max_tokens=10).pack(documents)
+
+    assert [d["document_id"] for d in packed] == ["a"]
+
+
+def test_pack_keeps_citation_fields():
+    documents = [chunk("a", 0, words(0, 3), uri="/api/v1/documents/a/content", type="PDF")]
+
+    packed = ContextPackerService(max_tokens=100).pack(documents)
+
+    assert packed == [{
+        "document_id": "a",
+        "title": "a",
+        "uri": "/api/v1/documents/a/content",
+        "type": "PDF",
+        "content": words(0, 3),
+    }]
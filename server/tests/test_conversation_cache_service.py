@@ -0,0 +1,100 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.config.settings import settings
+from app.services import conversation_cache_service
+from app.services.conversation_cache_service import ConversationCacheService
+
+
+class FakeRedis:
+    """Just the commands the cache uses, shared like a real server"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def aclose(self):
+        pass
+
+
+def make_cache(monkeypatch, redis=None):
+    monkeypatch.setattr(settings, "CONVERSATION_CACHE_REDIS_ENABLED", redis is not None)
+    monkeypatch.setattr(conversation_cache_service, "aioredis", SimpleNamespace(from_url=lambda url: redis))
+    return ConversationCacheService()
+
+
+class Store:
+    """The database behind the cache, counting loads"""
+
+    def __init__(self, value):
+        self.value = value
+        self.loads = 0
+
+    async def load(self):
+        self.loads += 1
+        await asyncio.sleep(0)
+        return dict(self.value)
+
+
+def test_local_update_changes_the_cached_value(monkeypatch):
+    cache = make_cache(monkeypatch)
+    store = Store({"message_count": 1})
+
+    async def run():
+        await cache.get_or_load("conversation:c1", store.load)
+        await cache.update("conversation:c1", lambda v: {**v, "message_count": v["message_count"] + 1})
+        return await cache.get_or_load("conversation:c1", store.load)
+
+    assert asyncio.run(run()) == {"message_count": 2}
+    assert store.loads == 1
+
+
+def test_concurrent_misses_share_one_load(monkeypatch):
+    cache = make_cache(monkeypatch)
+    store = Store({"message_count": 1})
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("conversation:c1", store.load) for _ in range(5)))
+
+    assert asyncio.run(run()) == [{"message_count": 1}] * 5
+    assert store.loads == 1
+
+
+def test_with_redis_a_write_in_one_process_is_seen_by_another(monkeypatch):
+    redis = FakeRedis()
+    first, second = make_cache(monkeypatch, redis), make_cache(monkeypatch, redis)
+    store = Store({"message_count": 1})
+
+    async def run():
+        await first.get_or_load("conversation:c1", store.load)
+        # The other process appends a message: the database changes, its cache update drops the entry
+        store.value = {"message_count": 2}
+        await second.update("conversation:c1", lambda v: {**v, "message_count": v["message_count"] + 1})
+        return await first.get_or_load("conversation:c1", store.load)
+
+    assert asyncio.run(run()) == {"message_count": 2}
+    assert store.loads == 2
+
+
+def test_with_redis_loads_are_shared_between_processes(monkeypatch):
+    redis = FakeRedis()
+    first, second = make_cache(monkeypatch, redis), make_cache(monkeypatch, redis)
+    store = Store({"message_count": 1})
+
+    async def run():
+        await first.get_or_load("conversation:c1", store.load)
+        return await second.get_or_load("conversation:c1", store.load)
+
+    assert asyncio.run(run()) == {"message_count": 1}
+    assert store.loads == 1
+    assert json.loads(redis.data["civi:conversation-cache:conversation:c1"]) == {"message_count": 1}
@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.config.settings import settings
+from app.models.conversation import Conversation, Message
+from app.services.conversation_history_service import ConversationHistoryService
+from app.utils import helpers
+
+START = datetime(2026, 1, 1, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """One token per word, so tests need no tiktoken download"""
+    encoding = SimpleNamespace(encode=str.split, decode=" ".join)
+    monkeypatch.setattr(helpers, "_encoding", lambda: encoding)
+
+
+def message(i, words=6, role=None):
+    return Message(
+        conversation_id="c1",
+        role=role or ("user" if i % 2 == 0 else "model"),
+        content=" ".join([f"m{i}"] * words),
+        timestamp=START + timedelta(minutes=i),
+    )
+
+
+class FakeAIService:
+    enabled = True
+
+    def __init__(self, summary="Resumen nuevo"):
+        self.summary = summary
+        self.prompts = []
+
+    async def complete(self, messages, max_tokens):
+        self.prompts.append(messages)
+        await asyncio.sleep(0)
+        return self.summary
+
+
+class FakeConversationRepository:
+    def __init__(self, messages):
+        self.messages = messages
+        self.summaries = []
+
+    async def get_recent_messages(self, conversation_id, limit):
+        return self.messages[-limit:]
+
+    async def get_messages_between(self, conversation_id, after, before, limit):
+        return [
+            m for m in self.messages
+            if (after is None or m.timestamp > after) and m.timestamp < before
+        ][:limit]
+
+    async def update_summary(self, conversation_id, summary, summarized_until):
+        self.summaries.append((summary, summarized_until))
+
+
+def build(service, repo, conversation, messages):
+    async def run():
+        history = service.build_history(repo, conversation, messages)
+        # Let a scheduled summary refresh finish
+        await asyncio.gather(*service._tasks)
+        return history
+    return asyncio.run(run())
+
+
+def test_history_keeps_the_newest_messages_that_fit(monkeypatch):
+    # Each message costs 6 words + 4 overhead = 10 tokens
+    monkeypatch.setattr(settings, "CHAT_HISTORY_MAX_TOKENS", 35)
+    messages = [message(i) for i in range(6)]
+    conversation = Conversation(id="c1", message_count=6)
+    service = ConversationHistoryService(FakeAIService())
+    repo = FakeConversationRepository(messages)
+
+    history = build(service, repo, conversation, messages)
+
+    assert [h["content"].split()[0] for h in history] == ["m3", "m4", "m5"]
+    assert [h["role"] for h in history] == ["assistant", "user", "assistant"]
+    # The three messages left out are folded into the summary in the background
+    assert repo.summaries == [("Resumen nuevo", messages[2].timestamp)]
+
+
+def test_latest_message_is_kept_even_over_the_budget(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_MAX_TOKENS", 5)
+    messages = [message(0, words=50)]
+    service = ConversationHistoryService(FakeAIService())
+
+    history = build(service, FakeConversationRepository(messages), Conversation(id="c1", message_count=1), messages)
+
+    assert [h["content"] for h in history] == [messages[0].content]
+
+
+def test_summary_replaces_the_summarized_messages(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_MAX_TOKENS", 100)
+    messages = [message(i) for i in range(4)]
+    conversation = Conversation(
+        id="c1", message_count=4, summary="El usuario pregunta por su pasaporte",
+        summarized_until=messages[1].timestamp,
+    )
+    ai_service = FakeAIService()
+    service = ConversationHistoryService(ai_service)
+
+    history = build(service, FakeConversationRepository(messages), conversation, messages)
+
+    assert history[0] == {
+        "role": "system",
+        "content": "Summary of the earlier conversation:\nEl usuario pregunta por su pasaporte",
+    }
+    assert [h["content"].split()[0] for h in history[1:]] == ["m2", "m3"]
+    assert ai_service.prompts == []
+
+
+def test_summary_counts_against_the_budget(monkeypatch):
+    # Summary: 10 words + 4 overhead + the 5-word prefix
+    monkeypatch.setattr(settings, "CHAT_HISTORY_MAX_TOKENS", 40)
+    messages = [message(i) for i in range(4)]
+    conversation = Conversation(id="c1", message_count=4, summary=" ".join(["resumen"] * 10))
+    service = ConversationHistoryService(FakeAIService())
+
+    history = build(service, FakeConversationRepository(messages), conversation, messages)
+
+    assert [h["content"].split()[0] for h in history[1:]] == ["m2", "m3"]
+
+
+def test_refresh_extends_the_existing_summary(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_MAX_TOKENS", 15)
+    messages = [message(i) for i in range(4)]
+    conversation = Conversation(
+        id="c1", message_count=4, summary="Resumen anterior", summarized_until=messages[0].timestamp
+    )
+    ai_service = FakeAIService()
+    repo = FakeConversationRepository(messages)
+    service = ConversationHistoryService(ai_service)
+
+    build(service, repo, conversation, messages)
+
+    prompt = ai_service.prompts[0][1]["content"]
+    assert prompt.startswith("Current summary:\nResumen anterior")
+    assert "m0" not in prompt and "user: m2" in prompt and "m3" not in prompt
+    assert repo.summaries == [("Resumen nuevo", messages[2].timestamp)]
+
+
+def test_one_refresh_at_a_time_per_conversation(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_MAX_TOKENS", 15)
+    messages = [message(i) for i in range(4)]
+    conversation = Conversation(id="c1", message_count=4)
+    ai_service = FakeAIService()
+    service = ConversationHistoryService(ai_service)
+    repo = FakeConversationRepository(messages)
+
+    async def run():
+        service.build_history(repo, conversation, messages)
+        service.build_history(repo, conversation, messages)
+        await asyncio.gather(*service._tasks)
+
+    asyncio.run(run())
+
+    assert len(ai_service.prompts) == 1
+
+
+def test_recent_messages_include_queued_ones():
+    stored = [message(0), message(1)]
+    queued = message(2)
+    writer = SimpleNamespace(pending_messages=lambda conversation_id: [queued])
+    service = ConversationHistoryService(FakeAIService(), writer)
+
+    recent = asyncio.run(service.recent_messages(
+        FakeConversationRepository(stored), Conversation(id="c1", message_count=2)
+    ))
+
+    assert recent == stored + [queued]
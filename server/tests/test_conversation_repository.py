@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+
+from app.repositories.conversation_repository import ConversationRepository
+
+
+class Conversations:
+    """Conversations container that applies patches and records every call"""
+
+    def __init__(self, *ids):
+        self.docs = {i: {"id": i, "message_count": 0} for i in ids}
+        self.calls = []
+
+    async def read_item(self, item, partition_key):
+        self.calls.append("read")
+        return dict(self.docs[item])
+
+    async def replace_item(self, item, body):
+        self.calls.append("replace")
+        self.docs[item] = body
+
+    async def patch_item(self, item, partition_key, patch_operations, filter_predicate=None, no_response=False):
+        self.calls.append("patch")
+        await asyncio.sleep(0)
+        if item not in self.docs:
+            raise CosmosResourceNotFoundError(message="not found")
+        doc = self.docs[item]
+        for op in patch_operations:
+            key = op["path"][1:]
+            doc[key] = doc.get(key, 0) + op["value"] if op["op"] == "incr" else op["value"]
+
+
+class Messages:
+    def __init__(self, fail=False):
+        self.items = {}
+        self.fail = fail
+        self.calls = []
+
+    async def upsert_item(self, body):
+        self.calls.append("upsert")
+        if self.fail:
+            raise RuntimeError("write failed")
+        self.items[body["id"]] = body
+
+
+class Database:
+    def __init__(self, conversations, messages):
+        self.containers = {"conversations": conversations, "messages": messages}
+
+    def get_container_client(self, name):
+        return self.containers[name]
+
+
+def make_repo(*conversation_ids, fail=False):
+    conversations, messages = Conversations(*conversation_ids), Messages(fail)
+    return ConversationRepository(Database(conversations, messages)), conversations, messages
+
+
+def test_append_is_one_patch_and_one_upsert_without_reads():
+    repo, conversations, messages = make_repo("c1")
+
+    message = asyncio.run(repo.add_message("c1", "user", "¿Dónde renuevo mi licencia?"))
+
+    assert conversations.calls == ["patch"] and messages.calls == ["upsert"]
+    doc = conversations.docs["c1"]
+    assert doc["message_count"] == 1
+    assert doc["updated_at"] == message.timestamp.isoformat()
+    assert messages.items[message.id]["content"] == "¿Dónde renuevo mi licencia?"
+
+
+def test_concurrent_appends_are_all_counted():
+    repo, conversations, messages = make_repo("c1")
+
+    async def run():
+        await asyncio.gather(*(repo.add_message("c1", "user", f"m{i}") for i in range(10)))
+
+    asyncio.run(run())
+
+    assert conversations.docs["c1"]["message_count"] == 10
+    assert len(messages.items) == 10
+
+
+def test_append_to_a_missing_conversation_writes_nothing():
+    repo, conversations, messages = make_repo()
+
+    assert asyncio.run(repo.add_message("missing", "user", "hola")) is None
+    assert messages.calls == []
+
+
+def test_failed_message_write_undoes_the_increment():
+    repo, conversations, messages = make_repo("c1", fail=True)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(repo.add_message("c1", "user", "hola"))
+
+    assert conversations.docs["c1"]["message_count"] == 0
+    assert conversations.calls == ["patch", "patch"]
@@ -0,0 +1,169 @@
+import asyncio
+import gzip
+from types import SimpleNamespace
+
+import pytest
+
+from app.config.settings import settings
+from app.services.crawler_service import CrawlerService, RobotsCache, _gunzip_limited, normalize_url
+
+
+def test_gunzip_limited_returns_small_payloads():
+    data = b"<urlset>" + b"x" * 1000 + b"</urlset>"
+
+    assert _gunzip_limited(gzip.compress(data), max_bytes=len(data)) == data
+
+
+def test_gunzip_limited_stops_a_gzip_bomb():
+    bomb = gzip.compress(b"\0" * (20 * 1024 * 1024))
+
+    with pytest.raises(ValueError):
+        _gunzip_limited(bomb, max_bytes=1024 * 1024)
+
+
+def sitemap_index(children):
+    locs = "".join(f"<sitemap><loc>{c}</loc></sitemap>" for c in children)
+    return f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</sitemapindex>'.encode()
+
+
+def urlset(urls):
+    locs = "".join(f"<url><loc>{u}</loc></url>" for u in urls)
+    return f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'.encode()
+
+
+class FakeValidator:
+    """Serves sitemap bodies by URL and remembers what was fetched"""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.fetched = []
+
+    async def fetch_validated_url(self, url, timeout=30):
+        self.fetched.append(url)
+        body = self.bodies.get(url)
+        if body is None:
+            return None
+        return SimpleNamespace(url=url, status=200, body=body, headers={})
+
+
+def make_crawler(bodies):
+    crawler = CrawlerService.__new__(CrawlerService)
+    crawler.url_validator = FakeValidator(bodies)
+    return crawler
+
+
+def expand(crawler, seed, sitemap):
+    async def run():
+        return [url async for url in crawler._sitemap_urls(seed, sitemap)]
+    return asyncio.run(run())
+
+
+def test_nested_sitemaps_are_capped(monkeypatch):
+    monkeypatch.setattr(settings, "CRAWLER_MAX_SITEMAPS", 3)
+    root = "https://www.gob.mx/sitemap.xml"
+    children = [f"https://www.gob.mx/sitemap-{i}.xml" for i in range(10)]
+    bodies = {root: sitemap_index(children)}
+    bodies.update({c: urlset([f"https://www.gob.mx/page-{i}"]) for i, c in enumerate(children)})
+    crawler = make_crawler(bodies)
+
+    urls = expand(crawler, "https://www.gob.mx/", root)
+
+    assert crawler.url_validator.fetched == [root] + children[:2]
+    assert urls == ["https://www.gob.mx/page-0", "https://www.gob.mx/page-1"]
+
+
+def test_sitemap_urls_are_capped(monkeypatch):
+    monkeypatch.setattr(settings, "CRAWLER_MAX_SITEMAP_URLS", 5)
+    root = "https://www.gob.mx/sitemap.xml"
+    crawler = make_crawler({root: gzip.compress(urlset([f"https://www.gob.mx/p{i}" for i in range(50)]))})
+
+    assert len(expand(crawler, "https://www.gob.mx/", root)) == 5
+
+
+def test_oversized_sitemap_is_skipped(monkeypatch):
+    monkeypatch.setattr(settings, "CRAWLER_SITEMAP_MAX_BYTES", 100)
+    root = "https://www.gob.mx/sitemap.xml"
+    crawler = make_crawler({root: gzip.compress(urlset([f"https://www.gob.mx/p{i}" for i in range(50)]))})
+
+    assert expand(crawler, "https://www.gob.mx/", root) == []
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://WWW.Gob.MX:443/tramites?b=2&a=1#inicio", "https://www.gob.mx/tramites?a=1&b=2"),
+    ("https://www.gob.mx", "https://www.gob.mx/"),
+    ("http://www.gob.mx:8080/a?utm_source=x&gclid=y&id=3", "http://www.gob.mx:8080/a?id=3"),
+    ("ftp://www.gob.mx/a", None),
+    ("/relative/path", None),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+class RobotsValidator:
+    """Serves robots.txt responses by origin, slowly, counting fetches"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.fetches = 0
+
+    async def fetch_validated_url(self, url, timeout=30):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        response = self.responses[url]
+        if response is None:
+            return None
+        status, text = response
+        return SimpleNamespace(url=url, status=status, text=lambda: text)
+
+
+ROBOTS = f"""User-agent: {settings.HTTP_USER_AGENT.split("/")[0]}
+Disallow: /privado/
+Crawl-delay: 2
+
+Sitemap: https://www.gob.mx/sitemap.xml
+"""
+
+
+def test_robots_rules_are_fetched_once_per_origin():
+    validator = RobotsValidator({"https://www.gob.mx/robots.txt": (200, ROBOTS)})
+    robots = RobotsCache(validator, ttl_seconds=60)
+
+    async def run():
+        allowed = await asyncio.gather(
+            robots.can_fetch("https://www.gob.mx/tramites"),
+            robots.can_fetch("https://www.gob.mx/privado/datos"),
+        )
+        return allowed, await robots.crawl_delay("https://www.gob.mx/"), await robots.sitemaps("https://www.gob.mx/")
+
+    allowed, delay, sitemaps = asyncio.run(run())
+
+    assert allowed == [True, False]
+    assert delay == 2.0
+    assert sitemaps == ["https://www.gob.mx/sitemap.xml"]
+    assert validator.fetches == 1
+
+
+def test_robots_rules_expire_after_the_ttl():
+    validator = RobotsValidator({"https://www.gob.mx/robots.txt": (200, ROBOTS)})
+    robots = RobotsCache(validator, ttl_seconds=0.2)
+
+    async def run():
+        await robots.can_fetch("https://www.gob.mx/a")
+        await robots.can_fetch("https://www.gob.mx/b")
+        await asyncio.sleep(0.25)
+        await robots.can_fetch("https://www.gob.mx/c")
+
+    asyncio.run(run())
+
+    assert validator.fetches == 2
+
+
+@pytest.mark.parametrize("response, allowed", [
+    ((404, ""), True),
+    ((503, ""), False),
+    (None, False),
+])
+def test_missing_robots_allows_and_unreachable_robots_disallows(response, allowed):
+    robots = RobotsCache(RobotsValidator({"https://www.gob.mx/robots.txt": response}), ttl_seconds=60)
+
+    assert asyncio.run(robots.can_fetch("https://www.gob.mx/tramites")) is allowed
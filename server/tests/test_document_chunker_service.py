@@ -0,0 +1,51 @@
+from app.services import document_chunker_service
+from app.services.document_chunker_service import DocumentChunkerService
+
+
+class WordEncoding:
+    """One token per word, so tests need no tiktoken download"""
+
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def make_chunker(monkeypatch, chunk_size=800, chunk_overlap=100):
+    monkeypatch.setattr(document_chunker_service.tiktoken, "get_encoding", lambda name: WordEncoding())
+    return DocumentChunkerService(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def words(count):
+    return " ".join(f"w{i}" for i in range(count))
+
+
+def test_text_shorter_than_a_chunk_gives_one_chunk(monkeypatch):
+    # Regression: the loop stepped back by the overlap after the last chunk and never ended
+    chunker = make_chunker(monkeypatch)
+
+    chunks = chunker.chunk_text(words(50), "doc")
+
+    assert [c.content for c in chunks] == [words(50)]
+    assert chunks[0].total_chunks == 1
+
+
+def test_chunks_overlap_and_stop_at_the_end(monkeypatch):
+    chunker = make_chunker(monkeypatch, chunk_size=10, chunk_overlap=3)
+
+    chunks = chunker.chunk_text(words(24), "doc")
+
+    # Starts at 0, 7, 14: the third chunk reaches the end
+    assert [c.content.split()[0] for c in chunks] == ["w0", "w7", "w14"]
+    assert chunks[-1].content.split()[-1] == "w23"
+    assert [c.chunk_index for c in chunks] == [0, 1, 2]
+    assert all(c.total_chunks == 3 for c in chunks)
+
+
+def test_text_of_exactly_one_chunk(monkeypatch):
+    chunker = make_chunker(monkeypatch, chunk_size=10, chunk_overlap=3)
+
+    chunks = chunker.chunk_text(words(10), "doc")
+
+    assert len(chunks) == 1
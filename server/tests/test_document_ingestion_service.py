@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.config.settings import settings
+from app.repositories.document_repository import DocumentRepository
+from app.services.document_ingestion_service import DocumentIngestionService
+
+
+def make_service(max_concurrency=8, **attrs):
+    service = DocumentIngestionService.__new__(DocumentIngestionService)
+    service._item_semaphore = asyncio.Semaphore(max_concurrency)
+    service._extraction_semaphore = asyncio.Semaphore(2)
+    service._inflight_hashes = {}
+    service.__dict__.update(attrs)
+    return service
+
+
+class Concurrency:
+    """Tracks how many items are being processed at once"""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    async def hold(self, seconds):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        await asyncio.sleep(seconds)
+        self.current -= 1
+
+
+def test_items_run_concurrently_and_results_keep_request_order():
+    service = make_service(max_concurrency=3)
+    concurrency = Concurrency()
+
+    async def process_file(file):
+        # Later files finish first
+        await concurrency.hold(0.05 - 0.01 * int(file.filename[1]))
+        if file.filename == "f2":
+            raise RuntimeError("extraction failed")
+        return {"safe": True, "document_id": f"doc-{file.filename}"}
+
+    async def process_url(url):
+        await concurrency.hold(0.01)
+        if url.endswith("bad"):
+            return {"safe": False, "reason": "URL not in whitelist"}
+        return {"safe": True, "duplicate": True, "document_id": "doc-existing"}
+
+    service._process_file = process_file
+    service._process_url = process_url
+    files = [SimpleNamespace(filename=f"f{i}") for i in range(4)]
+    urls = [{"url": "https://www.gob.mx/a"}, {"url": "https://example.com/bad"}]
+
+    result = asyncio.run(service.process_ingestion(files, urls))
+
+    assert concurrency.peak == 3
+    assert result["files_accepted"] == ["f0", "f1", "f3"]
+    assert result["files_rejected"] == ["f2: Processing error"]
+    assert result["urls_duplicate"] == ["https://www.gob.mx/a: doc-existing"]
+    assert result["urls_rejected"] == ["https://example.com/bad: URL not in whitelist"]
+    assert (result["files_processed"], result["urls_processed"]) == (4, 2)
+
+
+class FakeUpload:
+    """UploadFile stand-in that records the size of every read"""
+
+    def __init__(self, filename, data, fail_after=None):
+        self.filename = filename
+        self.content_type = "application/pdf"
+        self.data = data
+        self.position = 0
+        self.reads = []
+        self.fail_after = fail_after
+
+    async def read(self, size=-1):
+        if self.fail_after is not None and self.position >= self.fail_after:
+            raise ConnectionResetError("client went away")
+        self.reads.append(size)
+        chunk = self.data[self.position:self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+
+def test_uploads_are_spooled_in_chunks_and_hashed(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_UPLOAD_CHUNK_SIZE", 1000)
+    service = make_service(staging_path=str(tmp_path))
+    data = bytes(range(256)) * 10
+    upload = FakeUpload("Informe.PDF", data)
+
+    spooled = asyncio.run(service._spool_upload(upload))
+
+    assert set(upload.reads) == {1000}
+    assert spooled.path.endswith(".pdf") and os.path.dirname(spooled.path) == str(tmp_path)
+    assert (spooled.size, spooled.sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    with open(spooled.path, "rb") as f:
+        assert f.read() == data
+    spooled.cleanup()
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_spool_leaves_no_temp_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_UPLOAD_CHUNK_SIZE", 100)
+    service = make_service(staging_path=str(tmp_path))
+    uploads = [FakeUpload("a.pdf", b"x" * 300), FakeUpload("b.pdf", b"y" * 300, fail_after=200)]
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(service.spool_uploads(uploads))
+
+    assert os.listdir(tmp_path) == []
+
+
+class FakeDocumentRepository:
+    def __init__(self, existing=None):
+        self.existing = existing or {}
+        self.lookups = []
+
+    async def get_document_by_content_hash(self, content_hash):
+        self.lookups.append(content_hash)
+        await asyncio.sleep(0)
+        document_id = self.existing.get(content_hash)
+        return SimpleNamespace(id=document_id) if document_id else None
+
+
+class Ingestion:
+    """Stands in for the expensive part: extraction, Content Safety, Blob, Cosmos"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return self.result
+
+
+def test_known_content_returns_the_existing_document_without_ingesting():
+    service = make_service(document_repo=FakeDocumentRepository({"abc": "doc-1"}))
+    ingest = Ingestion({"safe": True, "document_id": "doc-2"})
+
+    result = asyncio.run(service._ingest_once("abc", ingest))
+
+    assert result == {"safe": True, "duplicate": True, "document_id": "doc-1"}
+    assert ingest.calls == 0
+
+
+def test_identical_items_in_flight_share_one_ingestion():
+    repo = FakeDocumentRepository()
+    service = make_service(document_repo=repo)
+    ingest = Ingestion({"safe": True, "document_id": "doc-1"})
+
+    async def run():
+        return await asyncio.gather(*(service._ingest_once("abc", ingest) for _ in range(3)))
+
+    first, *others = asyncio.run(run())
+
+    assert ingest.calls == 1 and repo.lookups == ["abc"]
+    assert first == {"safe": True, "document_id": "doc-1"}
+    assert others == [{"safe": True, "duplicate": True, "document_id": "doc-1"}] * 2
+    assert service._inflight_hashes == {}
+
+
+def test_identical_items_in_flight_share_a_rejection():
+    service = make_service(document_repo=FakeDocumentRepository())
+    ingest = Ingestion({"safe": False, "reason": "Content safety violation"})
+
+    async def run():
+        return await asyncio.gather(service._ingest_once("abc", ingest), service._ingest_once("abc", ingest))
+
+    assert asyncio.run(run()) == [{"safe": False, "reason": "Content safety violation"}] * 2
+    assert ingest.calls == 1
+
+
+def test_content_hash_lookup_skips_failed_and_superseded_documents():
+    queries = []
+
+    class Container:
+        def query_items(self, query, parameters, enable_cross_partition_query):
+            queries.append((query, {p["name"]: p["value"] for p in parameters}))
+            return []
+
+    repo = DocumentRepository.__new__(DocumentRepository)
+    repo.container = Container()
+
+    assert asyncio.run(repo.get_document_by_content_hash("abc")) is None
+    [(query, parameters)] = queries
+    assert "c.status != @failed AND c.status != @superseded" in query
+    assert parameters == {"@content_hash": "abc", "@failed": "failed", "@superseded": "superseded"}
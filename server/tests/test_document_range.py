@@ -0,0 +1,30 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.document import _parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 100)),
+    ("bytes=100-", (100, 900)),
+    ("bytes=-100", (900, 100)),
+    ("bytes=-5000", (0, 1000)),
+    ("bytes=990-5000", (990, 10)),
+    (" bytes=0-0 ", (0, 1)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=-", "bytes=0-1,5-9", "items=0-9", "bytes=a-b"])
+def test_malformed_or_multi_range_is_ignored(header):
+    assert _parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-4", "bytes=-0"])
+def test_unsatisfiable_range_is_416(header):
+    with pytest.raises(HTTPException) as exc:
+        _parse_range(header, 1000)
+
+    assert exc.value.status_code == 416
+    assert exc.value.headers == {"Content-Range": "bytes */1000"}
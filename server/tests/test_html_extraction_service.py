@@ -0,0 +1,85 @@
+import pytest
+
+from app.config.settings import settings
+from app.services.html_extraction_service import HTML_ENGINES, HTMLExtractionService
+
+FAST_ENGINES = [
+    "lxml",
+    pytest.param(
+        "selectolax",
+        marks=pytest.mark.skipif("selectolax" not in HTML_ENGINES, reason="selectolax not installed"),
+    ),
+]
+
+ARTICLE = "Para solicitar el pasaporte debe presentar su identificación oficial vigente. " * 4
+
+PAGE = f"""<!DOCTYPE html>
+<html>
+<head><title>Pasaporte</title><style>.x {{ color: red }}</style></head>
+<body>
+  <header class="site-header">Gobierno de México</header>
+  <nav><ul><li>Inicio</li><li>Trámites</li></ul></nav>
+  <div class="cookie-banner">Usamos cookies</div>
+  <main>
+    <header><h1>Requisitos del pasaporte</h1></header>
+    <p>{ARTICLE}</p>
+    <table><tr><td>Costo</td><td>$1,585</td></tr></table>
+    <script>trackPageView();</script>
+  </main>
+  <aside>Trámites relacionados</aside>
+  <footer id="footer">Contacto</footer>
+</body>
+</html>"""
+
+
+@pytest.mark.parametrize("engine", FAST_ENGINES)
+def test_main_content_drops_page_chrome(engine):
+    text = HTMLExtractionService(engine=engine, main_content_only=True).extract_text(PAGE)
+
+    assert text.splitlines()[0] == "Requisitos del pasaporte"
+    assert ARTICLE.strip() in text
+    assert "Costo $1,585" in text
+    for chrome in ("Gobierno de México", "Inicio", "Usamos cookies", "Trámites relacionados", "Contacto"):
+        assert chrome not in text
+    assert "trackPageView" not in text and "color: red" not in text
+
+
+@pytest.mark.parametrize("engine", FAST_ENGINES)
+def test_whole_page_keeps_chrome_but_not_scripts(engine):
+    text = HTMLExtractionService(engine=engine, main_content_only=False).extract_text(PAGE)
+
+    assert "Gobierno de México" in text and "Contacto" in text and ARTICLE.strip() in text
+    assert "trackPageView" not in text
+
+
+@pytest.mark.parametrize("engine", FAST_ENGINES)
+def test_short_main_region_falls_back_to_the_body(engine, monkeypatch):
+    monkeypatch.setattr(settings, "HTML_MAIN_CONTENT_MIN_CHARS", 200)
+    html = f"<html><body><main><p>Breve</p></main><div><p>{ARTICLE}</p></div><nav>Menú</nav></body></html>"
+
+    text = HTMLExtractionService(engine=engine, main_content_only=True).extract_text(html)
+
+    assert "Breve" in text and ARTICLE.strip() in text
+    assert "Menú" not in text
+
+
+@pytest.mark.parametrize("engine", FAST_ENGINES)
+def test_articles_are_used_without_a_main_region(engine):
+    html = (
+        f"<html><body><div class='sidebar'>Enlaces</div>"
+        f"<article><h2>Aviso</h2><p>{ARTICLE}</p></article></body></html>"
+    )
+
+    text = HTMLExtractionService(engine=engine, main_content_only=True).extract_text(html)
+
+    assert text == "Aviso\n" + ARTICLE.strip()
+
+
+@pytest.mark.parametrize("engine", FAST_ENGINES)
+def test_empty_document(engine):
+    assert HTMLExtractionService(engine=engine).extract_text("") == ""
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        HTMLExtractionService(engine="regex")
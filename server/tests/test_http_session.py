@@ -0,0 +1,55 @@
+import asyncio
+
+from aiohttp import web
+
+from app.config.settings import settings
+from app.core import http_session
+
+
+def test_session_is_shared_and_configured_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_POOL_MAX_CONNECTIONS_PER_HOST", 3)
+
+    async def run():
+        await http_session.init_http_session()
+        session = http_session.get_http_session()
+        try:
+            assert http_session.get_http_session() is session
+            assert session.connector.limit_per_host == 3
+            assert session.headers["User-Agent"] == settings.HTTP_USER_AGENT
+        finally:
+            await http_session.close_http_session()
+        assert session.closed
+        # Outside the lifespan (scripts, workers) a new session is created on demand
+        replacement = http_session.get_http_session()
+        assert replacement is not session and not replacement.closed
+        await http_session.close_http_session()
+
+    asyncio.run(run())
+
+
+def test_requests_reuse_pooled_connections():
+    peers = set()
+
+    async def handler(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.Response(text="ok")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            for _ in range(5):
+                async with http_session.get_http_session().get(f"http://127.0.0.1:{port}/") as resp:
+                    assert await resp.text() == "ok"
+        finally:
+            await http_session.close_http_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+    assert len(peers) == 1
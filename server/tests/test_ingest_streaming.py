@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_ingestion_service
+from app.api.v1.endpoints import document
+from app.schemas.document import IngestItemEvent
+from app.services.document_ingestion_service import DocumentIngestionService, SpooledUpload
+
+
+def make_service():
+    service = DocumentIngestionService.__new__(DocumentIngestionService)
+    service._item_semaphore = asyncio.Semaphore(8)
+    service._inflight_hashes = {}
+    return service
+
+
+def spooled(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"contenido")
+    return SpooledUpload(str(path), name, "text/plain", 9, name)
+
+
+def collect(service, uploads, urls):
+    async def run():
+        return [event async for event in service.stream_ingestion(uploads, urls)]
+    return asyncio.run(run())
+
+
+def test_stream_yields_an_event_per_item_as_it_finishes_then_a_summary(tmp_path):
+    service = make_service()
+    delays = {"slow.txt": 0.05, "fast.txt": 0.0}
+
+    async def run_spooled(upload):
+        await asyncio.sleep(delays[upload.filename])
+        return {"safe": True, "document_id": f"doc-{upload.filename}"}
+
+    async def run_url(url_item):
+        if url_item.get("url") is None:
+            raise KeyError("url")
+        return {"safe": True, "duplicate": True, "document_id": "doc-known"}
+
+    service._run_spooled = run_spooled
+    service._run_url = run_url
+    uploads = [spooled(tmp_path, "slow.txt"), spooled(tmp_path, "fast.txt")]
+
+    *items, summary = collect(service, uploads, [{"url": "https://www.gob.mx/a"}, {"title": "sin url"}])
+
+    assert [(e.kind, e.index, e.status) for e in items if e.kind == "file"] == [
+        ("file", 1, "accepted"), ("file", 0, "accepted")
+    ]
+    assert IngestItemEvent(
+        kind="url", index=1, name="", status="rejected", reason="Processing error"
+    ) in items
+    assert summary.files_accepted == 2 and summary.urls_duplicate == 1 and summary.urls_rejected == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_closing_the_stream_cancels_work_and_removes_uploads(tmp_path):
+    service = make_service()
+    cancelled = []
+
+    async def run_spooled(upload):
+        try:
+            await asyncio.sleep(10 if upload.filename == "slow.txt" else 0)
+        except asyncio.CancelledError:
+            cancelled.append(upload.filename)
+            raise
+        return {"safe": True, "document_id": "doc-1"}
+
+    service._run_spooled = run_spooled
+    uploads = [spooled(tmp_path, "slow.txt"), spooled(tmp_path, "fast.txt")]
+
+    async def run():
+        events = service.stream_ingestion(uploads, [])
+        first = await events.__anext__()
+        await events.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    assert asyncio.run(run()).name == "fast.txt"
+    assert cancelled == ["slow.txt"]
+    assert list(tmp_path.iterdir()) == []
+
+
+class FakeIngestionService:
+    async def spool_uploads(self, files):
+        return []
+
+    async def stream_ingestion(self, uploads, urls):
+        for index, item in enumerate(urls):
+            yield IngestItemEvent(kind="url", index=index, name=item["url"], status="accepted", document_id="d")
+        raise RuntimeError("search index down")
+
+
+def make_client():
+    app = FastAPI()
+    app.include_router(document.router, prefix="/documents")
+    app.dependency_overrides[get_ingestion_service] = FakeIngestionService
+    return TestClient(app)
+
+
+def test_ndjson_stream_ends_with_an_error_event():
+    urls_json = json.dumps({"urls": [{"url": "https://www.gob.mx/a"}]})
+
+    response = make_client().post("/documents/ingest?stream=ndjson", data={"urls_json": urls_json})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"event": "item", "kind": "url", "index": 0, "name": "https://www.gob.mx/a",
+                        "status": "accepted", "document_id": "d"}
+    assert lines[1] == {"event": "error", "detail": "Ingestion failed: search index down"}
+
+
+def test_sse_is_selected_by_the_accept_header():
+    urls_json = json.dumps({"urls": [{"url": "https://www.gob.mx/a"}]})
+
+    response = make_client().post(
+        "/documents/ingest", data={"urls_json": urls_json}, headers={"Accept": "text/event-stream"}
+    )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith("event: item\ndata: {")
+    assert "event: error\n" in response.text
+
+
+def test_malformed_url_items_are_rejected_before_streaming():
+    urls_json = json.dumps({"urls": [{"title": "sin url"}]})
+
+    response = make_client().post("/documents/ingest?stream=ndjson", data={"urls_json": urls_json})
+
+    assert response.status_code == 400
+    assert response.json()["detail"][0]["loc"] == ["urls", 0, "url"]
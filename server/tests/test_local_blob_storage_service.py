@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+from app.services import local_blob_storage_service
+from app.services.document_ingestion_service import _blob_extension
+from app.services.local_blob_storage_service import LocalBlobStorageService
+
+needs_zstd = pytest.mark.skipif(local_blob_storage_service.zstandard is None, reason="zstandard not installed")
+
+CONTENT = b"".join(f"linea {i} del documento\n".encode() for i in range(2000))
+
+
+def make_store(tmp_path, compression="none", chunk_size=1000):
+    store = LocalBlobStorageService(root=str(tmp_path), compression=compression)
+    store.chunk_size = chunk_size
+    return store
+
+
+def read(store, blob_name, offset=None, length=None):
+    async def run():
+        return b"".join([chunk async for chunk in store.iter_download(blob_name, offset, length)])
+    return asyncio.run(run())
+
+
+def stored_objects(tmp_path):
+    return sorted(p for p in (tmp_path / "objects").rglob("*") if p.is_file())
+
+
+def test_objects_are_sharded_by_their_sha256(tmp_path):
+    store = make_store(tmp_path)
+
+    url = asyncio.run(store.upload_file(CONTENT, "doc.txt", "text/plain"))
+
+    digest = hashlib.sha256(CONTENT).hexdigest()
+    path = tmp_path / "objects" / digest[:2] / digest[2:4] / digest
+    assert stored_objects(tmp_path) == [path]
+    assert url == path.as_uri()
+    assert path.read_bytes() == CONTENT
+    # Writes go through tmp/ and are moved into place, nothing is left behind
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = make_store(tmp_path)
+
+    async def run():
+        await store.upload_file(CONTENT, "a.txt")
+        with open(tmp_path / "upload", "wb") as f:
+            f.write(CONTENT)
+        with open(tmp_path / "upload", "rb") as stream:
+            await store.upload_stream(stream, "b.txt", length=len(CONTENT))
+
+    asyncio.run(run())
+
+    assert len(stored_objects(tmp_path)) == 1
+    assert read(store, "a.txt") == read(store, "b.txt") == CONTENT
+
+
+@pytest.mark.parametrize("compression", ["none", pytest.param("zstd", marks=needs_zstd)])
+def test_ranged_reads(tmp_path, compression):
+    store = make_store(tmp_path, compression)
+    asyncio.run(store.upload_file(CONTENT, "doc.txt"))
+
+    assert asyncio.run(store.download_file("doc.txt")) == CONTENT
+    assert read(store, "doc.txt", 1500, 2500) == CONTENT[1500:4000]
+    assert read(store, "doc.txt", len(CONTENT) - 10) == CONTENT[-10:]
+    assert read(store, "doc.txt", 0, 10 * len(CONTENT)) == CONTENT
+
+
+@needs_zstd
+def test_zstd_objects_are_compressed(tmp_path):
+    store = make_store(tmp_path, "zstd")
+
+    asyncio.run(store.upload_file(CONTENT, "doc.txt"))
+
+    [path] = stored_objects(tmp_path)
+    assert path.name == hashlib.sha256(CONTENT).hexdigest() + ".zst"
+    assert path.stat().st_size < len(CONTENT) / 2
+
+
+def test_delete_removes_the_ref_and_prune_the_object(tmp_path):
+    store = make_store(tmp_path)
+
+    async def run():
+        await store.upload_file(CONTENT, "a.txt")
+        await store.upload_file(CONTENT, "b.txt")
+        await store.upload_file(b"otro contenido", "c.txt")
+        assert await store.delete_file("a.txt") is True
+        assert await store.delete_file("c.txt") is True
+        return await store.prune()
+
+    assert asyncio.run(run()) == 1
+    assert len(stored_objects(tmp_path)) == 1
+    assert read(store, "b.txt") == CONTENT
+    with pytest.raises(ResourceNotFoundError):
+        read(store, "a.txt")
+
+
+@pytest.mark.parametrize("blob_name", ["../escape", "a/b.txt", ".hidden", "con espacio.pdf"])
+def test_unsafe_blob_names_are_rejected(tmp_path, blob_name):
+    store = make_store(tmp_path)
+
+    with pytest.raises(ValueError):
+        asyncio.run(store.upload_file(CONTENT, blob_name))
+
+
+@pytest.mark.parametrize("filename, extension", [
+    ("informe.PDF", "pdf"),
+    ("acta final.do cx", "docx"),
+    ("notas.t/x?t", "txt"),
+    ("sin extension", "bin"),
+    ("raro.%%", "bin"),
+])
+def test_ingestion_builds_blob_names_every_backend_accepts(tmp_path, filename, extension):
+    assert _blob_extension(filename) == extension
+    store = make_store(tmp_path)
+
+    asyncio.run(store.upload_file(CONTENT, f"0b4e6a4c-2f36-4a7e-9b7e-6f1f2a1c9d11.{extension}"))
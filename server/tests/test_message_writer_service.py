@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError, CosmosResourceNotFoundError
+
+from app.config.settings import settings
+from app.models.conversation import Message
+from app.repositories.conversation_repository import ConversationRepository
+from app.services import message_writer_service
+from app.services.message_writer_service import MessageWriterService
+
+
+class FakeConversations:
+    """Conversations container: patch_item with incr/set and the last_counted_message_id predicate"""
+
+    def __init__(self, *ids):
+        self.docs = {i: {"id": i, "message_count": 0} for i in ids}
+
+    async def patch_item(self, item, partition_key, patch_operations, filter_predicate=None, no_response=False):
+        if item not in self.docs:
+            raise CosmosResourceNotFoundError(message="not found")
+        doc = self.docs[item]
+        if filter_predicate is not None:
+            counted = filter_predicate.rsplit("'", 2)[1]
+            if doc.get("last_counted_message_id") == counted:
+                raise CosmosAccessConditionFailedError(message="precondition failed")
+        for op in patch_operations:
+            key = op["path"][1:]
+            doc[key] = doc.get(key, 0) + op["value"] if op["op"] == "incr" else op["value"]
+
+
+class FakeMessages:
+    def __init__(self):
+        self.items = {}
+        self.fail_next = 0
+
+    async def upsert_item(self, body):
+        self._maybe_fail()
+        self.items[body["id"]] = body
+
+    async def execute_item_batch(self, batch_operations, partition_key):
+        self._maybe_fail()
+        for _, (body,) in batch_operations:
+            self.items[body["id"]] = body
+
+    def _maybe_fail(self):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise RuntimeError("write failed")
+
+
+class FakeDatabase:
+    def __init__(self, *conversation_ids):
+        self.containers = {"conversations": FakeConversations(*conversation_ids), "messages": FakeMessages()}
+
+    def get_container_client(self, name):
+        return self.containers[name]
+
+
+def make_writer(monkeypatch, db):
+    monkeypatch.setattr(settings, "MESSAGE_WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(settings, "MESSAGE_WRITE_BEHIND_FLUSH_INTERVAL_MS", 0)
+    monkeypatch.setattr(message_writer_service, "get_database", lambda: db)
+    return MessageWriterService()
+
+
+def test_retry_after_failed_undo_does_not_count_twice():
+    db = FakeDatabase("c1")
+    repo = ConversationRepository(db)
+    messages = [Message(conversation_id="c1", role="user", content="hi")]
+
+    async def failing_uncount(conversation_id, count):
+        raise RuntimeError("undo failed")
+
+    async def run():
+        # The message write fails after the increment, and so does its undo
+        db.containers["messages"].fail_next = 1
+        repo._uncount_messages = failing_uncount
+        with pytest.raises(RuntimeError):
+            await repo.save_messages("c1", messages)
+        del repo._uncount_messages
+        return await repo.save_messages("c1", messages)
+
+    assert asyncio.run(run()) is True
+    assert db.containers["conversations"].docs["c1"]["message_count"] == 1
+    assert len(db.containers["messages"].items) == 1
+
+
+def test_retry_after_undone_increment_counts_once():
+    db = FakeDatabase("c1")
+    repo = ConversationRepository(db)
+    messages = [Message(conversation_id="c1", role="user", content=f"m{i}") for i in range(3)]
+
+    async def run():
+        db.containers["messages"].fail_next = 1
+        with pytest.raises(RuntimeError):
+            await repo.save_messages("c1", messages)
+        return await repo.save_messages("c1", messages)
+
+    assert asyncio.run(run()) is True
+    assert db.containers["conversations"].docs["c1"]["message_count"] == 3
+    assert len(db.containers["messages"].items) == 3
+
+
+def test_flusher_survives_a_failed_flush(monkeypatch):
+    db = FakeDatabase("c1")
+    writer = make_writer(monkeypatch, db)
+    calls = {"count": 0}
+    real_get_database = message_writer_service.get_database
+
+    def flaky_get_database():
+        calls["count"] += 1
+        if calls["count"] == 1:
+            raise RuntimeError("Cosmos DB client is not initialized")
+        return real_get_database()
+
+    monkeypatch.setattr(message_writer_service, "get_database", flaky_get_database)
+
+    async def run():
+        repo = ConversationRepository(db)
+        await writer.add_message(repo, "c1", "user", "lost")
+        await asyncio.sleep(0.01)
+        await writer.add_message(repo, "c1", "user", "kept")
+        await writer.close()
+
+    asyncio.run(run())
+
+    assert [m["content"] for m in db.containers["messages"].items.values()] == ["kept"]
+    assert writer.stats["dropped"] == 1
+    assert writer.stats["persisted"] == 1
+    assert writer.pending_messages("c1") == []
+
+
+def test_cancelled_add_message_leaves_no_pending_message(monkeypatch):
+    monkeypatch.setattr(settings, "MESSAGE_WRITE_BEHIND_QUEUE_SIZE", 1)
+    db = FakeDatabase("c1")
+    writer = make_writer(monkeypatch, db)
+    repo = ConversationRepository(db)
+
+    async def run():
+        # Keep the flusher from taking anything, so the queue stays full
+        writer._flusher = asyncio.get_running_loop().create_future()
+        first = await writer.add_message(repo, "c1", "user", "queued")
+        waiting = asyncio.create_task(writer.add_message(repo, "c1", "user", "cancelled"))
+        await asyncio.sleep(0)
+        assert len(writer.pending_messages("c1")) == 2
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return first
+
+    first = asyncio.run(run())
+
+    assert writer.pending_messages("c1") == [first]
+    assert writer.stats["queued"] == 1
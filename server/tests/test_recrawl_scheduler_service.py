@@ -0,0 +1,178 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.config.settings import settings
+from app.repositories.crawl_state_repository import SQLiteCrawlStateRepository
+from app.schemas.document import CrawledURL
+from app.services.document_ingestion_service import DocumentIngestionService
+from app.services.recrawl_scheduler_service import RecrawlSchedulerService
+
+
+def state(url, next_crawl_at, **fields):
+    return CrawledURL(id=CrawledURL.id_for_url(url), url=url, next_crawl_at=next_crawl_at, **fields)
+
+
+def test_sqlite_store_round_trips_and_lists_due_urls_oldest_first(tmp_path):
+    repo = SQLiteCrawlStateRepository(str(tmp_path / "state" / "crawl.db"))
+    now = datetime(2026, 1, 1, 12, 0)
+
+    async def run():
+        for minutes, url in ((-5, "https://www.gob.mx/b"), (-10, "https://www.gob.mx/a"), (5, "https://www.gob.mx/c")):
+            await repo.upsert_state(state(url, now + timedelta(minutes=minutes), etag='"v1"'))
+        await repo.upsert_state(state("https://www.gob.mx/b", now - timedelta(minutes=5), etag='"v2"'))
+        return (
+            await repo.get_state("https://www.gob.mx/b"),
+            await repo.get_state("https://www.gob.mx/missing"),
+            await repo.get_due(now),
+            await repo.get_due(now, limit=1),
+        )
+
+    stored, missing, due, first = asyncio.run(run())
+
+    assert stored.etag == '"v2"'
+    assert missing is None
+    assert [s.url for s in due] == ["https://www.gob.mx/a", "https://www.gob.mx/b"]
+    assert [s.url for s in first] == ["https://www.gob.mx/a"]
+
+
+class FakeValidator:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.requests = []
+
+    async def fetch_validated_url(self, url, timeout=30, headers=None):
+        self.requests.append((url, headers))
+        status = self.statuses[url]
+        if isinstance(status, Exception):
+            raise status
+        return SimpleNamespace(url=url, status=status, headers={})
+
+
+class FakeIngestion:
+    def __init__(self, document_ids, validator, repo):
+        self.document_ids = document_ids
+        self.url_validator = validator
+        self.crawl_state_repo = repo
+        self.ingested = []
+
+    async def ingest_fetched_page(self, page):
+        self.ingested.append(page.url)
+        return {"safe": True, "document_id": self.document_ids[page.url]}
+
+
+def test_due_urls_are_recrawled_with_conditional_requests(tmp_path):
+    repo = SQLiteCrawlStateRepository(str(tmp_path / "crawl.db"))
+    past = datetime.utcnow() - timedelta(hours=1)
+    validator = FakeValidator({
+        "https://www.gob.mx/igual": 304,
+        "https://www.gob.mx/mismo-texto": 200,
+        "https://www.gob.mx/nuevo": 200,
+        "https://www.gob.mx/caido": ConnectionError("down"),
+    })
+    ingestion = FakeIngestion(
+        {"https://www.gob.mx/mismo-texto": "doc-2", "https://www.gob.mx/nuevo": "doc-new"}, validator, repo
+    )
+    scheduler = RecrawlSchedulerService(ingestion)
+
+    async def run():
+        await repo.upsert_state(state(
+            "https://www.gob.mx/igual", past, etag='"abc"', last_modified="Wed, 01 Jan 2026 10:00:00 GMT"
+        ))
+        await repo.upsert_state(state("https://www.gob.mx/mismo-texto", past, document_id="doc-2"))
+        await repo.upsert_state(state("https://www.gob.mx/nuevo", past, document_id="doc-3"))
+        await repo.upsert_state(state("https://www.gob.mx/caido", past))
+        return await scheduler.run_once(), await repo.get_state("https://www.gob.mx/igual"), \
+            await repo.get_state("https://www.gob.mx/caido")
+
+    summary, not_modified, failed = asyncio.run(run())
+
+    assert summary == {"not_modified": 1, "unchanged": 1, "reingested": 1, "failed": 1}
+    assert ("https://www.gob.mx/igual", {
+        "If-None-Match": '"abc"', "If-Modified-Since": "Wed, 01 Jan 2026 10:00:00 GMT"
+    }) in validator.requests
+    assert sorted(ingestion.ingested) == ["https://www.gob.mx/mismo-texto", "https://www.gob.mx/nuevo"]
+    # A 304 waits a full interval, a failure is retried sooner
+    interval = not_modified.next_crawl_at - not_modified.last_crawled_at
+    retry = failed.next_crawl_at - failed.last_crawled_at
+    assert interval == timedelta(seconds=settings.RECRAWL_INTERVAL_SECONDS)
+    assert retry == timedelta(seconds=settings.RECRAWL_RETRY_SECONDS)
+    assert not_modified.last_status == 304
+
+
+def test_nothing_due_does_nothing(tmp_path):
+    repo = SQLiteCrawlStateRepository(str(tmp_path / "crawl.db"))
+    validator = FakeValidator({})
+    scheduler = RecrawlSchedulerService(FakeIngestion({}, validator, repo))
+
+    async def run():
+        await repo.upsert_state(state("https://www.gob.mx/a", datetime.utcnow() + timedelta(hours=1)))
+        return await scheduler.run_once()
+
+    assert asyncio.run(run()) == {}
+    assert validator.requests == []
+
+
+class Documents:
+    def __init__(self, documents):
+        self.documents = documents
+        self.superseded = []
+
+    async def get_document(self, document_id):
+        return self.documents.get(document_id)
+
+    async def mark_superseded(self, document_id, superseded_by):
+        self.superseded.append((document_id, superseded_by))
+
+
+class SearchIndex:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_document_chunks(self, document_id):
+        self.deleted.append(document_id)
+        return True
+
+
+def make_ingestion(tmp_path, documents):
+    service = DocumentIngestionService.__new__(DocumentIngestionService)
+    service.crawl_state_repo = SQLiteCrawlStateRepository(str(tmp_path / "crawl.db"))
+    service.document_repo = Documents(documents)
+    service._search_index = SearchIndex()
+    return service
+
+
+def page(url, etag):
+    return SimpleNamespace(url=url, status=200, headers={"ETag": etag})
+
+
+def test_changed_page_supersedes_its_previous_document(tmp_path):
+    url = "https://www.gob.mx/tramites"
+    service = make_ingestion(tmp_path, {"doc-1": SimpleNamespace(original_filename=url, status="processed")})
+
+    async def run():
+        await service._record_crawl_state(page(url, '"v1"'), "hash-1", "doc-1")
+        await service._record_crawl_state(page(url, '"v1"'), "hash-1", "doc-1")
+        await service._record_crawl_state(page(url, '"v2"'), "hash-2", "doc-2")
+        return await service.crawl_state_repo.get_state(url)
+
+    stored = asyncio.run(run())
+
+    assert (stored.etag, stored.content_hash, stored.document_id) == ('"v2"', "hash-2", "doc-2")
+    assert service.document_repo.superseded == [("doc-1", "doc-2")]
+    assert service._search_index.deleted == ["doc-1"]
+
+
+def test_document_shared_with_another_url_is_not_superseded(tmp_path):
+    url = "https://www.gob.mx/copia"
+    shared = SimpleNamespace(original_filename="https://www.gob.mx/original", status="processed")
+    service = make_ingestion(tmp_path, {"doc-1": shared})
+
+    async def run():
+        await service._record_crawl_state(page(url, '"v1"'), "hash-1", "doc-1")
+        await service._record_crawl_state(page(url, '"v2"'), "hash-2", "doc-2")
+
+    asyncio.run(run())
+
+    assert service.document_repo.superseded == []
+    assert service._search_index.deleted == []
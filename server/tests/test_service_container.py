@@ -0,0 +1,31 @@
+import asyncio
+
+from app.core.services import ServiceContainer
+
+
+class Closable:
+    def __init__(self, name, closed):
+        self.name = name
+        self.closed = closed
+
+    async def close(self):
+        self.closed.append(self.name)
+
+
+class FailingClose(Closable):
+    async def close(self):
+        await super().close()
+        raise RuntimeError("close failed")
+
+
+def test_close_closes_every_built_service():
+    closed = []
+    container = ServiceContainer()
+    for name in ("message_writer", "ingestion_service", "rag_pipeline", "search_index_service"):
+        container.__dict__[name] = Closable(name, closed)
+    container.__dict__["ai_service"] = FailingClose("ai_service", closed)
+
+    asyncio.run(container.close())
+
+    assert closed == ["message_writer", "ingestion_service", "rag_pipeline", "ai_service", "search_index_service"]
+    assert container.__dict__ == {}
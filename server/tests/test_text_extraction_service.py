@@ -0,0 +1,99 @@
+import asyncio
+import signal
+import time
+
+import pytest
+
+from app.config.settings import settings
+from app.services import text_extraction_service
+from app.services.text_extraction_service import (
+    ExtractionTimeLimitError,
+    TextExtractionService,
+    _call_with_time_limit,
+)
+
+needs_sigalrm = pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="SIGALRM is Unix only")
+
+
+def _sleep_ignoring_time_limit(seconds):
+    """Stands in for native code that never returns to Python"""
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    time.sleep(seconds)
+    return "done"
+
+
+@needs_sigalrm
+def test_time_limit_interrupts_a_slow_task():
+    started = time.monotonic()
+
+    with pytest.raises(ExtractionTimeLimitError):
+        _call_with_time_limit(0.05, time.sleep, 5)
+
+    assert time.monotonic() - started < 1
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+
+
+@needs_sigalrm
+def test_time_limit_returns_the_result_of_a_fast_task():
+    assert _call_with_time_limit(5, sum, [1, 2, 3]) == 6
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+
+
+def test_txt_extraction_runs_in_the_pool(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("Trámite de pasaporte", encoding="utf-8")
+    try:
+        text = asyncio.run(TextExtractionService().extract_text(str(path), "doc.txt", timeout=60))
+    finally:
+        text_extraction_service.shutdown_extraction_executor()
+
+    assert text == "Trámite de pasaporte"
+
+
+@needs_sigalrm
+def test_stuck_worker_recycles_the_pool(monkeypatch):
+    monkeypatch.setattr(text_extraction_service, "WORKER_KILL_GRACE_SECONDS", 0.5)
+    monkeypatch.setattr(text_extraction_service, "WATCHDOG_INTERVAL_SECONDS", 0.05)
+    service = TextExtractionService()
+    executor = text_extraction_service.get_extraction_executor()
+    workers = []
+
+    async def run():
+        task = asyncio.ensure_future(service._run(0.1, _sleep_ignoring_time_limit, 30))
+        await asyncio.sleep(0.5)
+        workers.extend(executor._processes.values())
+        return await task
+
+    try:
+        with pytest.raises(ExtractionTimeLimitError):
+            asyncio.run(run())
+        assert text_extraction_service._executor is None
+    finally:
+        text_extraction_service.shutdown_extraction_executor()
+
+    assert workers
+    for process in workers:
+        process.join(timeout=5)
+        assert not process.is_alive()
+
+
+@needs_sigalrm
+def test_time_queued_behind_other_tasks_does_not_count(monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_EXTRACTION_MAX_WORKERS", 1)
+    monkeypatch.setattr(text_extraction_service, "WORKER_KILL_GRACE_SECONDS", 0.2)
+    monkeypatch.setattr(text_extraction_service, "WATCHDOG_INTERVAL_SECONDS", 0.05)
+    service = TextExtractionService()
+    executor = text_extraction_service.get_extraction_executor()
+
+    async def run():
+        # The second task waits ~1s for the only worker, well past its 0.3s limit plus grace
+        return await asyncio.gather(
+            service._run(5, time.sleep, 1),
+            service._run(0.3, sum, [1, 2, 3]),
+        )
+
+    try:
+        assert asyncio.run(run()) == [None, 6]
+        assert text_extraction_service._executor is executor
+    finally:
+        text_extraction_service.shutdown_extraction_executor()
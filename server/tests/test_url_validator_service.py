@@ -0,0 +1,81 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from app.services.url_validator_service import (
+    HostReachabilityCache,
+    URLValidatorService,
+    _is_allowed_host,
+)
+
+
+@pytest.mark.parametrize("host", [
+    "www.usa.gov",
+    "www.gob.mx",
+    "sede.agenciatributaria.gob.es",
+    "www.gov.uk",
+    "www.gov.br",
+    "www.funcionpublica.gov.co",
+    "WWW.GOB.MX.",
+])
+def test_accepts_government_hosts(host):
+    assert _is_allowed_host(host)
+
+
+@pytest.mark.parametrize("host", [
+    "gov",
+    "gob.mx",
+    "example.com",
+    "gov.example.com",
+    "example.gov.evil.com",
+    "example.gob.mx.evil.com",
+    "example.gov.com",
+    "notgov.uk",
+    "evil.gov.io",
+    "www.gov.tv",
+    "tramites.gob.ws",
+])
+def test_rejects_other_hosts(host):
+    assert not _is_allowed_host(host)
+
+
+class ProbedValidator(URLValidatorService):
+    """Validator whose probe returns a fixed status or raises a fixed error"""
+
+    def __init__(self, outcome):
+        super().__init__(HostReachabilityCache(ttl_seconds=60, unreachable_ttl_seconds=60))
+        self.outcome = outcome
+
+    async def _probe(self, url):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def test_server_error_does_not_mark_host_unreachable():
+    validator = ProbedValidator(503)
+
+    assert asyncio.run(validator.validate_url("https://www.gob.mx/tramites")) is False
+    assert validator.reachability.get("www.gob.mx") is None
+
+
+def test_unreachable_host_is_cached():
+    validator = ProbedValidator(None)
+
+    assert asyncio.run(validator.validate_url("https://www.gob.mx/tramites")) is False
+    assert validator.reachability.get("www.gob.mx") is False
+
+
+def test_protocol_error_does_not_mark_host_unreachable():
+    validator = ProbedValidator(aiohttp.ServerDisconnectedError())
+
+    assert asyncio.run(validator.validate_url("https://www.gob.mx/tramites")) is False
+    assert validator.reachability.get("www.gob.mx") is None
+
+
+def test_success_marks_host_reachable():
+    validator = ProbedValidator(200)
+
+    assert asyncio.run(validator.validate_url("https://www.gob.mx/tramites")) is True
+    assert validator.reachability.get("www.gob.mx") is True